@@ -0,0 +1,276 @@
+# Contains the ControllerVatt class which uploads only DSP code not already resident on the boards.
+
+import os
+import time
+
+from dsp_lod import LodCache
+from latency_stats import stats
+
+import azcam
+from azcam_arc.controller_arc import ControllerArc
+
+
+class ControllerVatt(ControllerArc):
+    """
+    ARC controller class for the VATT systems.
+    On reset, DSP code which is already resident on the timing and utility
+    boards is not uploaded again. Code is resident if it is the code last
+    uploaded to the board, as recorded by dsp_lod.LodCache, and a few marker
+    words of it read back unchanged. Parameters and variables which change
+    at run time (runtime_data) are not read.
+    When the code last uploaded to a board is resident and differs from a new
+    file in only a few words, just the changed address ranges are written,
+    and the record stays the code they were written over, which the boards
+    restart with, so each reset writes the changes again.
+    The record is kept when the controller is reset, as the marker words are
+    checked before it is used, and forgotten when an upload fails or when
+    power is turned on other than by reset().
+    """
+
+    # header keyword and comment of the DSP code filename of each board
+    dsp_keywords = {
+        1: ["PCIFILE", "PCI board DSP code filename"],
+        2: ["TIMFILE", "Timing board DSP code filename"],
+        3: ["UTILFILE", "Utility board DSP code filename"],
+    }
+
+    # [first, last] Y addresses of each board which are written at run time,
+    # the timing board parameter table (ypars.asm) and the utility board variables
+    runtime_data = {2: {"Y": [0x00, 0x1F]}, 3: {"Y": [0x00, 0x3A]}}
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        # parsed .lod files, set lodcache.folder to keep binary images on disk
+        self.lodcache = LodCache()
+
+        # skip upload of DSP code already on these boards
+        self.skip_resident = 1
+        self.verify_boards = [2, 3]
+
+        # number of program words, and of X and Y data words, read back to
+        # check that code is resident
+        self.verify_samples = 32
+        self.verify_data_samples = 4
+
+        # write only changed words if there are no more than diff_max_words
+        self.diff_upload = 1
+        self.diff_max_words = 128
+
+        # set to always upload complete files
+        self.force_full_upload = 0
+
+        # board number: how its code was loaded by the last reset,
+        # "resident", "changes", or "full"
+        self.loaded = {}
+
+        # board number: [space, address] of words written over the recorded code
+        self.written = {}
+
+        # set while reset() runs
+        self.resetting = 0
+
+    def upload_dsp_file(self, BoardNumber, filename, full=False):
+        """
+        Sends a file containing DSP code to the PCI, timing, or utility boards,
+        unless the code is already resident on the board, in which case only
+        changes are written. Set full True to upload the complete file.
+        """
+
+        if filename == "":
+            return
+
+        t0 = time.perf_counter()
+        full = full or self.force_full_upload
+
+        board = self.get_board_id(BoardNumber)
+        image = None
+        last = None
+        method = "full"
+        try:
+            image = self.lodcache.load(filename)
+            if not full and BoardNumber in self.verify_boards:
+                last = self.lodcache.read_board(board)
+                if last is None:
+                    pass
+                elif last.digest == image.digest:
+                    if self.skip_resident and self.is_resident(BoardNumber, image):
+                        method = "resident"
+                elif self.diff_upload:
+                    self.lodcache.write_board(board, None)
+                    if self.upload_changes(BoardNumber, last, image):
+                        method = "changes"
+        except Exception as e:
+            azcam.log(f"Could not check DSP code on board {BoardNumber}: {e}")
+
+        name = os.path.basename(filename)
+        if method == "full":
+            # board contents are unknown until the upload completes
+            self.lodcache.write_board(board, None)
+            super().upload_dsp_file(BoardNumber, filename)
+        else:
+            if method == "resident":
+                azcam.log(f"{name} is resident on board {BoardNumber}, not uploaded")
+            keyword, comment = self.dsp_keywords[BoardNumber]
+            self.set_keyword(keyword, name, comment, "str")
+
+        # the boards restart with the recorded code, so changes are written
+        # over it again by each reset
+        if method == "changes":
+            self.lodcache.write_board(board, last)
+        else:
+            self.lodcache.write_board(board, image)
+            self.written[BoardNumber] = []
+
+        self.loaded[BoardNumber] = method
+        stats.record("dsp", method, time.perf_counter() - t0)
+
+        return
+
+    def get_changes(self, BoardNumber, last, image):
+        """
+        Returns a list of [space, address, words] address ranges where the
+        downloaded words of image differ from those of last.
+        Runtime data of the board is not included, as it is set after reset.
+        """
+
+        runtime = self.runtime_data.get(BoardNumber, {})
+        changes = []
+        for space in ["P", "X", "Y"]:
+            old = last.get_memory(space)
+            new = image.get_memory(space)
+            skip = runtime.get(space, [0, -1])
+            for address in sorted(new):
+                word = new[address]
+                if old.get(address) == word or skip[0] <= address <= skip[1]:
+                    continue
+                if changes and changes[-1][0] == space:
+                    _, start, words = changes[-1]
+                    if start + len(words) == address:
+                        words.append(word)
+                        continue
+                changes.append([space, address, [word]])
+
+        return changes
+
+    def upload_changes(self, BoardNumber, last, image):
+        """
+        Writes the words of image which differ from last, the code last
+        uploaded to a board.
+        Returns False without writing if there are more than diff_max_words
+        changes, or if last is not resident on the board.
+        Raises ValueError if written words do not read back.
+        """
+
+        changes = self.get_changes(BoardNumber, last, image)
+        written = [
+            [space, address + i, word]
+            for space, address, words in changes
+            for i, word in enumerate(words)
+        ]
+        if len(written) > self.diff_max_words:
+            return False
+
+        # unchanged words are trusted, so last must be on the board
+        if not self.is_resident(BoardNumber, last):
+            return False
+
+        for space, address, word in written:
+            self.write_memory(space, BoardNumber, address, word)
+
+        for space, address, word in written:
+            if self.read_word(space, BoardNumber, address) != word:
+                raise ValueError(f"{space}:{address:04X} did not read back")
+        self.written[BoardNumber] = [[space, address] for space, address, _ in written]
+
+        azcam.log(
+            f"{image.name}: wrote {len(written)} changed words in {len(changes)} ranges "
+            f"to board {BoardNumber}"
+        )
+
+        return True
+
+    def get_board_id(self, BoardNumber):
+        """
+        Returns the name of a board, unique to its controller.
+        """
+
+        return f"{self.camserver.host}_{self.camserver.port}_{BoardNumber}"
+
+    def is_resident(self, BoardNumber, image):
+        """
+        Returns True if the marker words of a LodImage match the board memory.
+        Markers are verify_samples program words and verify_data_samples X and
+        Y words spread over the downloaded code, outside runtime_data, and the
+        words last written over the recorded code by upload_changes().
+        """
+
+        runtime = self.runtime_data.get(BoardNumber, {})
+        markers = []
+        for space in ["P", "X", "Y"]:
+            count = self.verify_samples if space == "P" else self.verify_data_samples
+            samples = image.get_samples(count, space, runtime.get(space))
+            markers.extend([[space, address, word] for address, word in samples])
+            memory = image.get_memory(space)
+            for written_space, address in self.written.get(BoardNumber, []):
+                if written_space == space and address in memory:
+                    markers.append([space, address, memory[address]])
+        if len(markers) == 0:
+            return False
+
+        for space, address, word in markers:
+            if self.read_word(space, BoardNumber, address) != word:
+                return False
+
+        return True
+
+    def forget_boards(self):
+        """
+        Forgets the code last uploaded to the boards, so it is uploaded
+        again by the next reset.
+        """
+
+        for BoardNumber in self.verify_boards:
+            self.lodcache.write_board(self.get_board_id(BoardNumber), None)
+
+        return
+
+    def reset(self):
+        """
+        Reset controller using current attributes.
+        See ControllerArc.reset().
+        """
+
+        self.resetting = 1
+        try:
+            return super().reset()
+        finally:
+            self.resetting = 0
+
+    def power_on(self):
+        """
+        Turn on ARC controller internal power.
+        Other than during reset(), the boards may have been power cycled so the
+        code last uploaded to them is forgotten.
+        """
+
+        if not self.resetting:
+            self.forget_boards()
+
+        return super().power_on()
+
+    def read_word(self, Type, BoardNumber, Address):
+        """
+        Reads a 24 bit word from DSP memory.
+        """
+
+        reply = self.read_memory(Type, BoardNumber, Address)
+
+        # some azcam versions reply ["OK", value]
+        if isinstance(reply, list):
+            if azcam.utils.check_reply(reply):
+                raise ValueError(f"read_memory failed: {reply[-1]}")
+            reply = reply[-1]
+
+        return int(reply) & 0xFFFFFF
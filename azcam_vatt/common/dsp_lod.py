@@ -0,0 +1,277 @@
+# Contains the LodImage and LodCache classes which parse DSP .lod files into cached binary images.
+
+import hashlib
+import os
+import struct
+import threading
+
+# binary image file identifier and version
+MAGIC = b"LOD1"
+
+# P memory at and above this address is boot code which the ARC loaders do not download
+MAX_LOAD_ADDRESS = 0x4000
+
+
+def parse_lod(text):
+    """
+    Parses the text of a .lod file.
+    Returns a list of segments [space, address, words] from the _DATA records,
+    where space is "P", "X", or "Y" and words is a list of 24 bit integers.
+    """
+
+    segments = []
+    words = None
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        if tokens[0].startswith("_"):
+            if tokens[0] == "_DATA":
+                words = []
+                segments.append([tokens[1], int(tokens[2], 16), words])
+            else:
+                words = None
+            continue
+        if words is not None:
+            words.extend([int(token, 16) for token in tokens])
+
+    return segments
+
+
+class LodImage(object):
+    """
+    Binary image of a DSP .lod file, as a list of [space, address, words] segments.
+    """
+
+    def __init__(self, segments, digest="", name=""):
+
+        self.segments = segments
+        self.digest = digest
+        self.name = name
+
+    def get_loaded(self):
+        """
+        Returns the segments which the ARC loaders download, with boot code removed.
+        """
+
+        loaded = []
+        for space, address, words in self.segments:
+            if space == "P":
+                if address >= MAX_LOAD_ADDRESS:
+                    continue
+                words = words[: MAX_LOAD_ADDRESS - address]
+            loaded.append([space, address, words])
+
+        return loaded
+
+    def get_memory(self, space):
+        """
+        Returns a dictionary of address: word of the downloaded words of one
+        memory space, as left in memory after all segments are written.
+        """
+
+        memory = {}
+        for segment_space, address, words in self.get_loaded():
+            if segment_space == space:
+                for i, word in enumerate(words):
+                    memory[address + i] = word
+
+        return memory
+
+    def get_samples(self, count, space="P", skip=None):
+        """
+        Returns up to count [address, word] pairs spread evenly over the
+        downloaded words of one memory space.
+        skip is an optional [first, last] address range which is not sampled.
+        """
+
+        words = sorted(self.get_memory(space).items())
+        if skip is not None:
+            words = [(a, w) for a, w in words if not skip[0] <= a <= skip[1]]
+
+        if count <= 0:
+            return []
+        if len(words) <= count:
+            return words
+
+        step = (len(words) - 1) / max(count - 1, 1)
+
+        return [words[int(round(i * step))] for i in range(count)]
+
+    def to_bytes(self):
+        """
+        Returns the image packed as bytes.
+        """
+
+        data = [MAGIC, struct.pack("<I", len(self.segments))]
+        for space, address, words in self.segments:
+            data.append(struct.pack("<cII", space.encode(), address, len(words)))
+            data.append(struct.pack(f"<{len(words)}I", *words))
+
+        return b"".join(data)
+
+    @classmethod
+    def from_bytes(cls, data, digest="", name=""):
+        """
+        Returns an image unpacked from bytes.
+        Raises ValueError if data is not a packed image.
+        """
+
+        if data[:4] != MAGIC:
+            raise ValueError("not a DSP image")
+
+        try:
+            (count,) = struct.unpack_from("<I", data, 4)
+            offset = 8
+            segments = []
+            for _ in range(count):
+                space, address, length = struct.unpack_from("<cII", data, offset)
+                offset += 9
+                words = list(struct.unpack_from(f"<{length}I", data, offset))
+                offset += 4 * length
+                segments.append([space.decode(), address, words])
+        except struct.error as e:
+            raise ValueError(f"truncated DSP image: {e}")
+
+        return cls(segments, digest, name)
+
+
+class LodCache(object):
+    """
+    Parses .lod files into LodImages, which are kept in memory and in
+    binary files keyed by the SHA-1 of the .lod file contents so each
+    version of a file is parsed only once.
+    The image last uploaded to each controller board is also recorded.
+    """
+
+    def __init__(self, folder=""):
+
+        # binary images are written here, empty for memory only
+        self.folder = folder
+
+        self.images = {}
+        self.boards = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, filename):
+        """
+        Returns the LodImage of a .lod file.
+        """
+
+        with open(filename, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        name = os.path.basename(filename)
+
+        with self.lock:
+            image = self.images.get(digest)
+        if image is not None:
+            self.hits += 1
+            return image
+
+        image = self.read_image(digest, name)
+        if image is None:
+            self.misses += 1
+            image = LodImage(parse_lod(data.decode("ascii", "replace")), digest, name)
+            self.write_image(image)
+        else:
+            self.hits += 1
+
+        with self.lock:
+            self.images[digest] = image
+
+        return image
+
+    def get_filename(self, digest):
+        """
+        Returns the binary image filename for a .lod file digest.
+        """
+
+        return os.path.join(self.folder, f"{digest}.bin")
+
+    def read_image(self, digest, name=""):
+        """
+        Internal Use Only.<br>
+        Returns a cached binary image, None if there is none.
+        """
+
+        if not self.folder:
+            return None
+
+        try:
+            with open(self.get_filename(digest), "rb") as f:
+                return LodImage.from_bytes(f.read(), digest, name)
+        except (OSError, ValueError):
+            return None
+
+    def write_image(self, image):
+        """
+        Internal Use Only.<br>
+        Writes a binary image.
+        """
+
+        self.write_file(self.get_filename(image.digest), image.to_bytes())
+
+        return
+
+    def write_file(self, filename, data):
+        """
+        Internal Use Only.<br>
+        Replaces a file in the cache folder.
+        Errors are ignored as the cache is optional.
+        """
+
+        if not self.folder:
+            return
+
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(filename + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(filename + ".tmp", filename)
+        except OSError:
+            pass
+
+        return
+
+    def read_board(self, board):
+        """
+        Returns the LodImage last uploaded to a board, None if not known.
+        board identifies the controller and board, for example "vattccdc_2405_2".
+        """
+
+        if board in self.boards or not self.folder:
+            return self.boards.get(board)
+
+        try:
+            with open(os.path.join(self.folder, f"board_{board}.txt"), "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+
+        with self.lock:
+            image = self.images.get(digest)
+
+        return image if image is not None else self.read_image(digest)
+
+    def write_board(self, board, image):
+        """
+        Records the LodImage uploaded to a board, None if not known.
+        """
+
+        self.boards[board] = image
+        digest = "" if image is None else image.digest
+        filename = os.path.join(self.folder, f"board_{board}.txt")
+        self.write_file(filename, digest.encode())
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of cache statistics.
+        """
+
+        return {"hits": self.hits, "misses": self.misses, "images": len(self.images)}
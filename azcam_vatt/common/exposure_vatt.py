@@ -0,0 +1,398 @@
+# Contains the ExposureVatt class which updates the image headers from all sources concurrently.
+
+import concurrent.futures
+import time
+
+from image_sender import ImageSender
+from latency_stats import stats
+from tracing import tracer
+
+import azcam
+from azcam_arc.exposure_arc import ExposureArc
+
+
+class ExposureVatt(ExposureArc):
+    """
+    ARC exposure class for the VATT systems.
+    Header sources (telescope, temperature controller, instrument...) are read
+    at the same time on a bounded thread pool, so header update time is that
+    of the slowest source rather than the sum of all sources.
+    Each exposure is traced as nested spans, see tracing.Tracer, and its
+    overhead beyond integration is logged.
+    Images are spooled and sent to the remote image server while the next
+    exposure starts, optionally tile compressed, see image_sender.ImageSender.
+    The telescope is told when integration starts and ends, so it reads
+    header data at shutter close during readout, see VattTCS.shutter_closed().
+    """
+
+    # headers which update_headers() does not read for each exposure
+    static_headers = ["controller", "system", "exposure", "focalplane"]
+
+    # exposure attributes sent to the remote image server with each image
+    send_parameters = [
+        "overwrite",
+        "test_image",
+        "display_image",
+        "filetype",
+        "size_x",
+        "size_y",
+    ]
+
+    # SendImage method of each image server type, for azcam versions
+    # without SendImage.imageserver_send
+    imageserver_methods = {
+        "azcam": "azcam_imageserver",
+        "dataserver": "dataserver",
+        "lbtguider": "lbtguider_imageserver",
+        "ccdacq": "ccdacq_imageserver",
+    }
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        # maximum number of header sources read at once, 0 to read serially
+        self.header_workers = 4
+        self.header_executor = None
+
+        # seconds taken by each header source for the last exposure
+        self.header_times = {}
+
+        # exposure span tracer, set tracer.folder to write trace files
+        self.tracer = tracer
+
+        # seconds taken by each exposure step for the last exposure
+        self.step_times = {}
+
+        # send images in the background, overlapping the next exposure,
+        # set sender.folder to spool images there
+        self.send_overlap = 1
+        self.sender = ImageSender()
+        self.install_sender()
+
+        # FITS tile compression of sent images, such as "RICE_1", "" for none
+        self.compression = ""
+
+    def get_header_tool(self, name):
+        """
+        Returns the tool which owns a header, or None.
+        """
+
+        tools = getattr(azcam.db, "tools", None)
+        if tools is not None and name in tools:
+            return tools[name]
+
+        return getattr(azcam.db, name, None)
+
+    def update_header_source(self, name, tool):
+        """
+        Updates one header and returns the time taken in seconds.
+        Errors are logged so all headers get updated.
+        """
+
+        t0 = time.perf_counter()
+        try:
+            with self.tracer.span(f"header {name}", "header"):
+                tool.update_header()
+        except Exception as e:
+            azcam.log(f"could not get {name} header: {e}")
+
+        return time.perf_counter() - t0
+
+    def trace_methods(self):
+        """
+        Wraps the image write and image send methods so they are traced.
+        """
+
+        targets = [
+            [self.image, "write_file", "write"],
+            [getattr(self, "sendimage", None), "send_image", "send"],
+        ]
+        for target, method, name in targets:
+            function = getattr(target, method, None)
+            if function is not None and not getattr(function, "traced", False):
+                setattr(target, method, self.tracer.traced(function, name))
+
+        return
+
+    def install_sender(self):
+        """
+        Wraps the image send method so images are sent by the ImageSender.
+        The send parameters of each image are taken when it is spooled, as
+        the next exposure may change them before the image is sent.
+        """
+
+        sendimage = getattr(self, "sendimage", None)
+        if sendimage is None or getattr(sendimage.send_image, "overlapped", False):
+            return
+
+        send = sendimage.send_image
+        if not getattr(send, "traced", False):
+            send = self.tracer.traced(send, "send")
+        self.sender.send = self.tracer.traced(self.send_spooled, "send")
+
+        def send_image(localfile=None, remotefile=None):
+            if localfile is not None and remotefile is not None:
+                parameters = self.get_send_parameters()
+                self.sender.submit(localfile, remotefile, self.compression, parameters)
+                if not self.send_overlap:
+                    self.sender.wait()
+            else:
+                self.sender.wait()
+                send(localfile, remotefile)
+
+        send_image.overlapped = True
+        send_image.traced = True
+        sendimage.send_image = send_image
+
+        return
+
+    def get_status(self):
+        """
+        Return a variety of system status data in one dictionary.
+        Adds the number of images waiting to be sent (spool_depth) and the age
+        in seconds of the oldest (spool_lag), see ImageSender.get_status().
+        """
+
+        status = super().get_status()
+
+        spool = self.sender.get_status()
+        status["spool_depth"] = spool["depth"]
+        status["spool_lag"] = round(spool["lag"], 1)
+
+        return status
+
+    def get_send_parameters(self):
+        """
+        Returns a dictionary of the current exposure attributes which are sent
+        with an image, see send_parameters.
+        """
+
+        return {name: getattr(self, name, 0) for name in self.send_parameters}
+
+    def send_spooled(self, localfile, remotefile, parameters):
+        """
+        Sends an image file to the remote image server with the send
+        parameters taken when it was spooled, see get_send_parameters().
+        """
+
+        sendimage = self.sendimage
+        for name, value in parameters.items():
+            setattr(sendimage, name, value)
+
+        transfer = getattr(sendimage, "imageserver_send", None)
+        if transfer is None:
+            method = self.imageserver_methods[sendimage.remote_imageserver_type]
+            transfer = getattr(sendimage, method)
+        transfer(localfile, remotefile)
+
+        return
+
+    def wait_send(self, timeout=None):
+        """
+        Waits for all images to be sent to the remote image server.
+        Returns True if they have been sent.
+        """
+
+        return self.sender.wait(timeout)
+
+    def expose(self, *args, **kwargs):
+        """
+        Make a complete exposure, traced as nested spans.
+        See ExposureArc.expose().
+        """
+
+        if not self.tracer.enabled:
+            self.install_sender()
+            return super().expose(*args, **kwargs)
+
+        self.trace_methods()
+        self.install_sender()
+        self.tracer.start_collect()
+        try:
+            with self.tracer.span("expose"):
+                reply = super().expose(*args, **kwargs)
+        finally:
+            self.log_overhead(self.tracer.stop_collect())
+            self.tracer.flush()
+
+        return reply
+
+    def begin(self, *args, **kwargs):
+        """
+        Begin an exposure, traced.
+        """
+
+        with self.tracer.span("begin"):
+            return super().begin(*args, **kwargs)
+
+    def get_telescope(self):
+        """
+        Returns the telescope tool if it reads header data at shutter close,
+        else None.
+        """
+
+        telescope = self.get_header_tool("telescope")
+        if not hasattr(telescope, "shutter_closed"):
+            return None
+
+        return telescope
+
+    def integrate(self, *args, **kwargs):
+        """
+        Integration, traced.
+        """
+
+        telescope = self.get_telescope()
+        if telescope is not None:
+            telescope.shutter_opened()
+
+        try:
+            with self.tracer.span("integrate"):
+                return super().integrate(*args, **kwargs)
+        finally:
+            if telescope is not None:
+                telescope.shutter_closed()
+
+    def readout(self, *args, **kwargs):
+        """
+        Exposure readout, traced.
+        """
+
+        with self.tracer.span("readout"):
+            return super().readout(*args, **kwargs)
+
+    def end(self, *args, **kwargs):
+        """
+        Completes an exposure by writing file and displaying image, traced.
+        Header data read at shutter close is added first.
+        """
+
+        with self.tracer.span("end"):
+            self.update_exposure_headers()
+            return super().end(*args, **kwargs)
+
+    def update_exposure_headers(self):
+        """
+        Adds the header data read at shutter close to the headers.
+        Errors are logged so the image is still written.
+        """
+
+        telescope = self.get_telescope()
+        if telescope is None:
+            return
+
+        try:
+            with self.tracer.span("header close", "header"):
+                telescope.update_exposure_header()
+        except Exception as e:
+            azcam.log(f"could not get telescope header at shutter close: {e}")
+
+        return
+
+    def log_overhead(self, spans):
+        """
+        Logs the time of each exposure step and the overhead, which is the
+        exposure time not spent integrating.
+        """
+
+        spans = sorted(spans, key=lambda span: span[1])
+        starts = [start for name, start, duration in spans if name == "expose"]
+
+        times = {}
+        for name, start, duration in spans:
+            if name.startswith("header "):
+                continue
+            # background send of the previous image
+            if starts and start < starts[0]:
+                continue
+            times[name] = times.get(name, 0.0) + duration
+        self.step_times = times
+
+        if "expose" not in times:
+            return
+
+        overhead = times["expose"] - times.get("integrate", 0.0)
+        steps = " ".join(
+            [
+                f"{name} {t:.3f}"
+                for name, t in times.items()
+                if name not in ["expose", "integrate"]
+            ]
+        )
+        azcam.log(f"Exposure overhead {overhead:.3f} s: {steps}")
+        stats.record("exposure", "overhead", overhead)
+
+        return
+
+    def update_headers(self):
+        """
+        Update all headers, reading current data.
+        """
+
+        with self.tracer.span("header"):
+            self._update_headers()
+
+        return
+
+    def _update_headers(self):
+        """
+        Internal Use Only.<br>
+        Updates the headers, see update_headers().
+        """
+
+        # set flag that update is in progress
+        self.updating_header = 1
+
+        sources = []
+        for name in list(azcam.db.headers):
+            if name in self.static_headers:
+                continue
+            tool = self.get_header_tool(name)
+            if tool is None:
+                azcam.log(f"could not get {name} header: no tool")
+                continue
+            sources.append([name, tool])
+
+        # focalplane header is not in db
+        sources.append(["focalplane", self.image.focalplane])
+
+        t0 = time.perf_counter()
+        if self.header_workers > 0:
+            if self.header_executor is None:
+                self.header_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.header_workers, thread_name_prefix="headers"
+                )
+            futures = [
+                [
+                    name,
+                    self.header_executor.submit(self.update_header_source, name, tool),
+                ]
+                for name, tool in sources
+            ]
+            times = {name: future.result() for name, future in futures}
+        else:
+            times = {
+                name: self.update_header_source(name, tool) for name, tool in sources
+            }
+        times["total"] = time.perf_counter() - t0
+        self.header_times = times
+        for name in times:
+            stats.record("header", name, times[name])
+
+        # system header last as it may use values from the other headers
+        if "system" in azcam.db.headers:
+            try:
+                azcam.db.headers["system"].update_header()
+            except Exception:
+                pass
+
+        self.updating_header = 0
+
+        if azcam.db.verbosity > 1:
+            azcam.log(
+                "Header times: "
+                + " ".join([f"{name} {t:.3f}" for name, t in self.header_times.items()])
+            )
+
+        return
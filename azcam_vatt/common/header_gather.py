@@ -0,0 +1,288 @@
+# Contains the HeaderGatherer class which reads header data from remote services within a time budget.
+
+import concurrent.futures
+import threading
+import time
+
+
+class GatherError(Exception):
+    """
+    A header source could not be read within the budget or its circuit is open.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Tracks failures of one service endpoint.
+    After threshold consecutive failures the circuit opens and calls are skipped
+    for cooloff seconds. One trial call is then allowed, which closes the circuit
+    on success or opens it again on failure.
+    """
+
+    def __init__(self, name, threshold=3, cooloff=30.0):
+
+        self.name = name
+        self.threshold = threshold
+        self.cooloff = cooloff
+
+        self.failures = 0
+        self.opened = 0.0
+        self.trial = False
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns True if a call to the endpoint may be made.
+        """
+
+        with self.lock:
+            if self.failures < self.threshold:
+                return True
+            if self.trial or time.time() - self.opened < self.cooloff:
+                return False
+            self.trial = True
+
+            return True
+
+    def success(self):
+        """
+        Records a successful call.
+        """
+
+        with self.lock:
+            self.failures = 0
+            self.trial = False
+
+    def failure(self):
+        """
+        Records a failed call.
+        """
+
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if not self.trial:
+                    self.trips += 1
+                self.opened = time.time()
+            self.trial = False
+
+    def get_state(self):
+        """
+        Returns "closed", "open", or "half-open".
+        """
+
+        with self.lock:
+            if self.failures < self.threshold:
+                return "closed"
+            if self.trial or time.time() - self.opened >= self.cooloff:
+                return "half-open"
+
+            return "open"
+
+
+class HeaderGatherer(object):
+    """
+    Reads header data from remote services within an overall deadline.
+    Each call runs on a worker thread so a hung service cannot hold the caller
+    past the deadline. Failed calls are retried with exponential backoff while
+    budget remains. Each endpoint has a CircuitBreaker so a service known to be
+    down is skipped. Last known good values are kept by keyword for fallback.
+    The deadline is kept for each thread, so headers read at the same time by
+    different threads each have their own, see share() for reads submitted to
+    other threads.
+    """
+
+    def __init__(self, budget=3.0, backoff_min=0.1, backoff_max=1.0, workers=4):
+
+        # time allowed for all reads of one header, seconds
+        self.budget = budget
+
+        # delay between retries, seconds
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        # circuit breaker settings for new endpoints
+        self.threshold = 3
+        self.cooloff = 30.0
+
+        self.local = threading.local()
+        self.breakers = {}
+        self.last_good = {}
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="headergather"
+        )
+
+        # counters
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.fallbacks = 0
+
+    def start(self, budget=None):
+        """
+        Starts the deadline for reading one header in the calling thread.
+        Until finish() is called all calls of this thread share this deadline.
+        """
+
+        if budget is None:
+            budget = self.budget
+        self.local.deadline = time.time() + budget
+
+        return
+
+    def get_deadline(self):
+        """
+        Returns the header deadline of the calling thread, 0.0 if none is running.
+        """
+
+        return getattr(self.local, "deadline", 0.0)
+
+    def share(self, function):
+        """
+        Returns a function which calls function with the header deadline of
+        the calling thread, for reads of one header run on other threads.
+        """
+
+        deadline = self.get_deadline()
+
+        def shared(*args):
+            self.local.deadline = deadline
+            try:
+                return function(*args)
+            finally:
+                self.local.deadline = 0.0
+
+        return shared
+
+    def remaining(self):
+        """
+        Returns the seconds left before the header deadline, or the full
+        budget if no deadline is running.
+        """
+
+        deadline = self.get_deadline()
+        if deadline > 0:
+            return max(0.0, deadline - time.time())
+
+        return self.budget
+
+    def finish(self):
+        """
+        Ends the header deadline of the calling thread. Later calls each get
+        a full budget.
+        """
+
+        self.local.deadline = 0.0
+
+        return
+
+    def get_breaker(self, endpoint):
+        """
+        Returns the CircuitBreaker for an endpoint.
+        """
+
+        with self.lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self.threshold, self.cooloff)
+                self.breakers[endpoint] = breaker
+
+        return breaker
+
+    def count(self, counter):
+        """
+        Adds one to a counter, which may be updated by several threads.
+        """
+
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+        return
+
+    def call(self, endpoint, function, *args):
+        """
+        Calls function(*args) for an endpoint and returns its value.
+        The function must raise an exception on failure.
+        Raises GatherError if the circuit is open or no call succeeds before the deadline.
+        """
+
+        deadline = time.time() + self.remaining()
+        if deadline <= time.time():
+            # budget was used by other reads, not a failure of this endpoint
+            self.count("timeouts")
+            raise GatherError(f"{endpoint} not read, header deadline passed")
+
+        breaker = self.get_breaker(endpoint)
+        if not breaker.allow():
+            self.count("skipped")
+            raise GatherError(f"{endpoint} is not responding, skipped")
+
+        delay = self.backoff_min
+        self.count("calls")
+
+        while True:
+            remaining = max(0.0, deadline - time.time())
+            future = self.executor.submit(function, *args)
+            try:
+                value = future.result(remaining)
+                breaker.success()
+                return value
+            except concurrent.futures.TimeoutError:
+                self.count("timeouts")
+                breaker.failure()
+                raise GatherError(f"{endpoint} did not reply before header deadline")
+            except Exception as e:
+                error = e
+
+            # retry only if there is budget left after the backoff
+            if deadline - time.time() <= delay:
+                breaker.failure()
+                raise GatherError(f"{endpoint} read failed: {error}")
+            self.count("retries")
+            time.sleep(delay)
+            delay = min(delay * 2, self.backoff_max)
+
+    def set_good(self, keyword, value):
+        """
+        Stores the last known good value of a keyword.
+        """
+
+        self.last_good[keyword] = [value, time.time()]
+
+        return
+
+    def get_good(self, keyword):
+        """
+        Returns [value, time] of the last known good value of a keyword, or None.
+        """
+
+        good = self.last_good.get(keyword)
+        if good is not None:
+            self.count("fallbacks")
+
+        return good
+
+    def get_stats(self):
+        """
+        Returns a dictionary of counters and the state of each endpoint.
+        """
+
+        with self.lock:
+            stats = {
+                "calls": self.calls,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "skipped": self.skipped,
+                "fallbacks": self.fallbacks,
+            }
+
+        return {
+            **stats,
+            "endpoints": {
+                name: breaker.get_state()
+                for name, breaker in list(self.breakers.items())
+            },
+        }
@@ -0,0 +1,48 @@
+# Contains functions which tile compress FITS image files, run in a worker process by ImageSender.
+
+import os
+import time
+
+import numpy
+from astropy.io import fits
+
+
+def compress_file(filename, outfile, compression="RICE_1"):
+    """
+    Writes a tile compressed (fpack compatible) copy of a FITS or MEF file.
+    Integer images are compressed losslessly, one row per tile.
+    Other HDUs are copied, as compressing floating point images loses data.
+    A primary image is moved to the first extension, as fpack does.
+    Returns [input bytes, output bytes, CPU seconds].
+    """
+
+    t0 = time.process_time()
+
+    hdus = []
+    with fits.open(filename) as hdulist:
+        for index, hdu in enumerate(hdulist):
+            integer = hdu.data is not None and numpy.issubdtype(
+                hdu.data.dtype, numpy.integer
+            )
+            if index == 0:
+                if integer:
+                    hdus.append(fits.PrimaryHDU())
+                else:
+                    hdus.append(hdu.copy())
+                    continue
+            if integer:
+                header = hdu.header.copy()
+                if index == 0:
+                    header.remove("SIMPLE", ignore_missing=True)
+                    header.remove("EXTEND", ignore_missing=True)
+                hdus.append(
+                    fits.CompImageHDU(hdu.data, header, compression_type=compression)
+                )
+            else:
+                hdus.append(hdu.copy())
+
+        fits.HDUList(hdus).writeto(outfile, overwrite=True)
+
+    cpu = time.process_time() - t0
+
+    return [os.path.getsize(filename), os.path.getsize(outfile), cpu]
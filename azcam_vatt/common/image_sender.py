@@ -0,0 +1,344 @@
+# Contains the ImageSender class which spools image files and sends them to the remote image server in the background.
+
+import concurrent.futures
+import glob
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from image_compress import compress_file
+from latency_stats import stats
+
+import azcam
+
+
+class ImageSender(object):
+    """
+    Write-behind spool for images sent to the remote image server.
+    Each image file is moved to a spool folder and queued, and a background
+    thread sends the queued images in order, retrying each image until it
+    is sent. The next exposure waits only if the queue is full.
+    Images left in the spool folder by an earlier run are sent on start(),
+    with the send parameters stored when they were spooled.
+    Images may be tile compressed first, in a worker process so compression
+    does not slow the server, see image_compress.compress_file().
+    """
+
+    def __init__(self, send=None, folder=""):
+
+        # function(localfile, remotefile, parameters) which sends one file,
+        # parameters is the dictionary given to submit()
+        self.send = send
+
+        # spool folder, "" to spool in the folder of each written file
+        self.folder = folder
+
+        # maximum number of images waiting to be sent
+        self.queue_size = 8
+
+        # seconds before an image is sent again, doubled up to retry_max
+        self.retry_delay = 2.0
+        self.retry_max = 60.0
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+
+        # spool entries not yet sent, oldest first
+        self.pending = []
+        self.last_stamp = 0
+
+        self.sent = 0
+        self.failures = 0
+
+        # failed attempts to send the current image
+        self.retries = 0
+
+        # last send error, "" if the last attempt worked
+        self.error = ""
+
+        # seconds taken by the last send, and from submit to sent
+        self.send_time = 0.0
+        self.lag = 0.0
+
+        # appended to the names of compressed files
+        self.compress_suffix = ".fz"
+        self.executor = None
+
+        # ratio, cpu and wall seconds, and sizes of the last compression
+        self.compress_stats = {}
+
+    def start(self):
+        """
+        Queues images left in the spool folder and starts the sender thread.
+        """
+
+        if self.thread is not None:
+            return
+
+        self.queue = queue.Queue()
+        self.stopping.clear()
+
+        entries = []
+        if self.folder:
+            for filename in sorted(glob.glob(os.path.join(self.folder, "*.json"))):
+                try:
+                    with open(filename, "r") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if os.path.exists(entry["file"]):
+                    # entries spooled without parameters use the current ones
+                    entry.setdefault("parameters", {})
+                    entries.append(entry)
+                else:
+                    os.remove(filename)
+        if entries:
+            azcam.log(f"Sending {len(entries)} spooled images")
+
+        with self.lock:
+            self.pending = entries + self.pending
+        for entry in entries:
+            self.queue.put(entry)
+
+        self.thread = threading.Thread(target=self.run, name="imagesend", daemon=True)
+        self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stops the sender thread after the current attempt.
+        Images not yet sent stay in the spool folder.
+        """
+
+        if self.thread is None:
+            return
+
+        self.stopping.set()
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+        with self.lock:
+            self.pending = []
+
+        return
+
+    def submit(self, localfile, remotefile, compression="", parameters=None):
+        """
+        Moves localfile to the spool folder and queues it to be sent as remotefile.
+        Waits if the queue is full.
+        compression is a FITS tile compression type such as "RICE_1", or ""
+        to send the file as written.
+        parameters is a dictionary of send parameters of the image, such as
+        its filetype, which is passed to send.
+        """
+
+        if self.thread is None:
+            self.start()
+
+        with self.idle:
+            if len(self.pending) >= self.queue_size:
+                azcam.log("Image spool is full, waiting for images to be sent")
+                self.idle.wait_for(lambda: len(self.pending) < self.queue_size)
+
+        # millisecond stamps keep names unique and in order across restarts
+        stamp = max(int(time.time() * 1000), self.last_stamp + 1)
+        self.last_stamp = stamp
+        name = f"{stamp:013d}_{os.path.basename(remotefile)}"
+
+        folder = self.folder or os.path.dirname(localfile)
+        os.makedirs(folder, exist_ok=True)
+        spoolfile = os.path.join(folder, name)
+        shutil.move(localfile, spoolfile)
+
+        entry = {
+            "file": spoolfile,
+            "remotefile": remotefile,
+            "compression": compression,
+            "parameters": parameters or {},
+            "submitted": time.time(),
+            "entry": os.path.join(folder, name + ".json"),
+        }
+        self.write_entry(entry)
+
+        with self.lock:
+            self.pending.append(entry)
+        self.queue.put(entry)
+
+        return
+
+    def write_entry(self, entry):
+        """
+        Internal Use Only.<br>
+        Writes the file which describes a spooled image, including its send
+        parameters so they are used if the image is sent after a restart.
+        """
+
+        with open(entry["entry"] + ".tmp", "w") as f:
+            json.dump(entry, f, default=_plain)
+        os.replace(entry["entry"] + ".tmp", entry["entry"])
+
+        return
+
+    def run(self):
+        """
+        Internal Use Only.<br>
+        Sends queued images in order until stopped.
+        """
+
+        while not self.stopping.is_set():
+            entry = self.queue.get()
+            if entry is None:
+                break
+
+            if self.send_entry(entry):
+                for filename in [entry["file"], entry["entry"]]:
+                    try:
+                        os.remove(filename)
+                    except OSError:
+                        pass
+                with self.lock:
+                    self.pending.remove(entry)
+                    self.idle.notify_all()
+
+        return
+
+    def send_entry(self, entry):
+        """
+        Internal Use Only.<br>
+        Sends one spooled image, retrying until it is sent.
+        Returns False if stopped before the image was sent.
+        """
+
+        if entry["compression"] and not entry["file"].endswith(self.compress_suffix):
+            self.compress(entry)
+
+        delay = self.retry_delay
+        self.retries = 0
+        while True:
+            t0 = time.perf_counter()
+            try:
+                self.send(entry["file"], entry["remotefile"], entry["parameters"])
+                break
+            except Exception as e:
+                self.retries += 1
+                self.failures += 1
+                self.error = str(e)
+                stats.record("exposure", "send", time.perf_counter() - t0, True)
+                azcam.log(
+                    f"Could not send image {entry['remotefile']}, "
+                    f"retry {self.retries} in {delay:.0f} s: {e}"
+                )
+                if self.stopping.wait(delay):
+                    return False
+                delay = min(2 * delay, self.retry_max)
+
+        self.send_time = time.perf_counter() - t0
+        self.lag = time.time() - entry["submitted"]
+        self.retries = 0
+        self.error = ""
+        self.sent += 1
+        stats.record("exposure", "send", self.send_time)
+        stats.record("exposure", "spool lag", self.lag)
+
+        return True
+
+    def compress(self, entry):
+        """
+        Internal Use Only.<br>
+        Compresses a spooled image in the worker process.
+        The image is sent uncompressed if compression fails.
+        """
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+
+        sendfile = entry["file"]
+        remotefile = entry["remotefile"]
+        outfile = sendfile + self.compress_suffix
+        t0 = time.perf_counter()
+        try:
+            future = self.executor.submit(
+                compress_file, sendfile, outfile, entry["compression"]
+            )
+            size, compressed, cpu = future.result()
+        except Exception as e:
+            # a worker process which died cannot be reused
+            if isinstance(e, BrokenProcessPool):
+                self.executor = None
+            azcam.log(f"Could not compress image {remotefile}, sent uncompressed: {e}")
+            return
+
+        seconds = time.perf_counter() - t0
+        ratio = size / compressed if compressed else 0.0
+        self.compress_stats = {
+            "ratio": ratio,
+            "cpu": cpu,
+            "time": seconds,
+            "size": size,
+            "compressed": compressed,
+        }
+        stats.record("exposure", "compress", seconds)
+        stats.record("exposure", "compress cpu", cpu)
+        stats.count("exposure", "bytes", size)
+        stats.count("exposure", "bytes compressed", compressed)
+        azcam.log(f"Compressed image {remotefile} {ratio:.2f}x using {cpu:.2f} s CPU")
+
+        entry["file"] = outfile
+        entry["remotefile"] = remotefile + self.compress_suffix
+        self.write_entry(entry)
+        os.remove(sendfile)
+
+        return
+
+    def wait(self, timeout=None):
+        """
+        Waits for all spooled images to be sent.
+        Returns True if no images are waiting.
+        """
+
+        with self.idle:
+            return self.idle.wait_for(lambda: len(self.pending) == 0, timeout)
+
+    def get_status(self):
+        """
+        Returns a dictionary of spool status, including the number of images
+        waiting (depth) and the age in seconds of the oldest (lag).
+        """
+
+        with self.lock:
+            depth = len(self.pending)
+            oldest = self.pending[0]["submitted"] if depth else 0.0
+
+        return {
+            "depth": depth,
+            "queue_size": self.queue_size,
+            "lag": time.time() - oldest if depth else 0.0,
+            "last_lag": self.lag,
+            "sent": self.sent,
+            "failures": self.failures,
+            "retries": self.retries,
+            "error": self.error,
+            "send_time": self.send_time,
+            "compress": self.compress_stats,
+            "folder": self.folder,
+        }
+
+
+def _plain(value):
+    """
+    Returns a NumPy scalar as a Python value so it can be written as JSON.
+    """
+
+    if hasattr(value, "item"):
+        return value.item()
+
+    raise TypeError(f"{type(value).__name__} cannot be written to a spool entry")
@@ -0,0 +1,81 @@
+# Contains the IndiStreamParser class, an incremental parser for INDI XML streams.
+
+import xml.etree.ElementTree as ElementTree
+
+
+class IndiStreamParser(object):
+    """
+    Incremental parser for an INDI XML stream.
+    Data may be fed in fragments of any size. Each top level element such as
+    message, defXXX, or setXXX is returned as soon as its closing tag arrives.
+    """
+
+    def __init__(self):
+
+        self.errors = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Starts a new stream.
+        """
+
+        # an INDI stream has no root element so one is supplied
+        self.parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self.parser.feed(b"<indi>")
+        self.root = None
+        self.depth = 0
+
+    def feed(self, data):
+        """
+        Parses more of the stream and returns a list of the top level
+        elements completed by this data.
+        data is bytes or str.
+        """
+
+        if isinstance(data, str):
+            data = data.encode()
+
+        elements = []
+        try:
+            self.parser.feed(data)
+            for event, element in self.parser.read_events():
+                if event == "start":
+                    self.depth += 1
+                    if self.root is None:
+                        self.root = element
+                    continue
+                self.depth -= 1
+                if self.depth == 1:
+                    elements.append(element)
+                    # completed elements are not kept in the tree
+                    self.root.remove(element)
+        except ElementTree.ParseError:
+            self.errors += 1
+            self.reset()
+
+        return elements
+
+
+def get_filters(element):
+    """
+    Returns a dictionary with the filters in the beam from a FILTERS message
+    element with a message attribute like "upper:clear lower:U",
+    or None if the element is not a FILTERS message.
+    """
+
+    if element.tag != "message" or element.get("device") != "FILTERS":
+        return None
+
+    text = element.get("message", "")
+    i = text.find("lower")
+    if i < 0:
+        return None
+
+    upper, lower = text[:i], text[i:]
+    upper = upper.split(":", 1)
+    lower = lower.split(":", 1)
+    if len(upper) != 2 or len(lower) != 2:
+        return None
+
+    return {upper[0]: upper[1], lower[0]: lower[1]}
@@ -0,0 +1,242 @@
+# Contains the LatencyHistogram and LatencyStats classes which record operation times.
+
+import threading
+import time
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear (HDR style) histogram of times in microseconds.
+    Each power of two range is divided into 2**sub_bits buckets, so recorded
+    values keep about 1 part in 2**sub_bits precision from 1 us to hours.
+    """
+
+    def __init__(self, sub_bits=4, max_bits=36):
+
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.counts = [0] * ((max_bits - sub_bits + 1) * self.sub_count)
+
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def get_index(self, value):
+        """
+        Returns the bucket index for a value in microseconds.
+        """
+
+        if value < self.sub_count:
+            return value
+
+        shift = value.bit_length() - self.sub_bits
+        index = shift * self.sub_count + (value >> (shift - 1)) - self.sub_count
+
+        return min(index, len(self.counts) - 1)
+
+    def get_value(self, index):
+        """
+        Returns the middle value of a bucket in microseconds.
+        """
+
+        if index < self.sub_count:
+            return float(index)
+
+        shift = index // self.sub_count
+        low = (index % self.sub_count + self.sub_count) << (shift - 1)
+
+        return low + ((1 << (shift - 1)) - 1) / 2.0
+
+    def record(self, seconds, error=False):
+        """
+        Adds one time in seconds.
+        """
+
+        self.counts[self.get_index(int(seconds * 1e6))] += 1
+        if self.count == 0 or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+
+    def percentile(self, percent):
+        """
+        Returns the time in seconds below which percent of the values fall.
+        """
+
+        if self.count == 0:
+            return 0.0
+
+        target = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.get_value(index) / 1e6, self.max)
+
+        return self.max
+
+    def get_stats(self):
+        """
+        Returns a dictionary of count, errors, and times in seconds.
+        """
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class LatencyStats(object):
+    """
+    Latency histograms and event counters by group and operation,
+    for example group "tcs" and operation "REQUEST ALL".
+    """
+
+    # quantiles reported in Prometheus text
+    quantiles = [0.5, 0.9, 0.99]
+
+    def __init__(self):
+
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, group, op, seconds, error=False):
+        """
+        Records the time in seconds of one operation.
+        """
+
+        key = (group, op)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.histograms[key] = histogram
+            histogram.record(seconds, error)
+
+        return
+
+    def count(self, group, name, n=1):
+        """
+        Adds n to an event counter.
+        """
+
+        key = (group, name)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+        return
+
+    def reset(self):
+        """
+        Clears all histograms and counters.
+        """
+
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of {"latency": {group: {op: stats}}, "counters": ...}.
+        """
+
+        latency = {}
+        counters = {}
+        with self.lock:
+            for (group, op), histogram in sorted(self.histograms.items()):
+                latency.setdefault(group, {})[op] = histogram.get_stats()
+            for (group, name), value in sorted(self.counters.items()):
+                counters.setdefault(group, {})[name] = value
+
+        return {
+            "uptime": time.time() - self.started,
+            "latency": latency,
+            "counters": counters,
+        }
+
+    def get_prometheus(self, prefix="vatt"):
+        """
+        Returns all histograms and counters in Prometheus text format.
+        """
+
+        lines = [
+            f"# HELP {prefix}_latency_seconds Operation latency.",
+            f"# TYPE {prefix}_latency_seconds summary",
+        ]
+        counters = [
+            f"# HELP {prefix}_errors_total Operations which failed.",
+            f"# TYPE {prefix}_errors_total counter",
+        ]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            events = sorted(self.counters.items())
+            for (group, op), histogram in histograms:
+                labels = f'group="{_escape(group)}",op="{_escape(op)}"'
+                for q in self.quantiles:
+                    value = histogram.percentile(q * 100)
+                    lines.append(
+                        f'{prefix}_latency_seconds{{{labels},quantile="{q}"}} {value:.6f}'
+                    )
+                lines.append(
+                    f"{prefix}_latency_seconds_sum{{{labels}}} {histogram.total:.6f}"
+                )
+                lines.append(
+                    f"{prefix}_latency_seconds_count{{{labels}}} {histogram.count}"
+                )
+                counters.append(f"{prefix}_errors_total{{{labels}}} {histogram.errors}")
+
+        lines += counters
+        lines += [
+            f"# HELP {prefix}_events_total Event counts.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for (group, name), value in events:
+            labels = f'group="{_escape(group)}",name="{_escape(name)}"'
+            lines.append(f"{prefix}_events_total{{{labels}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# shared by all VATT tools
+stats = LatencyStats()
+
+
+def load(webserver):
+    """
+    Adds the /latency (JSON) and /metrics (Prometheus text) pages to a running web server.
+    """
+
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    app = webserver.app
+
+    @app.get("/latency", response_class=JSONResponse)
+    def latency():
+        return stats.get_stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return stats.get_prometheus()
+
+    return
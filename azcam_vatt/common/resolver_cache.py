@@ -0,0 +1,208 @@
+# Contains the ResolverCache class, a shared host name cache for the telescope and filter connections.
+
+import socket
+import threading
+import time
+
+
+class ResolverCache(object):
+    """
+    Caches host name to IPv4 address lookups.
+    Entries expire after ttl seconds and are refreshed in a background thread
+    once refresh_fraction of ttl has passed, so callers rarely wait on DNS.
+    Failed lookups are cached for negative_ttl seconds. If a refresh fails the
+    last good address is kept and used until a lookup succeeds.
+    """
+
+    def __init__(self, ttl=300.0, negative_ttl=10.0, refresh_fraction=0.8):
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_fraction = refresh_fraction
+
+        # host: [address, time resolved, error]
+        self.entries = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.stale = 0
+        self.lookups = 0
+        self.lookup_time = 0.0
+        self.lookup_time_max = 0.0
+
+    def lookup(self, host):
+        """
+        Resolves host with the system resolver and returns the address.
+        Raises socket.gaierror on failure.
+        """
+
+        t0 = time.perf_counter()
+        try:
+            info = socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_STREAM)
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self.lock:
+                self.lookups += 1
+                self.lookup_time += elapsed
+                self.lookup_time_max = max(self.lookup_time_max, elapsed)
+
+        return info[0][4][0]
+
+    def update(self, host):
+        """
+        Resolves host and stores the result.
+        Returns the address, or raises socket.gaierror if there is no usable address.
+        """
+
+        try:
+            address = self.lookup(host)
+        except OSError as inst:
+            with self.lock:
+                self.failures += 1
+                entry = self.entries.get(host)
+                if entry is not None and entry[0] is not None:
+                    # keep serving the last good address
+                    self.stale += 1
+                    return entry[0]
+                self.entries[host] = [None, time.time(), inst]
+            raise socket.gaierror("could not resolve %s: %s" % (host, inst))
+
+        with self.lock:
+            self.entries[host] = [address, time.time(), None]
+
+        return address
+
+    def refresh(self, host):
+        """
+        Background refresh of one entry.
+        """
+
+        try:
+            self.update(host)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.refreshing.discard(host)
+
+    def resolve(self, host):
+        """
+        Returns the address of host, from the cache if possible.
+        Raises socket.gaierror if host cannot be resolved.
+        """
+
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry is not None:
+                address, resolved, error = entry
+                age = now - resolved
+                if address is None:
+                    if age < self.negative_ttl:
+                        self.negative_hits += 1
+                        raise socket.gaierror(
+                            "could not resolve %s: %s" % (host, error)
+                        )
+                elif age < self.ttl:
+                    self.hits += 1
+                    if (
+                        age > self.ttl * self.refresh_fraction
+                        and host not in self.refreshing
+                    ):
+                        self.refreshing.add(host)
+                        self.refreshes += 1
+                        threading.Thread(
+                            target=self.refresh,
+                            args=(host,),
+                            name="resolver",
+                            daemon=True,
+                        ).start()
+                    return address
+            self.misses += 1
+
+        return self.update(host)
+
+    def get_cached(self, host):
+        """
+        Returns the cached address of host if it has not expired, else None.
+        Does not block on a lookup.
+        """
+
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry is None or entry[0] is None:
+                return None
+            if time.time() - entry[1] >= self.ttl:
+                return None
+            self.hits += 1
+
+            return entry[0]
+
+    def invalidate(self, host=None):
+        """
+        Removes host, or all hosts if None, from the cache.
+        """
+
+        with self.lock:
+            if host is None:
+                self.entries = {}
+            else:
+                self.entries.pop(host, None)
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of cache counters and lookup times in seconds.
+        """
+
+        with self.lock:
+            requests = self.hits + self.misses + self.negative_hits
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "hit_rate": (self.hits / requests) if requests else 0.0,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "stale": self.stale,
+                "lookups": self.lookups,
+                "lookup_time_mean": (
+                    (self.lookup_time / self.lookups) if self.lookups else 0.0
+                ),
+                "lookup_time_max": self.lookup_time_max,
+                "entries": len(self.entries),
+            }
+
+
+# shared by all telescope and filter connections
+resolver = ResolverCache()
+
+
+def resolve(host):
+    """
+    Returns the address of host from the shared resolver cache.
+    """
+
+    return resolver.resolve(host)
+
+
+def create_connection(host, port, timeout=None):
+    """
+    Returns a socket connected to host, resolved by the shared resolver cache.
+    The cached address is removed if the connection fails, so the next
+    connection looks host up again in case its address has changed.
+    """
+
+    address = resolver.resolve(host)
+    try:
+        return socket.create_connection((address, port), timeout=timeout)
+    except OSError:
+        resolver.invalidate(host)
+        raise
@@ -0,0 +1,111 @@
+# Contains the StartupTimer class which times server startup steps and runs independent steps in the background.
+
+import importlib
+import threading
+import time
+
+import azcam
+
+
+class StartupTimer(object):
+    """
+    Records the time taken by each step of server startup.
+    Steps which do not depend on each other may run in background threads,
+    and their results are collected by wait().
+    """
+
+    def __init__(self, start=None):
+
+        # time.perf_counter() at the start of the server script
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+
+        # [name, seconds, background]
+        self.steps = []
+        self.threads = {}
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, background=False):
+        """
+        Adds a step which has been timed elsewhere.
+        """
+
+        with self.lock:
+            self.steps.append([name, seconds, background])
+
+        return
+
+    def mark(self, name):
+        """
+        Ends a foreground step, which started at the previous mark.
+        """
+
+        now = time.perf_counter()
+        self.add(name, now - self.last)
+        self.last = now
+
+        return
+
+    def background(self, name, function, *args):
+        """
+        Runs function(*args) in a background thread as a step.
+        The result is returned by wait(), None if the function raised an exception.
+        """
+
+        def run():
+            t0 = time.perf_counter()
+            try:
+                self.results[name] = function(*args)
+            except Exception as e:
+                self.results[name] = None
+                azcam.log(f"Startup step {name} failed: {e}")
+            self.add(name, time.perf_counter() - t0, True)
+
+        thread = threading.Thread(target=run, name=f"startup {name}", daemon=True)
+        self.threads[name] = thread
+        thread.start()
+
+        return
+
+    def wait(self, name, timeout=None):
+        """
+        Waits for a background step to finish and returns its result.
+        """
+
+        t0 = time.perf_counter()
+        self.threads[name].join(timeout)
+        waited = time.perf_counter() - t0
+        self.last += waited
+        if waited > 0.01:
+            self.add(f"wait for {name}", waited)
+
+        return self.results.get(name)
+
+    def import_modules(self, names):
+        """
+        Imports a list of modules, for running in the background so that
+        later imports of them are immediate.
+        """
+
+        for name in names:
+            importlib.import_module(name)
+
+        return
+
+    def report(self):
+        """
+        Logs the time of each step and the total startup time.
+        Background steps are marked with *.
+        """
+
+        total = time.perf_counter() - self.start
+        azcam.log("Startup times (seconds, * in background):")
+        with self.lock:
+            steps = list(self.steps)
+        for name, seconds, background in steps:
+            flag = "*" if background else " "
+            azcam.log(f"  {flag} {name:30s} {seconds:7.3f}")
+        azcam.log(f"    {'total':30s} {total:7.3f}")
+
+        return
@@ -0,0 +1,354 @@
+# Contains the configurations of the VATT systems and the SystemBuilder class which applies them.
+
+import copy
+import hashlib
+import json
+import os
+
+import azcam
+from azcam.system import System
+
+# plate scale of vatt4k (from Rich 19Mar13)
+_vatt4k_scale = -0.000_052_1
+
+# each system described once, file names are relative to the system folder (dspcode)
+# or data folder (template), "lab" values replace others for lab testing
+SYSTEMS = {
+    "vatt4k": {
+        "cmdserver_port": 2402,
+        "controller": {
+            "timing_board": "gen2",
+            "clock_boards": ["gen2"],
+            "video_boards": ["gen2", "gen2"],
+            "utility_board": "gen2",
+            "camserver": ["vattccdc", 2405],
+            "video_gain": 2,
+            "video_speed": 2,
+        },
+        "dspcode": {
+            "pci_file": "dspcode/dsppci/pci2.lod",
+            "timing_file": "dspcode/dsptiming/tim2.lod",
+            "utility_file": "dspcode/dsputility/util2.lod",
+        },
+        "tempcon": {
+            "calibrations": [0, 0, 3],
+            "corrections": [[2.0, 0.0, 0.0], [1.0, 1.0, 1.0]],
+            "temperature_correction": 1,
+            "control_temperature": -115.0,
+        },
+        "exposure": {
+            "filetype": "MEF",
+            "display_image": 0,
+            "folder": "/mnt/TBArray/images",
+            "imageserver": ["vattcontrol.vatt", 6543],
+            "compression": "",
+        },
+        "detector": {
+            "name": "vatt4k",
+            "description": "STA0500 4064x4064 CCD",
+            "ref_pixel": [2032, 2032],
+            "format": [4064, 7, 0, 20, 4064, 0, 0, 0, 0],
+            "focalplane": [1, 1, 1, 2, "20"],
+            "roi": [1, 4064, 1, 4064, 2, 2],
+            "ext_position": [[1, 2], [1, 1]],
+            "jpg_order": [1, 2],
+        },
+        "wcs": {
+            "scale1": [_vatt4k_scale, _vatt4k_scale],
+            "scale2": [_vatt4k_scale, _vatt4k_scale],
+        },
+        "template": "templates/FitsTemplate_vatt4k_master.txt",
+        "dewar": "vatt4k_dewar",
+        "monitor_proc_path": "/azcam/azcam-vatt/bin/start_server_vatt4k.bat",
+        "lab": {},
+    },
+    "vattspec": {
+        "cmdserver_port": 2412,
+        "controller": {
+            "timing_board": "gen2",
+            "clock_boards": ["gen2"],
+            "video_boards": ["gen2"],
+            "utility_board": "gen2",
+            "camserver": ["vattccdc", 2405],
+            "video_gain": 10,
+            "video_speed": 1,
+        },
+        "dspcode": {
+            "pci_file": "dspcode/dsppci/pci2.lod",
+            "timing_file": "dspcode/dsptiming/tim2.lod",
+            "utility_file": "dspcode/dsputility/util2.lod",
+        },
+        "tempcon": {
+            "calibrations": [0, 0, 3],
+            "corrections": [[2.0, 0.0, 0.0], [1.0, 1.0, 1.0]],
+            "temperature_correction": 1,
+            "control_temperature": -115.0,
+        },
+        "exposure": {
+            "filetype": "FITS",
+            "display_image": 0,
+            "folder": "/mnt/TBArray/images",
+            "imageserver": ["vattcontrol.vatt", 6543],
+            "compression": "",
+        },
+        "detector": {
+            "name": "vattspec",
+            "description": "STA0520 2688x512 CCD",
+            "ref_pixel": [1344, 256],
+            "format": [2688, 16, 0, 20, 512, 0, 0, 0, 0],
+            "focalplane": [1, 1, 1, 1, "0"],
+            "roi": [1, 2688, 1, 512, 2, 2],
+            "ext_position": [[1, 1]],
+            "jpg_order": [1],
+        },
+        "wcs": {"ctype1": "LINEAR", "ctype2": "LINEAR"},
+        "template": "templates/FitsTemplate_vattspec_master.txt",
+        "dewar": "vattspec_dewar",
+        "monitor_proc_path": "/azcam/azcam-vatt/bin/start_server_vattspec.bat",
+        "lab": {
+            "controller": {"camserver": ["conserver7", 2405]},
+            "exposure": {"folder": "/data/vattspec", "imageserver": None},
+        },
+    },
+}
+
+# increment when the cache contents change
+CACHE_VERSION = 1
+
+
+def get_config(name, lab=False):
+    """
+    Returns a copy of the configuration of a system, with the lab values if lab is True.
+    """
+
+    config = copy.deepcopy(SYSTEMS[name])
+    overrides = config.pop("lab")
+    if lab:
+        for section, values in overrides.items():
+            config[section].update(values)
+
+    return config
+
+
+def validate_detector(detector):
+    """
+    Returns a list of errors in a detector description.
+    """
+
+    errors = []
+
+    ncols, nrows = detector["format"][0], detector["format"][4]
+    numdetx, numdety, numampx, numampy, ampconfig = detector["focalplane"]
+    numamps = numdetx * numdety * numampx * numampy
+
+    first_col, last_col, first_row, last_row, binx, biny = detector["roi"]
+    if not 1 <= first_col <= last_col <= ncols:
+        errors.append(f"roi columns {first_col}-{last_col} not within 1-{ncols}")
+    if not 1 <= first_row <= last_row <= nrows:
+        errors.append(f"roi rows {first_row}-{last_row} not within 1-{nrows}")
+    if binx < 1 or biny < 1:
+        errors.append(f"roi binning {binx}x{biny} not valid")
+
+    x, y = detector["ref_pixel"]
+    if not (0 < x <= ncols * numdetx and 0 < y <= nrows * numdety):
+        errors.append(f"ref_pixel {x},{y} not on the focal plane")
+
+    if len(ampconfig) != numamps:
+        errors.append(
+            f"amplifier configuration {ampconfig} is not for {numamps} amplifiers"
+        )
+    if len(detector["ext_position"]) != numamps:
+        errors.append(f"ext_position is not for {numamps} amplifiers")
+    if sorted(detector["jpg_order"]) != list(range(1, numamps + 1)):
+        errors.append(f"jpg_order is not for {numamps} amplifiers")
+
+    return errors
+
+
+def _hash_file(filename):
+    """
+    Returns the SHA-1 hex digest of a file, "" if it does not exist.
+    """
+
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+class SystemBuilder(object):
+    """
+    Applies a system configuration to the azcam tools.
+    The validated configuration and the parsed header template are cached on
+    disk, keyed by the configuration and the template file contents, so they
+    are not parsed or validated again on restart.
+    """
+
+    def __init__(self, name, systemfolder, datafolder, lab=False):
+
+        self.name = name
+        self.lab = lab
+        self.systemfolder = systemfolder
+        self.datafolder = datafolder
+        self.config = get_config(name, lab)
+
+        self.template = os.path.join(datafolder, self.config["template"])
+        suffix = "_lab" if lab else ""
+        self.cachefile = os.path.join(
+            datafolder, "cache", f"system_{name}{suffix}.json"
+        )
+
+        # template keywords as [keyword, value, comment, type]
+        self.keywords = []
+        self.cached = False
+
+    def get_key(self):
+        """
+        Returns the cache key for the current configuration and files.
+        """
+
+        data = json.dumps([CACHE_VERSION, self.config], sort_keys=True)
+
+        return hashlib.sha1(data.encode()).hexdigest() + _hash_file(self.template)
+
+    def load(self):
+        """
+        Loads the validated configuration from the cache, or validates it and
+        parses the template and updates the cache.
+        Raises ValueError if the configuration is not valid.
+        """
+
+        key = self.get_key()
+
+        try:
+            with open(self.cachefile, "r") as f:
+                cache = json.load(f)
+            if cache["key"] == key:
+                self.keywords = cache["keywords"]
+                self.cached = True
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        errors = validate_detector(self.config["detector"])
+        if errors:
+            raise ValueError(f"{self.name} configuration: " + "; ".join(errors))
+
+        for filename in self.config["dspcode"].values():
+            filename = os.path.join(self.systemfolder, filename)
+            if not os.path.exists(filename):
+                azcam.log(f"DSP code file not found: {filename}")
+
+        self.keywords = self.read_template(self.template)
+
+        try:
+            os.makedirs(os.path.dirname(self.cachefile), exist_ok=True)
+            with open(self.cachefile, "w") as f:
+                json.dump({"key": key, "keywords": self.keywords}, f)
+        except OSError as e:
+            azcam.log(f"System cache not written: {e}")
+
+        return
+
+    def read_template(self, filename):
+        """
+        Parses a header template file as Header.read_file() does.
+        Returns a list of [keyword, value, comment, type].
+        """
+
+        keywords = []
+        if not os.path.exists(filename):
+            azcam.log(f"Header template not found: {filename}")
+            return keywords
+
+        with open(filename, "r") as f:
+            for line in f.readlines():
+                line = line.strip()
+                if line.startswith("#") or len(line) == 0:
+                    continue
+                tokens = line.split(" ", 1)
+                keyword = tokens[0]
+                if len(tokens) == 1:
+                    value = ""
+                    comment = ""
+                else:
+                    nslash = tokens[1].find("/")
+                    if nslash == -1:
+                        value = tokens[1].strip()
+                        comment = ""
+                    else:
+                        comment = tokens[1][nslash + 1 :].strip()
+                        value = tokens[1][:nslash].strip()
+                typestring, value = azcam.utils.get_datatype(value)
+                keywords.append([keyword, value, comment, typestring])
+
+        return keywords
+
+    def configure_controller(self, controller):
+        """
+        Sets up an ARC controller.
+        """
+
+        config = self.config["controller"]
+        controller.timing_board = config["timing_board"]
+        controller.clock_boards = config["clock_boards"]
+        controller.video_boards = config["video_boards"]
+        controller.utility_board = config["utility_board"]
+        controller.set_boards()
+        controller.camserver.set_server(*config["camserver"])
+        for attribute, filename in self.config["dspcode"].items():
+            setattr(controller, attribute, os.path.join(self.systemfolder, filename))
+        controller.video_gain = config["video_gain"]
+        controller.video_speed = config["video_speed"]
+
+        return
+
+    def configure_tempcon(self, tempcon):
+        """
+        Sets up an ARC temperature controller.
+        """
+
+        config = self.config["tempcon"]
+        tempcon.set_calibrations(config["calibrations"])
+        tempcon.set_corrections(*config["corrections"])
+        tempcon.temperature_correction = config["temperature_correction"]
+        tempcon.control_temperature = config["control_temperature"]
+
+        return
+
+    def configure_exposure(self, exposure):
+        """
+        Sets up the exposure, image server and compression, detector, and WCS.
+        """
+
+        config = self.config["exposure"]
+        filetype = config["filetype"]
+        exposure.filetype = exposure.filetypes[filetype]
+        exposure.image.filetype = exposure.filetypes[filetype]
+        exposure.display_image = config["display_image"]
+        exposure.folder = config["folder"]
+        exposure.compression = config["compression"]
+        if config["imageserver"] is None:
+            exposure.set_remote_imageserver()
+        else:
+            exposure.set_remote_imageserver(*config["imageserver"])
+
+        exposure.set_detpars(self.config["detector"])
+        for attribute, value in self.config["wcs"].items():
+            setattr(exposure.image.focalplane.wcs, attribute, value)
+
+        return
+
+    def make_system(self):
+        """
+        Returns the System header tool with the template keywords.
+        """
+
+        system = System(self.name)
+        for keyword, value, comment, typestring in self.keywords:
+            system.set_keyword(keyword, value, comment, typestring)
+        system.header.filename = self.template
+        system.set_keyword("DEWAR", self.config["dewar"], "Dewar name")
+
+        return system
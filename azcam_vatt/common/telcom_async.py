@@ -0,0 +1,378 @@
+# Contains asyncio clients for the Telcom telescope server and the INDI filter server,
+# and the TelescopeClient synchronous facade which runs them on a background event loop.
+
+import asyncio
+import threading
+
+from indi_parser import IndiStreamParser, get_filters
+from resolver_cache import resolver
+from vatt_filter_code import format_filters
+
+
+async def resolve(host):
+    """
+    Returns the address of host from the shared resolver cache.
+    A lookup which is not cached runs in the default executor so the event loop is not blocked.
+    """
+
+    address = resolver.get_cached(host)
+    if address is None:
+        loop = asyncio.get_running_loop()
+        address = await loop.run_in_executor(None, resolver.resolve, host)
+
+    return address
+
+
+async def open_connection(host, port):
+    """
+    Opens a connection to host, resolved by the shared resolver cache, and
+    returns [reader, writer]. The cached address is removed if the connection
+    fails, see resolver_cache.create_connection().
+    """
+
+    address = await resolve(host)
+    try:
+        reader, writer = await asyncio.open_connection(address, port)
+    except OSError:
+        resolver.invalidate(host)
+        raise
+
+    return [reader, writer]
+
+
+class AsyncTelcomClient(object):
+    """
+    asyncio client for the Telcom telescope server.
+    Keeps up to size open connections so that many commands may be in flight at once.
+    """
+
+    def __init__(self, host, port, size=4, timeout=5.0):
+
+        self.host = host
+        self.port = port
+
+        # maximum number of concurrent connections
+        self.size = size
+
+        # default deadline for each command, seconds
+        self.timeout = timeout
+
+        self.idle = []
+        self.semaphore = None
+
+        # host and port of the idle connections
+        self.address = None
+
+    async def open(self):
+        """
+        Opens a new connection, returns [reader, writer].
+        """
+
+        return await open_connection(self.host, self.port)
+
+    async def transact(self, conn, command):
+        """
+        Sends a command on a connection and returns the reply line.
+        """
+
+        reader, writer = conn
+        writer.write(str.encode(command + "\r\n"))
+        await writer.drain()
+        reply = await reader.readline()
+        if reply == b"":
+            raise ConnectionError("telescope server closed connection")
+
+        return reply.decode()
+
+    async def _command(self, command):
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.size)
+
+        async with self.semaphore:
+            # connections to an earlier address are not reused
+            if self.address != (self.host, self.port):
+                await self.close()
+                self.address = (self.host, self.port)
+
+            reused = len(self.idle) > 0
+            conn = self.idle.pop() if reused else await self.open()
+            try:
+                reply = await self.transact(conn, command)
+            except ConnectionError:
+                conn[1].close()
+                if not reused:
+                    raise
+                # server dropped an idle connection, try once on a new one
+                conn = await self.open()
+                try:
+                    reply = await self.transact(conn, command)
+                except BaseException:
+                    conn[1].close()
+                    raise
+            except BaseException:
+                conn[1].close()
+                raise
+            self.idle.append(conn)
+
+        return reply
+
+    async def command(self, command, timeout=None):
+        """
+        Sends a command packet and returns ["OK", reply] or ["ERROR", message].
+        timeout is the deadline for this call in seconds, default is self.timeout.
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+
+        try:
+            reply = await asyncio.wait_for(self._command(command), timeout)
+        except asyncio.TimeoutError:
+            return ["ERROR", "telescope server timeout: %s" % command]
+        except Exception as inst:
+            return ["ERROR", "telescope server error: %s" % inst]
+
+        return ["OK", reply]
+
+    async def commands(self, commands, timeout=None):
+        """
+        Sends a list of command packets concurrently.
+        Returns a list of replies in the same order.
+        """
+
+        return await asyncio.gather(*[self.command(c, timeout) for c in commands])
+
+    async def close(self):
+        """
+        Closes all idle connections.
+        """
+
+        idle = self.idle
+        self.idle = []
+        for conn in idle:
+            conn[1].close()
+
+
+class AsyncIndiClient(object):
+    """
+    asyncio client for the INDI server which reports the guidebox filters.
+    """
+
+    def __init__(self, host="vattcontrol.vatt", port=7600, timeout=2.0):
+
+        self.host = host
+        self.port = port
+
+        # default deadline for each read, seconds
+        self.timeout = timeout
+
+    async def _getfilters(self):
+
+        reader, writer = await open_connection(self.host, self.port)
+        try:
+            writer.write(b"<getProperties version='1.7' device='FILTERS' />")
+            await writer.drain()
+            parser = IndiStreamParser()
+            while True:
+                chunk = await reader.read(4096)
+                if chunk == b"":
+                    break
+                for element in parser.feed(chunk):
+                    fdict = get_filters(element)
+                    if fdict is not None:
+                        return fdict
+        finally:
+            writer.close()
+
+        raise ValueError("Connection closed before filters were received")
+
+    async def getfilters(self, timeout=None):
+        """
+        Returns a dictionary with the filters in the beam.
+        Raises asyncio.TimeoutError if the deadline passes.
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+
+        return await asyncio.wait_for(self._getfilters(), timeout)
+
+
+class TelescopeClient(object):
+    """
+    Synchronous facade which runs the asyncio telescope and filter clients on
+    a background event loop, so blocking code can issue concurrent requests.
+    """
+
+    def __init__(self, tserver, vfilters=None):
+
+        # TelcomServerInterface used for server address, packets, and parsing
+        self.tserver = tserver
+
+        # vatt_filters whose subscriber cache is used when available
+        self.vfilters = vfilters
+
+        self.telcom = AsyncTelcomClient(
+            tserver.Host, tserver.Port, tserver.PoolSize, tserver.Timeout
+        )
+        if vfilters is None:
+            self.indi = AsyncIndiClient()
+        else:
+            self.indi = AsyncIndiClient(vfilters.host, vfilters.port)
+
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the event loop thread if not already running.
+        """
+
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(
+                target=self.loop.run_forever, name="telescopeclient", daemon=True
+            )
+            self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Closes connections and stops the event loop thread.
+        """
+
+        if self.loop is None:
+            return
+
+        self.run(self.telcom.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5.0)
+        self.loop.close()
+        self.loop = None
+
+        return
+
+    def update_address(self):
+        """
+        Copies the current server addresses from tserver and vfilters, which
+        may be changed after the client is made.
+        """
+
+        self.telcom.host = self.tserver.Host
+        self.telcom.port = self.tserver.Port
+        if self.vfilters is not None:
+            self.indi.host = self.vfilters.host
+            self.indi.port = self.vfilters.port
+
+        return
+
+    def run(self, coro, timeout=None):
+        """
+        Runs a coroutine on the event loop and waits for its result.
+        """
+
+        self.start()
+        self.update_address()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        return future.result(timeout)
+
+    def submit(self, coro):
+        """
+        Runs a coroutine on the event loop and returns a concurrent.futures.Future.
+        """
+
+        self.start()
+        self.update_address()
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def command(self, command, timeout=None):
+        """
+        Sends one command string (without packet header) and returns the reply.
+        """
+
+        packet = self.tserver.make_packet(command)
+
+        return self.run(self.telcom.command(packet, timeout))
+
+    def commands(self, commands, timeout=None):
+        """
+        Sends a list of command strings concurrently and returns their replies.
+        """
+
+        packets = [self.tserver.make_packet(c) for c in commands]
+
+        return self.run(self.telcom.commands(packets, timeout))
+
+    def get_keywords(self, keywords, timeout=None):
+        """
+        Reads telescope keywords with concurrent REQUEST commands.
+        Returns a dictionary of values for keywords read without error.
+        """
+
+        tcs_keywords = [k for k in keywords if k in self.tserver.keywords]
+        commands = ["REQUEST " + self.tserver.keywords[k] for k in tcs_keywords]
+        replies = self.commands(commands, timeout)
+
+        values = {}
+        for keyword, reply in zip(tcs_keywords, replies):
+            if reply[0] != "OK":
+                continue
+            value = self.tserver.parse_reply(reply[1], 0)
+            if isinstance(value, list):
+                continue
+            values[keyword] = self.tserver.format_coordinate(keyword, value)
+
+        return values
+
+    def get_filters(self, timeout=None):
+        """
+        Returns a dictionary with the filters in the beam.
+        """
+
+        return self.run(self.indi.getfilters(timeout))
+
+    async def _gather_header(self, filters, timeout):
+
+        packet = self.tserver.make_packet("REQUEST " + self.tserver.TelemetryRequest)
+        tasks = [self.telcom.command(packet, timeout)]
+        if filters:
+            tasks.append(self.indi.getfilters(timeout))
+
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def gather_header(self, filters=True, timeout=None):
+        """
+        Reads the telemetry record and the filters concurrently.
+        Returns a dictionary of header keyword values, including FILTER if read.
+        Total time is that of the slowest source.
+        """
+
+        values = {}
+
+        # filters pushed by the INDI server need no request
+        if filters and self.vfilters is not None and self.vfilters.is_subscribed():
+            cached = self.vfilters.get_cached()
+            if cached is not None:
+                fdict = cached[0]
+                values["FILTER"] = format_filters(fdict)
+                filters = False
+
+        results = self.run(self._gather_header(filters, timeout))
+
+        reply = results[0]
+        if not isinstance(reply, BaseException) and reply[0] == "OK":
+            telemetry = self.tserver.strip_packet(reply[1])
+            values.update(self.tserver.parse_telemetry(telemetry))
+
+        if filters and not isinstance(results[1], BaseException):
+            fdict = results[1]
+            values["FILTER"] = format_filters(fdict)
+
+        return values
@@ -0,0 +1,311 @@
+# Contains the TelcomConnectionPool class which keeps persistent connections to a Telcom server.
+
+import select
+import socket
+import threading
+import time
+
+from resolver_cache import create_connection
+
+
+class ReadStats(object):
+    """
+    Counters shared by the FramedReaders of a pool, which read in several threads.
+    """
+
+    def __init__(self):
+
+        self.replies = 0
+        self.recv_calls = 0
+        self.partial_reads = 0
+        self.oversize = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        """
+        Adds to counters, for example add(replies=1).
+        """
+
+        with self.lock:
+            for counter, n in counts.items():
+                setattr(self, counter, getattr(self, counter) + n)
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of read counters.
+        """
+
+        with self.lock:
+            return {
+                "replies": self.replies,
+                "recv_calls": self.recv_calls,
+                "partial_reads": self.partial_reads,
+                "oversize": self.oversize,
+                "bytes": self.bytes,
+            }
+
+
+class FramedReader(object):
+    """
+    Reads terminator-framed replies from a socket into a reusable buffer.
+    Data is received directly into the buffer and each reply is decoded once,
+    so no memory is allocated per received chunk.
+    """
+
+    def __init__(self, sock, stats=None, size=2048, max_size=65536, terminator=b"\n"):
+
+        self.socket = sock
+        self.stats = ReadStats() if stats is None else stats
+        self.terminator = terminator
+
+        # buffer grows up to max_size bytes for oversize replies
+        self.max_size = max_size
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+
+        # unread data is buffer[start:end]
+        self.start = 0
+        self.end = 0
+
+    def pending(self):
+        """
+        Returns True if unread data is in the buffer.
+        """
+
+        return self.end > self.start
+
+    def read_reply(self):
+        """
+        Returns the next reply as a string without its terminator.
+        Raises ConnectionError if the server closes the connection.
+        """
+
+        calls = 0
+        while True:
+            i = self.buffer.find(self.terminator, self.start, self.end)
+            if i >= 0:
+                reply = str(self.view[self.start : i], "latin-1").rstrip("\r")
+                self.start = i + len(self.terminator)
+                if self.start == self.end:
+                    self.start = self.end = 0
+                self.stats.add(replies=1, partial_reads=int(calls > 1))
+                return reply
+
+            if self.end == len(self.buffer):
+                self.make_room()
+
+            n = self.socket.recv_into(self.view[self.end :])
+            if n == 0:
+                raise ConnectionError("telescope server closed connection")
+            self.end += n
+            calls += 1
+            self.stats.add(recv_calls=1, bytes=n)
+
+    def make_room(self):
+        """
+        Internal Use Only.<br>
+        Moves unread data to the front of the buffer, or grows the buffer if full.
+        """
+
+        if self.start > 0:
+            length = self.end - self.start
+            self.view[:length] = self.view[self.start : self.end]
+            self.start = 0
+            self.end = length
+            return
+
+        self.stats.add(oversize=1)
+        size = len(self.buffer)
+        if size >= self.max_size:
+            self.start = self.end = 0
+            raise ValueError("telescope server reply longer than %d bytes" % size)
+
+        self.view.release()
+        self.buffer.extend(bytes(min(size, self.max_size - size)))
+        self.view = memoryview(self.buffer)
+
+        return
+
+
+class TelcomConnection(object):
+    """
+    A single pooled socket connection to a Telcom server.
+    """
+
+    def __init__(self, sock, stats=None):
+
+        self.socket = sock
+        self.reader = FramedReader(sock, stats)
+        self.created = time.time()
+        self.last_used = self.created
+
+    def close(self):
+        """
+        Closes the connection socket.
+        """
+
+        try:
+            self.socket.close()
+        except Exception:
+            pass
+
+    def is_alive(self, max_idle):
+        """
+        Returns True if the connection looks usable.
+        A connection is dead if the server closed it, if unread data is pending,
+        or if it has been idle longer than max_idle seconds.
+        """
+
+        if max_idle > 0 and time.time() - self.last_used > max_idle:
+            return False
+
+        try:
+            readable, _, errored = select.select([self.socket], [], [self.socket], 0)
+        except (OSError, ValueError):
+            return False
+
+        if errored:
+            return False
+
+        if readable or self.reader.pending():
+            # readable on an idle connection means EOF or a stale reply
+            return False
+
+        return True
+
+
+class TelcomConnectionPool(object):
+    """
+    Thread-safe pool of persistent connections to a Telcom telescope server.
+    Connections are health checked when taken from the pool and are
+    reopened transparently if the server has dropped them.
+    """
+
+    def __init__(self, host, port, size=4, timeout=5.0, max_idle=60.0):
+
+        self.host = host
+        self.port = port
+
+        # maximum number of idle connections kept open
+        self.size = size
+
+        # socket timeout in seconds
+        self.timeout = timeout
+
+        # idle connections older than this are closed, seconds (0 for no limit)
+        self.max_idle = max_idle
+
+        self.lock = threading.Lock()
+        self.idle = []
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.opened = 0
+        self.discarded = 0
+        self.read_stats = ReadStats()
+
+    def connect(self):
+        """
+        Opens and returns a new connection to the server.
+        """
+
+        sock = create_connection(self.host, self.port, self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        with self.lock:
+            self.opened += 1
+
+        return TelcomConnection(sock, self.read_stats)
+
+    def acquire(self):
+        """
+        Returns a connection, reusing a healthy idle one if available.
+        Returns [connection, reused] where reused is True for a pool hit.
+        """
+
+        while True:
+            with self.lock:
+                if not self.idle:
+                    self.misses += 1
+                    break
+                conn = self.idle.pop()
+
+            if conn.is_alive(self.max_idle):
+                with self.lock:
+                    self.hits += 1
+                return [conn, True]
+
+            self.discard(conn)
+
+        return [self.connect(), False]
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool after a successful transaction.
+        """
+
+        conn.last_used = time.time()
+
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+
+        conn.close()
+
+    def discard(self, conn):
+        """
+        Closes a connection which is broken or stale.
+        """
+
+        conn.close()
+
+        with self.lock:
+            self.discarded += 1
+
+    def reconnect(self):
+        """
+        Opens a replacement connection after a pooled one failed in use.
+        """
+
+        with self.lock:
+            self.reconnects += 1
+
+        return self.connect()
+
+    def close_all(self):
+        """
+        Closes all idle connections.
+        """
+
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self):
+        """
+        Returns a dictionary of pool counters.
+        """
+
+        with self.lock:
+            total = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / total if total else 0.0,
+                "reconnects": self.reconnects,
+                "opened": self.opened,
+                "discarded": self.discarded,
+                "idle": len(self.idle),
+            }
+        stats.update(self.read_stats.get_stats())
+
+        return stats
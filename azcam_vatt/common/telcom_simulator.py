@@ -0,0 +1,344 @@
+# Contains the TelcomSimulator class, a local stand-in for the VATT Telcom TCS server.
+
+import random
+import socketserver
+import threading
+import time
+
+from telemetry_decoder import sexagesimal_to_float
+
+
+class TelcomSimulatorHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one client connection to the simulator.
+    Connections are persistent, one reply line is sent per command line.
+    """
+
+    def handle(self):
+
+        sim = self.server.simulator
+
+        with sim.lock:
+            sim.connections += 1
+
+        for line in self.rfile:
+            command = line.decode(errors="replace").strip()
+            if command == "":
+                continue
+
+            fault = sim.get_fault()
+            if fault == "drop":
+                return
+
+            sim.delay()
+
+            if fault == "hang":
+                time.sleep(sim.hang_time)
+                return
+
+            reply = sim.process(command)
+            if fault == "garble":
+                reply = reply[: len(reply) // 2]
+
+            try:
+                self.wfile.write(str.encode(reply + "\r\n"))
+            except OSError:
+                return
+
+            if sim.close_after_reply:
+                return
+
+
+class TelcomSimulator(object):
+    """
+    Local Telcom TCS server simulator for testing and benchmarking VattTCS.
+    Supports REQUEST of single keywords and the full telemetry record, EPOCH,
+    NEXTRA, NEXTDEC, MOVNEXT, RADECGUIDE, and CANCEL.
+    """
+
+    def __init__(self, host="localhost", port=0):
+
+        self.host = host
+        self.port = port
+
+        # reply latency and jitter in seconds
+        self.latency = 0.0
+        self.jitter = 0.0
+
+        # slew rate in degrees per second, minimum slew time in seconds
+        self.slew_rate = 2.0
+        self.settle_time = 0.5
+
+        # seconds after a slew starts before MOTION is reported, as the TCS may lag
+        self.motion_delay = 0.0
+
+        # fault injection probabilities per command
+        self.fault_rates = {"drop": 0.0, "hang": 0.0, "garble": 0.0}
+        self.hang_time = 10.0
+
+        # close connections after each reply as the original server may do
+        self.close_after_reply = 0
+
+        self.telid = "VATT"
+        self.sysid = "TCS"
+        self.pid = "001"
+
+        self.lock = threading.Lock()
+        self.ra = 180.0  # degrees
+        self.dec = 30.0
+        self.epoch = 2000.0
+        self.next_ra = self.ra
+        self.next_dec = self.dec
+        self.slew_start = 0.0
+        self.slew_end = 0.0
+        self.slew_from = [self.ra, self.dec]
+
+        # counters
+        self.commands = 0
+        self.connections = 0
+        self.faults = 0
+
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the simulator in a background thread.
+        Returns the port number.
+        """
+
+        self.server = socketserver.ThreadingTCPServer(
+            (self.host, self.port), TelcomSimulatorHandler
+        )
+        self.server.daemon_threads = True
+        self.server.simulator = self
+        self.port = self.server.server_address[1]
+
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="telcomsimulator", daemon=True
+        )
+        self.thread.start()
+
+        return self.port
+
+    def stop(self):
+        """
+        Stops the simulator.
+        """
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+        return
+
+    def delay(self):
+        """
+        Sleeps for the reply latency plus random jitter.
+        """
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_fault(self):
+        """
+        Returns the name of a fault to inject for this command or None.
+        """
+
+        for fault in self.fault_rates:
+            if (
+                self.fault_rates[fault] > 0
+                and random.random() < self.fault_rates[fault]
+            ):
+                with self.lock:
+                    self.faults += 1
+                return fault
+
+        return None
+
+    def packet(self, text):
+        """
+        Returns a reply packet.
+        """
+
+        return " ".join([self.telid, self.sysid, self.pid, text])
+
+    def process(self, command):
+        """
+        Processes one command packet and returns the reply packet.
+        """
+
+        with self.lock:
+            self.commands += 1
+
+        tokens = command.split()
+        if len(tokens) < 4:
+            return self.packet("ERROR bad packet")
+        verb = tokens[3].upper()
+        args = tokens[4:]
+
+        with self.lock:
+            self.update_position()
+
+            if verb == "REQUEST":
+                if not args:
+                    return self.packet("ERROR no keyword")
+                return self.packet(self.request(args[0].upper()))
+            elif verb == "EPOCH":
+                self.epoch = float(args[0])
+            elif verb == "NEXTRA":
+                self.next_ra = sexagesimal_to_float(args[0]) * 15.0
+            elif verb == "NEXTDEC":
+                self.next_dec = sexagesimal_to_float(args[0])
+            elif verb == "MOVNEXT":
+                self.start_slew(self.next_ra, self.next_dec)
+            elif verb == "RADECGUIDE":
+                ra = self.ra + float(args[0]) / 3600.0
+                dec = self.dec + float(args[1]) / 3600.0
+                self.start_slew(ra, dec)
+            elif verb == "CANCEL":
+                self.slew_end = 0.0
+            else:
+                return self.packet("ERROR unknown command %s" % verb)
+
+        return self.packet("OK")
+
+    def start_slew(self, ra, dec):
+        """
+        Starts a simulated slew to ra, dec in degrees.
+        """
+
+        distance = max(abs(ra - self.ra), abs(dec - self.dec))
+        self.slew_from = [self.ra, self.dec]
+        self.next_ra = ra
+        self.next_dec = dec
+        self.slew_start = time.time()
+        self.slew_end = self.slew_start + distance / self.slew_rate + self.settle_time
+
+    def is_moving(self):
+        """
+        Returns True while a slew is in progress.
+        """
+
+        return self.slew_start + self.motion_delay <= time.time() < self.slew_end
+
+    def update_position(self):
+        """
+        Moves the simulated position along the current slew.
+        """
+
+        if self.slew_end == 0.0:
+            return
+
+        now = time.time()
+        if now >= self.slew_end:
+            self.ra = self.next_ra
+            self.dec = self.next_dec
+            self.slew_end = 0.0
+            return
+
+        fraction = (now - self.slew_start) / (self.slew_end - self.slew_start)
+        self.ra = self.slew_from[0] + fraction * (self.next_ra - self.slew_from[0])
+        self.dec = self.slew_from[1] + fraction * (self.next_dec - self.slew_from[1])
+
+    def get_values(self):
+        """
+        Returns a dictionary of current telemetry field strings by TCS name.
+        """
+
+        lst = (time.time() / 240.0) % 360.0  # degrees, not a real sidereal time
+        ha = (lst - self.ra + 180.0) % 360.0 - 180.0
+
+        return {
+            "MOTION": "1" if self.is_moving() else "0",
+            "RA": format_packed(self.ra / 15.0, 2, 2),
+            "DEC": format_packed(self.dec, 2, 1, sign=True),
+            "HA": format_colons(ha / 15.0),
+            "ST": format_colons(lst / 15.0, sign=False),
+            "EL": "%5.2f" % 60.0,
+            "AZ": "%6.2f" % 180.0,
+            "SECZ": "%5.3f" % 1.155,
+            "EQ": "%7.2f" % self.epoch,
+            "JD": "%9.1f" % (2440587.5 + time.time() / 86400.0),
+            "ROT": "%5.1f" % 0.0,
+        }
+
+    # telemetry record layout, TCS name and 1-based offset
+    layout = [
+        ["MOTION", 1],
+        ["RA", 4],
+        ["DEC", 14],
+        ["HA", 25],
+        ["ST", 35],
+        ["EL", 44],
+        ["AZ", 50],
+        ["SECZ", 57],
+        ["EQ", 76],
+        ["JD", 85],
+        ["ROT", 129],
+    ]
+
+    def request(self, name):
+        """
+        Returns the reply text for a REQUEST of a TCS name or ALL.
+        """
+
+        values = self.get_values()
+
+        if name == "ALL":
+            record = [" "] * 140
+            for field, offset in self.layout:
+                value = values[field]
+                record[offset - 1 : offset - 1 + len(value)] = list(value)
+            return "".join(record).rstrip()
+
+        if name not in values:
+            return "ERROR unknown keyword %s" % name
+
+        return values[name]
+
+    def get_stats(self):
+        """
+        Returns a dictionary of simulator counters.
+        """
+
+        return {
+            "commands": self.commands,
+            "connections": self.connections,
+            "faults": self.faults,
+        }
+
+
+def _split(value):
+    sign = "-" if value < 0 else "+"
+    value = abs(value)
+    whole = int(value)
+    minutes = int((value - whole) * 60.0)
+    seconds = ((value - whole) * 60.0 - minutes) * 60.0
+
+    return [sign, whole, minutes, seconds]
+
+
+def format_packed(value, digits, decimals, sign=False):
+    """
+    Formats a value as packed DDMMSS.s as used for RA and DEC telemetry.
+    """
+
+    s, whole, minutes, seconds = _split(value)
+    width = 3 + decimals
+    text = "%0*d%02d%0*.*f" % (digits, whole, minutes, width, decimals, seconds)
+
+    return s + text if sign else text
+
+
+def format_colons(value, sign=True):
+    """
+    Formats a value as sDD:MM:SS as used for HA and ST telemetry.
+    """
+
+    s, whole, minutes, seconds = _split(value)
+    text = "%02d:%02d:%02d" % (whole, minutes, int(seconds))
+
+    return s + text if sign else text
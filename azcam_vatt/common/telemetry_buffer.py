@@ -0,0 +1,217 @@
+# Contains the TelemetryBuffer class, a fixed-size time series of telemetry samples.
+
+import os
+import threading
+
+import numpy
+
+from telemetry_decoder import sexagesimal_to_float
+
+
+class TelemetryBuffer(object):
+    """
+    Fixed-size ring buffer of timestamped telemetry samples held in a numpy
+    structured array, optionally a memory-mapped file so samples persist
+    across restarts. All values are stored as floats, sexagesimal keywords
+    in hours or degrees, and missing values as NaN.
+    Values between samples are linearly interpolated.
+    """
+
+    # keywords which wrap, and their period
+    periods = {"RA": 24.0, "HA": 24.0, "LST-OBS": 24.0, "ST": 24.0, "AZIMUTH": 360.0}
+
+    def __init__(self, keywords, size=86400, filename=""):
+
+        self.keywords = list(keywords)
+        self.size = size
+        self.filename = filename
+        self.dtype = numpy.dtype(
+            [("time", "f8")] + [(keyword, "f8") for keyword in self.keywords]
+        )
+
+        # samples further than this from a requested time are not used, seconds
+        self.max_gap = 10.0
+
+        self.lock = threading.Lock()
+        self.index = 0
+        self.count = 0
+
+        if filename:
+            self.data = self.open_file(filename)
+        else:
+            self.data = numpy.zeros(size, dtype=self.dtype)
+
+    def open_file(self, filename):
+        """
+        Opens or creates the memory-mapped file and finds the newest sample.
+        A file of a different layout is replaced.
+        """
+
+        folder = os.path.dirname(filename)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        nbytes = self.size * self.dtype.itemsize
+        if os.path.exists(filename) and os.path.getsize(filename) == nbytes:
+            data = numpy.memmap(
+                filename, dtype=self.dtype, mode="r+", shape=(self.size,)
+            )
+            times = data["time"]
+            self.count = int(numpy.count_nonzero(times))
+            if self.count > 0:
+                self.index = (int(numpy.argmax(times)) + 1) % self.size
+        else:
+            data = numpy.memmap(
+                filename, dtype=self.dtype, mode="w+", shape=(self.size,)
+            )
+
+        return data
+
+    def flush(self):
+        """
+        Writes a memory-mapped buffer to disk.
+        """
+
+        if isinstance(self.data, numpy.memmap):
+            self.data.flush()
+
+        return
+
+    def append(self, t, values):
+        """
+        Adds a sample taken at time t from a dictionary of keyword values.
+        """
+
+        row = numpy.zeros(1, dtype=self.dtype)[0]
+        row["time"] = t
+        for keyword in self.keywords:
+            value = values.get(keyword)
+            try:
+                row[keyword] = sexagesimal_to_float(value)
+            except (AttributeError, TypeError, ValueError):
+                row[keyword] = numpy.nan
+
+        with self.lock:
+            self.data[self.index] = row
+            self.index = (self.index + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+
+        return
+
+    def get_samples(self, t0=None, t1=None):
+        """
+        Returns a copy of the samples in time order, optionally only those
+        from t0 to t1.
+        Samples are sorted by time, as threads which read telemetry at the
+        same time may append them out of order.
+        """
+
+        with self.lock:
+            if self.count < self.size:
+                samples = numpy.array(self.data[: self.count])
+            else:
+                samples = numpy.concatenate(
+                    [self.data[self.index :], self.data[: self.index]]
+                )
+        samples = samples[numpy.argsort(samples["time"], kind="stable")]
+
+        if t0 is not None:
+            samples = samples[samples["time"] >= t0]
+        if t1 is not None:
+            samples = samples[samples["time"] <= t1]
+
+        return samples
+
+    def get_series(self, keyword, t0, t1):
+        """
+        Returns [times, values] of the valid samples of a keyword near t0 to t1,
+        with wrapping keywords unwrapped. Returns None if there are none.
+        """
+
+        samples = self.get_samples(t0 - self.max_gap, t1 + self.max_gap)
+        times = samples["time"]
+        values = samples[keyword]
+        valid = ~numpy.isnan(values)
+        if not valid.any():
+            return None
+        times = times[valid]
+        values = values[valid]
+
+        period = self.periods.get(keyword)
+        if period is not None:
+            values = numpy.unwrap(values, period=period)
+
+        return [times, values]
+
+    def wrap(self, keyword, value):
+        """
+        Returns a value of a wrapping keyword in its normal range.
+        """
+
+        period = self.periods.get(keyword)
+        if period is None:
+            return float(value)
+
+        value = float(value) % period
+        if keyword == "HA" and value > period / 2:
+            value -= period
+
+        return value
+
+    def get_value(self, keyword, t):
+        """
+        Returns the value of a keyword interpolated at time t, or None.
+        """
+
+        series = self.get_series(keyword, t, t)
+        if series is None:
+            return None
+
+        return self.wrap(keyword, numpy.interp(t, series[0], series[1]))
+
+    def get_interval(self, keyword, t0, t1):
+        """
+        Returns a dictionary of the start, mid, end, and time-weighted mean
+        values of a keyword from t0 to t1, or None if there are no samples.
+        """
+
+        series = self.get_series(keyword, t0, t1)
+        if series is None:
+            return None
+        times, values = series
+
+        start = numpy.interp(t0, times, values)
+        end = numpy.interp(t1, times, values)
+        mid = numpy.interp((t0 + t1) / 2.0, times, values)
+
+        if t1 > t0:
+            inside = (times > t0) & (times < t1)
+            t = numpy.concatenate([[t0], times[inside], [t1]])
+            v = numpy.concatenate([[start], values[inside], [end]])
+            mean = numpy.sum((v[1:] + v[:-1]) * numpy.diff(t)) / 2.0 / (t1 - t0)
+        else:
+            mean = start
+
+        return {
+            "start": self.wrap(keyword, start),
+            "mid": self.wrap(keyword, mid),
+            "end": self.wrap(keyword, end),
+            "mean": self.wrap(keyword, mean),
+        }
+
+    def get_stats(self):
+        """
+        Returns a dictionary with the buffer size and time span.
+        """
+
+        samples = self.get_samples()
+        span = 0.0
+        if len(samples) > 1:
+            span = float(samples["time"][-1] - samples["time"][0])
+
+        return {
+            "size": self.size,
+            "count": self.count,
+            "span": span,
+            "file": self.filename,
+        }
@@ -0,0 +1,245 @@
+# Contains the TelemetryCache and TelemetryPoller classes for background telescope telemetry.
+
+import threading
+import time
+
+from vatt_filter_code import format_filters
+
+import azcam
+
+
+class TelemetryCache(object):
+    """
+    Thread-safe cache of keyword values with a time-to-live for each keyword.
+    """
+
+    def __init__(self, default_ttl=2.0):
+
+        # time-to-live in seconds for keywords not in ttls
+        self.default_ttl = default_ttl
+
+        # time-to-live in seconds by keyword
+        self.ttls = {}
+
+        self.lock = threading.Lock()
+        self.values = {}
+        self.times = {}
+
+    def set(self, keyword, value, timestamp=None):
+        """
+        Stores a keyword value.
+        timestamp is the time the value was sampled, default is now.
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            self.values[keyword] = value
+            self.times[keyword] = timestamp
+
+    def update(self, values, timestamp=None):
+        """
+        Stores a dictionary of keyword values sampled at the same time.
+        """
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            for keyword in values:
+                self.values[keyword] = values[keyword]
+                self.times[keyword] = timestamp
+
+    def get_ttl(self, keyword):
+        """
+        Returns the time-to-live of a keyword in seconds.
+        """
+
+        return self.ttls.get(keyword, self.default_ttl)
+
+    def get_age(self, keyword):
+        """
+        Returns the age of a cached keyword value in seconds, or None if not cached.
+        """
+
+        with self.lock:
+            timestamp = self.times.get(keyword)
+
+        if timestamp is None:
+            return None
+
+        return time.time() - timestamp
+
+    def get(self, keyword, max_age=None):
+        """
+        Returns [value, age] for a cached keyword if it is fresh, else None.
+        max_age overrides the keyword time-to-live, seconds.
+        """
+
+        if max_age is None:
+            max_age = self.get_ttl(keyword)
+
+        with self.lock:
+            if keyword not in self.values:
+                return None
+            value = self.values[keyword]
+            age = time.time() - self.times[keyword]
+
+        if age > max_age:
+            return None
+
+        return [value, age]
+
+    def is_fresh(self, keywords):
+        """
+        Returns True if all keywords in the list are cached and fresh.
+        """
+
+        for keyword in keywords:
+            if self.get(keyword) is None:
+                return False
+
+        return True
+
+    def clear(self):
+        """
+        Removes all cached values.
+        """
+
+        with self.lock:
+            self.values = {}
+            self.times = {}
+
+
+class TelemetryPoller(object):
+    """
+    Background thread which samples telescope telemetry and filter state
+    into a TelemetryCache at a fixed rate.
+    """
+
+    def __init__(self, telescope, cache, rate=1.0, filter_rate=0.2):
+
+        self.telescope = telescope
+        self.cache = cache
+
+        # telemetry samples per second
+        self.rate = rate
+
+        # filter samples per second (0 to not sample filters)
+        self.filter_rate = filter_rate
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # counters
+        self.samples = 0
+        self.filter_samples = 0
+        self.errors = 0
+        self.last_error = ""
+
+    def is_running(self):
+        """
+        Returns True if the poller thread is running.
+        """
+
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """
+        Starts the poller thread.
+        """
+
+        if self.is_running():
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="telemetrypoller", daemon=True
+        )
+        self.thread.start()
+
+        return
+
+    def stop(self):
+        """
+        Stops the poller thread.
+        """
+
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5.0)
+        self.thread = None
+
+        return
+
+    def run(self):
+        """
+        Poller thread loop.
+        """
+
+        next_filter = 0.0
+
+        while not self.stop_event.is_set():
+            t0 = time.time()
+
+            self.sample_telemetry()
+
+            if self.filter_rate > 0 and t0 >= next_filter:
+                self.sample_filters()
+                next_filter = t0 + 1.0 / self.filter_rate
+
+            delay = 1.0 / self.rate - (time.time() - t0)
+            if delay > 0:
+                self.stop_event.wait(delay)
+
+        return
+
+    def sample_telemetry(self):
+        """
+        Reads the telemetry keywords, which the telescope stores in the cache.
+        """
+
+        try:
+            values = self.telescope.read_telemetry()
+        except Exception as e:
+            values = {}
+            self.last_error = str(e)
+
+        if values:
+            self.samples += 1
+        else:
+            self.errors += 1
+
+        return
+
+    def sample_filters(self):
+        """
+        Reads the filter state into the cache.
+        """
+
+        try:
+            fdict = self.telescope.vfilters.getfilters()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            azcam.log(f"Telemetry poller filter read error: {e}")
+            return
+
+        self.cache.set("FILTER", format_filters(fdict))
+        self.filter_samples += 1
+
+        return
+
+    def get_stats(self):
+        """
+        Returns a dictionary of poller counters.
+        """
+
+        return {
+            "running": self.is_running(),
+            "samples": self.samples,
+            "filter_samples": self.filter_samples,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
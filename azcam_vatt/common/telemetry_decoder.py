@@ -0,0 +1,262 @@
+# Contains the TelemetryDecoder class which decodes fixed-width TCS telemetry records.
+
+import numpy
+
+
+def sexagesimal_to_float(value):
+    """
+    Converts a sexagesimal string ("12:34:56.7", "12 34 56.7", or "123456.7")
+    or a number to a float in the units of its first field.
+    """
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    value = value.strip()
+    sign = -1.0 if value.startswith("-") else 1.0
+    value = value.lstrip("+-")
+
+    if ":" in value:
+        fields = value.split(":")
+    elif " " in value:
+        fields = value.split()
+    elif len(value.split(".")[0]) in [6, 7]:
+        # packed DDMMSS.s or DDDMMSS.s
+        whole = value.split(".")[0]
+        fields = [whole[:-4], whole[-4:-2], value[len(whole) - 2 :]]
+    else:
+        fields = [value]
+
+    result = 0.0
+    for i, field in enumerate(fields):
+        result += float(field) / 60.0**i
+
+    return sign * result
+
+
+# bytes which end a field, the whitespace of str.split() and the nulls
+# which pad short records
+_separators = numpy.array([chr(i).isspace() or i == 0 for i in range(256)])
+
+
+def _format_ra(value):
+    return "%s:%s:%s" % (value[0:2], value[2:4], value[4:])
+
+
+def _format_dec(value):
+    return "%s:%s:%s" % (value[0:3], value[3:5], value[5:])
+
+
+class TelemetryDecoder(object):
+    """
+    Decodes fixed-width telemetry records using a plan of slice bounds and
+    converters compiled once from the keyword tables.
+    """
+
+    # width of the slice beyond the table length, which allows for wider fields
+    padding = 3
+
+    # per keyword correction to the padding
+    padding_corrections = {"ROTANGLE": -2}
+
+    # converters by type string
+    converters = {"int": int, "float": float, "str": str}
+
+    # numpy types by type string for batch decoding
+    dtypes = {"int": "i4", "float": "f8", "str": "U16"}
+
+    # positions of the colons which the RA and DEC formatters insert
+    colons = {"RA": [2, 4], "DEC": [3, 5]}
+
+    # smaller batches are decoded record by record, which is faster
+    batch_min = 200
+
+    def __init__(self, offsets, lengths, typestrings, keywords):
+
+        self.keywords = list(keywords)
+
+        # plan is a list of [keyword, start, stop, formatter, converter]
+        self.plan = []
+        self.plans = {}
+        for keyword in self.keywords:
+            start = offsets[keyword] - 1
+            stop = (
+                offsets[keyword]
+                + lengths[keyword]
+                + self.padding
+                + self.padding_corrections.get(keyword, 0)
+            )
+            if keyword == "RA":
+                formatter = _format_ra
+            elif keyword == "DEC":
+                formatter = _format_dec
+            else:
+                formatter = None
+            converter = self.converters[typestrings[keyword]]
+            step = [keyword, start, stop, formatter, converter]
+            self.plan.append(step)
+            self.plans[keyword] = step
+
+        self.dtype = numpy.dtype(
+            [(keyword, self.dtypes[typestrings[keyword]]) for keyword in self.keywords]
+        )
+
+    def decode_keyword(self, keyword, telemetry):
+        """
+        Returns the value of one keyword from a telemetry record.
+        Raises ValueError if the field cannot be decoded.
+        """
+
+        keyword, start, stop, formatter, converter = self.plans[keyword]
+
+        # the padded slice may include the start of the next field
+        field = self.strip_nulls(telemetry[start:stop]).split(None, 1)
+        if not field:
+            raise ValueError("empty telemetry field %s" % keyword)
+        value = field[0]
+        if formatter is not None:
+            value = formatter(value)
+
+        return converter(value)
+
+    def decode(self, telemetry, errors=None):
+        """
+        Returns a dictionary of all keyword values decoded from a telemetry record
+        in one pass. Keywords which cannot be decoded are not included and are
+        appended to the errors list if given.
+        """
+
+        telemetry = self.strip_nulls(telemetry)
+        values = {}
+        for keyword, start, stop, formatter, converter in self.plan:
+            field = telemetry[start:stop].split(None, 1)
+            try:
+                value = field[0]
+                if formatter is not None:
+                    value = formatter(value)
+                values[keyword] = converter(value)
+            except (IndexError, ValueError):
+                if errors is not None:
+                    errors.append(keyword)
+
+        return values
+
+    def strip_nulls(self, telemetry):
+        """
+        Returns a telemetry record with nulls replaced by spaces, so they end
+        fields as in decode_batch().
+        """
+
+        if "\x00" in telemetry:
+            telemetry = telemetry.replace("\x00", " ")
+
+        return telemetry
+
+    def decode_batch(self, records):
+        """
+        Decodes a list of telemetry records into a numpy structured array
+        with one field per keyword. Fields which cannot be decoded are set to
+        zero, NaN, or an empty string.
+        Each field is found and converted for all records at once, except
+        in batches of fewer than batch_min records.
+        """
+
+        count = len(records)
+        if count < self.batch_min:
+            fills = [numpy.nan if step[4] is float else step[4]() for step in self.plan]
+            rows = []
+            for record in records:
+                values = self.decode(record)
+                rows.append(
+                    tuple(
+                        [values.get(k, fill) for k, fill in zip(self.keywords, fills)]
+                    )
+                )
+            return numpy.array(rows, dtype=self.dtype)
+
+        result = numpy.zeros(count, dtype=self.dtype)
+
+        width = max(
+            [len(record) for record in records] + [step[2] for step in self.plan]
+        )
+        data = "".join([record.ljust(width) for record in records])
+        chars = numpy.frombuffer(data.encode("latin-1", "replace"), dtype=numpy.uint8)
+        chars = chars.reshape(count, width)
+
+        for keyword, start, stop, formatter, converter in self.plan:
+            field = chars[:, start:stop]
+
+            # the value is the first word of the padded slice, later bytes are
+            # cleared to nulls which numpy strings ignore
+            space = _separators[field]
+            started = numpy.logical_or.accumulate(~space, axis=1)
+            ended = numpy.logical_or.accumulate(started & space, axis=1)
+            empty = ~started[:, -1]
+            word = numpy.where(ended, 0, field).astype(numpy.uint8)
+
+            if converter is str:
+                word = self.align_words(word, numpy.argmax(started, axis=1))
+                if keyword in self.colons:
+                    # a short value leaves nulls before colons, which are removed
+                    word = self.insert_colons(word, self.colons[keyword])
+                    word = self.remove_nulls(word)
+                column = word.view("S%d" % word.shape[1])[:, 0]
+                result[keyword] = column.astype(result.dtype[keyword])
+                result[keyword][empty] = ""
+                continue
+
+            column = word.view("S%d" % word.shape[1])[:, 0]
+            fill = numpy.nan if converter is float else 0
+            column = numpy.where(empty, b"0", column)
+            try:
+                result[keyword] = column.astype(result.dtype[keyword])
+            except ValueError:
+                # fall back to per record conversion
+                for i, value in enumerate(column):
+                    try:
+                        result[keyword][i] = converter(value.decode("latin-1"))
+                    except ValueError:
+                        result[keyword][i] = fill
+            result[keyword][empty] = fill
+
+        return result
+
+    def align_words(self, words, first):
+        """
+        Returns a 2D array of bytes with each row shifted left to start at its
+        index in first, padded with nulls.
+        """
+
+        width = words.shape[1]
+        index = first[:, None] + numpy.arange(width)
+        aligned = numpy.take_along_axis(words, numpy.minimum(index, width - 1), axis=1)
+        aligned[index >= width] = 0
+
+        return aligned
+
+    def remove_nulls(self, words):
+        """
+        Returns a 2D array of bytes with the nulls within each row moved to
+        its end, keeping the order of the other bytes.
+        """
+
+        order = numpy.argsort(words == 0, axis=1, kind="stable")
+
+        return numpy.take_along_axis(words, order, axis=1)
+
+    def insert_colons(self, words, positions):
+        """
+        Returns a 2D array of bytes with a colon inserted in each row before
+        each of positions, as the RA and DEC formatters do.
+        """
+
+        count, width = words.shape
+        result = numpy.zeros((count, width + len(positions)), dtype=numpy.uint8)
+        bounds = [0] + list(positions) + [width]
+        for i in range(len(bounds) - 1):
+            start, stop = bounds[i], bounds[i + 1]
+            result[:, start + i : stop + i] = words[:, start:stop]
+            if i < len(positions):
+                result[:, stop + i] = ord(":")
+
+        return result
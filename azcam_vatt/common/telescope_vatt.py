@@ -1,11 +1,22 @@
 # Contains the StewardTCS class which defines the Telescope Control System interface for VATT.
 
+import concurrent.futures
+import math
 import os
 import socket
 import sys
+import threading
 import time
 
-from vatt_filter_code import vatt_filters
+from header_gather import GatherError, HeaderGatherer
+from latency_stats import stats
+from resolver_cache import create_connection, resolver
+from telcom_async import TelescopeClient
+from telcom_pool import TelcomConnectionPool
+from telemetry_buffer import TelemetryBuffer
+from telemetry_cache import TelemetryCache, TelemetryPoller
+from telemetry_decoder import TelemetryDecoder, sexagesimal_to_float
+from vatt_filter_code import format_filters, vatt_filters
 
 import azcam
 from azcam.system import System
@@ -17,12 +28,88 @@ class VattTCS(Telescope):
     The interface to the Steward Observatory TCS telescope server.
     """
 
+    # header keywords set after integration from the telemetry buffer over the
+    # shutter open interval,
+    # keyword: [telemetry keyword, "start", "mid", "end", or "mean", comment]
+    exposure_keywords = {
+        "AIRM-MID": ["AIRMASS", "mid", "airmass at mid exposure"],
+        "AIRM-AVG": ["AIRMASS", "mean", "mean airmass during exposure"],
+        "AIRM-END": ["AIRMASS", "end", "airmass at shutter close"],
+        "HA-MID": ["HA", "mid", "hour angle at mid exposure, hours"],
+        "ELEV-MID": ["ELEVAT", "mid", "elevation at mid exposure"],
+        "AZ-MID": ["AZIMUTH", "mid", "azimuth at mid exposure"],
+        "ROT-MID": ["ROTANGLE", "mid", "IIS rotation angle at mid exposure"],
+    }
+
+    # telemetry keywords read to check that the telescope is at a position
+    position_keywords = ["RA", "DEC", "EQUINOX"]
+
     def __init__(self, obj_id="telescope", name="VATT telescope"):
 
         super().__init__(obj_id, name)
 
         self.vfilters = vatt_filters()
 
+        # keep filter state current from INDI server updates
+        self.subscribe_filters = 1
+
+        # read all telemetry keywords in one exchange when reading the header
+        self.use_snapshot = 1
+
+        # telemetry values from the last snapshot, used by get_keyword while set
+        self.snapshot = {}
+
+        # cache of recent keyword values, time-to-live in seconds by keyword
+        self.cache = TelemetryCache(2.0)
+        self.cache.ttls = {"MOTION": 0.5, "FILTER": 10.0}
+
+        # read telemetry and filters concurrently with the asyncio client
+        self.use_async = 0
+        self.aclient = None
+
+        # background telemetry samples per second, 0 for no poller
+        self.poll_rate = 0
+        self.poller = None
+
+        # read header data in the background at shutter close
+        self.prefetch = 1
+        self.prefetch_timeout = 10.0
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="telescopeprefetch"
+        )
+        self.finish_future = None
+
+        # reads for one header share a deadline in seconds, failed services are skipped
+        self.gather = HeaderGatherer(3.0)
+
+        # [time, values] snapshots taken at exposure start and shutter close,
+        # and the last snapshot read
+        self.snapshot_start = []
+        self.snapshot_finish = []
+        self.last_snapshot = []
+
+        # time series of all telemetry read, samples and optional file name
+        self.buffer = None
+        self.buffer_size = 86400
+        self.buffer_file = ""
+
+        # shutter open and close times of the current exposure, which are the
+        # start and end of integration, see shutter_opened() and shutter_closed()
+        self.shutter_times = [0.0, 0.0]
+
+        # motion wait, times in seconds
+        self.move_timeout = 300.0
+        self.move_poll_min = 0.1
+        self.move_poll_max = 1.0
+        self.move_poll_factor = 1.5
+        self.move_log_interval = 2.0
+        self.move_max_errors = 5
+        self.move_start_timeout = 1.5
+        self.move_tolerance = 1.0  # arcsec
+        self.move_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="telescopemove"
+        )
+
         self.DEBUG = 0
 
     def initialize(self):
@@ -40,11 +127,30 @@ class VattTCS(Telescope):
         # telescope server interface
         self.Tserver = TelcomServerInterface()
 
+        try:
+            self.buffer = TelemetryBuffer(
+                self.Tserver.TelemetryKeywords, self.buffer_size, self.buffer_file
+            )
+        except OSError as e:
+            azcam.log(f"Telemetry buffer file not opened, using memory: {e}")
+            self.buffer = TelemetryBuffer(
+                self.Tserver.TelemetryKeywords, self.buffer_size
+            )
+
+        # asyncio client for concurrent requests, event loop starts on first use
+        self.aclient = TelescopeClient(self.Tserver, self.vfilters)
+
+        if self.subscribe_filters:
+            self.vfilters.subscribe()
+
         # add keywords
         self.define_keywords()
 
         self.initialized = 1
 
+        if self.poll_rate > 0:
+            self.start_poller(self.poll_rate)
+
         return
 
     # **************************************************************************************************
@@ -54,17 +160,146 @@ class VattTCS(Telescope):
     def exposure_start(self):
         """
         Setup before exposure starts.
+        Removes the exposure_keywords of the last exposure from the header.
         """
 
+        self.snapshot_start = []
+        self.snapshot_finish = []
+        self.finish_future = None
+        self.shutter_times = [0.0, 0.0]
+
+        for keyword in self.exposure_keywords:
+            if keyword in self.header.get_keywords():
+                self.header.delete_keyword(keyword)
+
         return
 
-    def exposure_finish(self):
+    def shutter_opened(self):
         """
-        Setup before exposure starts.
+        Called by the exposure when integration starts.
+        The last snapshot, read for the header by Exposure.begin(), is the
+        start snapshot.
+        """
+
+        self.shutter_times = [time.time(), 0.0]
+        self.snapshot_start = self.last_snapshot
+
+        return
+
+    def shutter_closed(self):
+        """
+        Called by the exposure when integration ends.
+        Starts a background read of header data at shutter close, which
+        update_exposure_header() uses after readout.
+        """
+
+        self.shutter_times[1] = time.time()
+
+        if not (self.enabled and self.initialized and self.prefetch):
+            self.finish_future = None
+            return
+
+        self.finish_future = self.executor.submit(self.read_timed_snapshot)
+
+        return
+
+    def update_exposure_header(self):
         """
+        Called by the exposure after readout, before the image is written.
+        Waits for the header data read at shutter close, see shutter_closed(),
+        then sets the exposure_keywords from the telemetry buffer.
+        """
+
+        if self.finish_future is not None:
+            self.snapshot_finish = self.wait_prefetch(self.finish_future)
+            self.finish_future = None
+
+        for keyword, (telemetry, when, comment) in self.exposure_keywords.items():
+            values = self.get_exposure_values(telemetry)
+            if values is None:
+                continue
+            self.header.set_keyword(keyword, values[when], comment, "float")
 
         return
 
+    def read_timed_snapshot(self):
+        """
+        Returns [time, values] for a header data snapshot.
+        """
+
+        t = time.time()
+        values = self.read_snapshot()
+
+        return [t, values]
+
+    def wait_prefetch(self, future, timeout=None):
+        """
+        Waits for a prefetch to finish and returns its [time, values], or [] on error.
+        timeout defaults to prefetch_timeout.
+        """
+
+        if future is None:
+            return []
+
+        if timeout is None:
+            timeout = self.prefetch_timeout
+
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            azcam.log(f"Telescope header prefetch failed: {e}")
+            return []
+
+    def get_exposure_value(self, keyword, when="mid"):
+        """
+        Returns a keyword value over the shutter open interval.
+        when is "start", "finish", "mid", or "mean".
+        Numeric keywords are interpolated from the telemetry buffer, "mean" is
+        the time-weighted average over the interval.
+        Otherwise values come from the exposure start and finish snapshots, with
+        mid and mean values of float keywords the average of start and finish,
+        and of other keywords the start value.
+        Returns None if the value is not available.
+        """
+
+        if self.finish_future is not None:
+            self.update_exposure_header()
+
+        if self.Tserver.typestrings.get(keyword) in ["int", "float"]:
+            values = self.get_exposure_values(keyword)
+            if values is not None:
+                return values["end" if when == "finish" else when]
+
+        start = self.snapshot_start[1].get(keyword) if self.snapshot_start else None
+        finish = self.snapshot_finish[1].get(keyword) if self.snapshot_finish else None
+
+        if when == "start":
+            return start
+        elif when == "finish":
+            return finish
+
+        if isinstance(start, float) and isinstance(finish, float):
+            return (start + finish) / 2.0
+        elif start is not None:
+            return start
+
+        return finish
+
+    def get_exposure_values(self, keyword):
+        """
+        Returns a dictionary of the start, mid, end, and mean values of a
+        keyword over the shutter open interval from the telemetry buffer,
+        or None if there are no samples. Sexagesimal keywords are in hours or degrees.
+        """
+
+        t0, t1 = self.shutter_times
+        if self.buffer is None or t0 == 0.0 or keyword not in self.buffer.keywords:
+            return None
+        if t1 < t0:
+            t1 = time.time()
+
+        return self.buffer.get_interval(keyword, t0, t1)
+
     # **************************************************************************************************
     # header
     # **************************************************************************************************
@@ -81,49 +316,265 @@ class VattTCS(Telescope):
 
         return
 
+    def start_poller(self, rate=1.0):
+        """
+        Starts background sampling of telemetry and filters into the keyword cache.
+        rate is telemetry samples per second.
+        """
+
+        if self.poller is None:
+            self.poller = TelemetryPoller(self, self.cache)
+        self.poller.rate = rate
+        self.poll_rate = rate
+        self.poller.start()
+        azcam.log(f"Telescope telemetry poller started at {rate} Hz")
+
+        return
+
+    def stop_poller(self):
+        """
+        Stops background sampling of telemetry.
+        """
+
+        if self.poller is not None:
+            self.poller.stop()
+        self.poll_rate = 0
+
+        if self.buffer is not None:
+            self.buffer.flush()
+
+        return
+
+    def is_polling(self):
+        """
+        Returns True if the background telemetry poller is running.
+        """
+
+        return self.poller is not None and self.poller.is_running()
+
+    def get_keyword_age(self, keyword):
+        """
+        Returns the age in seconds of the last value read for a keyword,
+        or None if the keyword has not been read.
+        """
+
+        return self.cache.get_age(keyword)
+
+    def get_snapshot(self):
+        """
+        Reads the full telemetry record once and decodes all telemetry keywords.
+        Returns a dictionary of keyword values, empty on error.
+        """
+
+        t = time.time()
+        reply = self.Tserver.get_telemetry()
+        if reply[0] != "OK":
+            azcam.log("Telescope telemetry read error: %s" % reply[1])
+            return {}
+
+        values = self.Tserver.parse_telemetry(reply[1])
+        self.store_values(t, values)
+
+        return values
+
+    def read_telemetry(self):
+        """
+        Reads all telemetry keywords, with one telemetry snapshot when
+        use_snapshot is set, else with one request for each TCS name.
+        Values are stored as by get_snapshot(). Returns a dictionary of
+        keyword values, without keywords which could not be read.
+        """
+
+        if self.use_snapshot:
+            return self.get_snapshot()
+
+        t = time.time()
+        replies = {}
+        values = {}
+        for keyword in self.Tserver.TelemetryKeywords:
+            name = self.Tserver.keywords[keyword]
+            try:
+                if name not in replies:
+                    replies[name] = self.request_keyword(keyword)
+                value, _ = self.header.convert_type(
+                    replies[name], self.header.typestrings[keyword]
+                )
+            except Exception as e:
+                azcam.log(f"Telescope keyword {keyword} not read: {e}")
+                continue
+            values[keyword] = value
+        self.store_values(t, values)
+
+        return values
+
+    def get_snapshot_async(self):
+        """
+        Reads the telemetry record and the filters concurrently.
+        Returns a dictionary of keyword values including FILTER, empty on error.
+        """
+
+        t = time.time()
+        values = self.aclient.gather_header("FILTER" in self.header.get_keywords())
+        self.store_values(t, values)
+
+        return values
+
+    def store_values(self, t, values):
+        """
+        Stores telemetry values read at time t in the keyword cache and the
+        telemetry buffer.
+        """
+
+        self.cache.update(values)
+        if values:
+            self.last_snapshot = [t, values]
+        if self.buffer is not None and values:
+            self.buffer.append(t, values)
+
+        return
+
+    def read_snapshot(self):
+        """
+        Reads header data with one telemetry read, and the filters at the same
+        time when use_async is set. Returns a dictionary of keyword values.
+        Without use_snapshot, each keyword is read with its own request, see
+        read_telemetry().
+        """
+
+        if not self.use_snapshot:
+            return self.read_telemetry()
+
+        if self.use_async:
+            return self.get_snapshot_async()
+
+        return self.get_snapshot()
+
+    def read_snapshot_checked(self):
+        """
+        Returns read_snapshot() values, raises ConnectionError if none were read.
+        """
+
+        values = self.read_snapshot()
+        if not values:
+            raise ConnectionError("no telescope telemetry")
+
+        return values
+
+    def read_header(self):
+        """
+        Reads and returns current header data as a list of
+        [keyword, value, comment, type].
+        With use_snapshot set, all telemetry keywords come from one telemetry read.
+        The filters are read at the same time as the telemetry.
+        """
+
+        # all reads below share one deadline
+        self.gather.start()
+
+        # the filter server is independent of the TCS so is read at the same time
+        keywords = self.header.get_keywords()
+        filter_future = None
+        if (
+            "FILTER" in keywords
+            and "FILTER" not in self.snapshot
+            and not self.use_async
+        ):
+            filter_future = self.executor.submit(
+                self.gather.share(self.get_keyword), "FILTER"
+            )
+
+        header = []
+        try:
+            # poller values are used directly by get_keyword when fresh
+            if self.snapshot:
+                pass
+            elif self.use_snapshot and not (
+                self.is_polling()
+                and self.cache.is_fresh(self.Tserver.TelemetryKeywords)
+            ):
+                # own circuit breaker, so a failing record read does not
+                # stop the single keyword reads below
+                try:
+                    self.snapshot = self.gather.call(
+                        "snapshot", self.read_snapshot_checked
+                    )
+                except GatherError as e:
+                    azcam.log(f"Telescope header snapshot not read: {e}")
+
+            for key in keywords:
+                if key in self.exposure_keywords:
+                    continue
+                if key == "FILTER" and filter_future is not None:
+                    reply = filter_future.result()
+                else:
+                    reply = self.get_keyword(key)
+                if azcam.utils.check_reply(reply):
+                    continue
+                header.append([key, reply[0], reply[1], reply[2]])
+        finally:
+            self.snapshot = {}
+            self.gather.finish()
+
+        return header
+
     def get_keyword(self, keyword):
+        """
+        Reads an telescope keyword value.
+        See read_keyword(), this also records the time taken.
+        """
+
+        t0 = time.perf_counter()
+        reply = self.read_keyword(keyword)
+        stats.record(
+            "keyword", keyword, time.perf_counter() - t0, azcam.utils.check_reply(reply)
+        )
+
+        return reply
+
+    def read_keyword(self, keyword):
         """
         Reads an telescope keyword value.
         Keyword is the name of the keyword to be read.
-        This command will read hardware to obtain the keyword value.
+        While the poller runs, values fresher than the keyword cache time-to-live
+        are returned from the cache, otherwise this command will read hardware
+        to obtain the keyword value.
+        Use get_keyword_age() for the age of the value returned.
+        Hardware reads are bounded by the header deadline. A keyword which cannot
+        be read is given its last known good value with the comment marked.
         """
 
         if not self.enabled:
             azcam.AzcamWarning(f"{self.name} is not enabled")
             return
 
-        if keyword == "FILTER":
-            for i in range(3):
-                try:
-                    fdict = self.vfilters.getfilters()
-                    break
-                except Exception:
-                    azcam.log(f"Filter read error {i}...")
-                    time.sleep(0.2)
-            reply = f"upper: {fdict['upper']} lower: {fdict['lower']}"
+        # cache is kept current only while the poller runs
+        cached = self.cache.get(keyword) if self.is_polling() else None
 
-        else:
+        if keyword in self.snapshot:
+            reply = self.snapshot[keyword]
+
+        elif cached is not None:
+            reply = cached[0]
+
+        elif keyword == "FILTER":
             try:
-                command = self.Tserver.make_packet(
-                    "REQUEST " + self.Tserver.keywords[keyword]
-                )
-            except KeyError:
-                return ["ERROR", "Keyword %s not defined" % keyword]
-            ReplyLength = self.Tserver.ReplyLengths[keyword]
-            ReplyLength = ReplyLength + 3  # is this right?
-            reply = self.Tserver.command(command, ReplyLength + self.Tserver.Offset)
-            if reply[0] != "OK":
-                self.header.set_keyword(keyword, "")
-                return reply
-            reply = self.Tserver.parse_reply(reply[1], ReplyLength)
+                fdict = self.gather.call("filters", self.vfilters.getfilters)
+            except GatherError as e:
+                return self.get_fallback(keyword, e)
+            reply = format_filters(fdict)
+            self.cache.set(keyword, reply)
 
-        # parse RA and DEC specially
-        if keyword == "RA":
-            reply = "%s:%s:%s" % (reply[0:2], reply[2:4], reply[4:])
-        elif keyword == "DEC":
-            reply = "%s:%s:%s" % (reply[0:3], reply[3:5], reply[5:])
         else:
-            pass
+            if keyword not in self.Tserver.keywords:
+                return ["ERROR", "Keyword %s not defined" % keyword]
+            try:
+                reply = self.gather.call("tcs", self.request_keyword, keyword)
+            except GatherError as e:
+                return self.get_fallback(keyword, e)
+
+            self.cache.set(keyword, reply)
+
+        self.gather.set_good(keyword, reply)
 
         # store value in Header
         self.header.set_keyword(keyword, reply)
@@ -132,6 +583,48 @@ class VattTCS(Telescope):
 
         return [reply, self.Tserver.comments[keyword], t]
 
+    def request_keyword(self, keyword):
+        """
+        Reads one keyword value from the telescope server.
+        Raises ConnectionError if the server returns an error.
+        """
+
+        command = self.Tserver.make_packet("REQUEST " + self.Tserver.keywords[keyword])
+
+        # replies are framed by their terminator so no length guess is needed
+        ReplyLength = self.Tserver.ReplyLengths[keyword]
+        reply = self.Tserver.command(command, ReplyLength + self.Tserver.Offset)
+        if reply[0] != "OK":
+            raise ConnectionError(reply[1])
+        reply = self.Tserver.parse_reply(reply[1], ReplyLength)
+
+        return self.Tserver.format_coordinate(keyword, reply)
+
+    def get_fallback(self, keyword, error):
+        """
+        Returns [value, comment, type] for a keyword which could not be read,
+        using its last known good value with the comment marked.
+        Returns an error if there is no good value.
+        """
+
+        azcam.log(f"Telescope keyword {keyword} not read: {error}")
+
+        good = self.gather.get_good(keyword)
+        if good is None:
+            self.header.set_keyword(keyword, "")
+            return ["ERROR", str(error)]
+
+        value, t = good
+        comment = "%s [last good %s]" % (
+            self.Tserver.comments[keyword],
+            time.strftime("%H:%M:%S", time.localtime(t)),
+        )
+        self.header.set_keyword(keyword, value, comment)
+
+        value, vtype = self.header.convert_type(value, self.header.typestrings[keyword])
+
+        return [value, comment, vtype]
+
     # **************************************************************************************************
     # Focus
     # **************************************************************************************************
@@ -199,24 +692,20 @@ class VattTCS(Telescope):
         if self.DEBUG == 1:
             return
 
-        replylen = 1024
+        before = self.read_motion(self.position_keywords)
 
-        command = "EPOCH %s" % Epoch
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
-        command = "NEXTRA %s" % RA
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
-        command = "NEXTDEC %s" % Dec
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
+        reply = self.send_slew(RA, Dec, Epoch)
+        if azcam.utils.check_reply(reply):
+            return reply
 
-        command = "MOVNEXT"
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
+        # no wait if already at the target
+        if self.is_at_position(RA, Dec, Epoch, before):
+            azcam.log("Telescope already at requested position")
+            return
 
-        # wait for motion to START
-        time.sleep(1.5)
+        # wait for motion to START, a short move may finish before it is seen
+        if not self.wait_for_move_start(-1, RA, Dec, Epoch):
+            azcam.log("Telescope motion not detected")
 
         # wait for motion to stop
         reply = self.wait_for_move()
@@ -237,27 +726,135 @@ class VattTCS(Telescope):
         if self.DEBUG == 1:
             return
 
-        replylen = 1024
+        reply = self.send_slew(RA, Dec, Epoch)
+        if azcam.utils.check_reply(reply):
+            azcam.log("move_start error: %s" % reply[1])
 
-        command = "EPOCH %s" % Epoch
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
-        command = "NEXTRA %s" % RA
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
-        command = "NEXTDEC %s" % Dec
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
+        return
 
-        command = "MOVNEXT"
-        command = self.Tserver.make_packet(command)
-        reply = self.Tserver.command(command, replylen)
+    def send_slew(self, RA, Dec, Epoch=2000.0):
+        """
+        Sends the EPOCH, NEXTRA, NEXTDEC, and MOVNEXT commands over one connection
+        and checks each reply.
+        """
 
-        return
+        commands = [
+            "EPOCH %s" % Epoch,
+            "NEXTRA %s" % RA,
+            "NEXTDEC %s" % Dec,
+            "MOVNEXT",
+        ]
+        packets = [self.Tserver.make_packet(command) for command in commands]
+
+        replies = self.Tserver.command_sequence(packets, 1024)
 
-    def wait_for_move(self):
+        for command, reply in zip(commands, replies):
+            if reply[0] != "OK" or not self.Tserver.check_reply(reply[1]):
+                return [
+                    "ERROR",
+                    "telescope command %s failed: %s" % (command, reply[1]),
+                ]
+
+        return ["OK"]
+
+    def wait_for_move_start(self, timeout=-1, RA=None, Dec=None, Epoch=2000.0):
+        """
+        Wait for telescope motion to start after a move command.
+        Returns True if motion started, or if the telescope is stopped at the
+        optional target RA and Dec, so a short move which finished before
+        motion was seen does not wait.
+        Returns False if neither happened within timeout seconds (default
+        move_start_timeout).
+        MOTION may be reported after the coordinates start to change, so a
+        change of coordinates alone does not end the wait.
+        """
+
+        if timeout == -1:
+            timeout = self.move_start_timeout
+
+        keywords = [] if RA is None else self.position_keywords
+
+        t0 = time.time()
+        while time.time() - t0 < timeout:
+            values = self.read_motion(keywords)
+            if values.get("MOTION"):
+                return True
+            if RA is not None and self.is_at_position(RA, Dec, Epoch, values):
+                return True
+
+            time.sleep(self.move_poll_min)
+
+        return False
+
+    def is_at_position(self, RA, Dec, Epoch, values):
+        """
+        Returns True if the telemetry in values is stopped within move_tolerance arcsecs
+        of RA and Dec. Returns False if this cannot be determined.
+        """
+
+        try:
+            if values.get("MOTION") != 0:
+                return False
+            if abs(float(Epoch) - float(values["EQUINOX"])) > 0.01:
+                return False
+            ra = sexagesimal_to_float(RA) * 15.0
+            dec = sexagesimal_to_float(Dec)
+            ra_now = sexagesimal_to_float(values["RA"]) * 15.0
+            dec_now = sexagesimal_to_float(values["DEC"])
+        except Exception:
+            return False
+
+        dra = (ra - ra_now + 180.0) % 360.0 - 180.0
+        dra = dra * math.cos(math.radians(dec))
+        distance = math.hypot(dra, dec - dec_now) * 3600.0
+
+        return distance <= self.move_tolerance
+
+    def read_motion(self, keywords=None):
+        """
+        Returns a dictionary of telemetry values including MOTION, read with one
+        telemetry snapshot when use_snapshot is set.
+        Otherwise, or if the snapshot fails, MOTION and the optional list of
+        keywords are read with get_keyword(). MOTION is not included if it
+        could not be read.
+        """
+
+        if self.use_snapshot:
+            values = self.get_snapshot()
+            if "MOTION" in values:
+                return values
+
+        values = {}
+        for keyword in ["MOTION"] + (keywords or []):
+            reply = self.get_keyword(keyword)
+            if not azcam.utils.check_reply(reply):
+                values[keyword] = reply[0]
+
+        return values
+
+    def get_coords(self, values):
+        """
+        Returns "RA DEC" for logging, reading them if they are not in values.
+        """
+
+        coords = []
+        for keyword in ["RA", "DEC"]:
+            value = values.get(keyword)
+            if value is None:
+                reply = self.get_keyword(keyword)
+                value = "?" if azcam.utils.check_reply(reply) else reply[0]
+            coords.append(str(value))
+
+        return " ".join(coords)
+
+    def wait_for_move(self, timeout=-1):
         """
         Wait for telescope to stop moving.
+        MOTION, RA, and DEC are read with one telemetry read each cycle, or
+        MOTION alone when use_snapshot is not set, see read_motion(), polling
+        faster at first and slowing down during long slews.
+        timeout is the maximum wait in seconds, default is move_timeout.
+        CANCEL is sent to the telescope if the timeout is reached.
         """
 
         if not self.enabled:
@@ -267,37 +864,37 @@ class VattTCS(Telescope):
         if self.DEBUG == 1:
             return
 
-        # loop without timeout
-        azcam.log("Checking for telescope motion...")
-        cycle = 0
-        while True:
-            reply = self.get_keyword("MOTION")
-            if azcam.utils.check_reply(reply):
-                return reply
-            try:
-                motion = int(reply[1])
-            except:
-                azcam.AzCamError("bad MOTION status keyword: %s" % reply[1])
+        if timeout == -1:
+            timeout = self.move_timeout
 
-            if not motion:
+        azcam.log("Checking for telescope motion...")
+        t0 = time.time()
+        interval = self.move_poll_min
+        last_log = t0
+        errors = 0
+        while time.time() - t0 < timeout:
+            values = self.read_motion()
+            if "MOTION" not in values:
+                errors += 1
+                if errors >= self.move_max_errors:
+                    return ["ERROR", "could not read telescope MOTION status"]
+                time.sleep(interval)
+                continue
+            errors = 0
+
+            if not values["MOTION"]:
                 azcam.log("Telescope reports it is STOPPED")
-                azcam.log(
-                    "Coords:", self.get_keyword("RA")[1], self.get_keyword("DEC")[1]
-                )
-                azcam.log(
-                    "Coords:", self.get_keyword("RA")[1], self.get_keyword("DEC")[1]
-                )
-                azcam.log(
-                    "Coords:", self.get_keyword("RA")[1], self.get_keyword("DEC")[1]
-                )
+                azcam.log("Coords:", self.get_coords(values))
                 return
-            else:
-                azcam.log(
-                    "Coords:", self.get_keyword("RA")[1], self.get_keyword("DEC")[1]
-                )
 
-            time.sleep(0.1)
-            cycle += 1  # not used for now
+            # rate limit coordinate logging during motion
+            now = time.time()
+            if now - last_log >= self.move_log_interval:
+                azcam.log("Coords:", self.get_coords(values))
+                last_log = now
+
+            time.sleep(interval)
+            interval = min(interval * self.move_poll_factor, self.move_poll_max)
 
         # stop the telescope
         azcam.log("Telescope motion TIMEOUT - sending CANCEL")
@@ -305,7 +902,21 @@ class VattTCS(Telescope):
         command = self.Tserver.make_packet(command)
         reply = self.Tserver.command(command, 1024)
 
-        return
+        return ["ERROR", "telescope motion timeout"]
+
+    def wait_for_move_async(self, timeout=-1, callback=None):
+        """
+        Wait for telescope to stop moving in a background thread.
+        Returns a concurrent.futures.Future whose result is the wait_for_move() reply.
+        callback is an optional function called with that reply when motion stops.
+        """
+
+        future = self.move_executor.submit(self.wait_for_move, timeout)
+
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+
+        return future
 
 
 class TelcomServerInterface(object):
@@ -404,6 +1015,25 @@ class TelcomServerInterface(object):
         "FILTER": -1,
     }
 
+    # keywords which are decoded from the full telemetry record
+    TelemetryKeywords = [
+        "RA",
+        "DEC",
+        "AIRMASS",
+        "HA",
+        "LST-OBS",
+        "EQUINOX",
+        "JULIAN",
+        "ELEVAT",
+        "AZIMUTH",
+        "ROTANGLE",
+        "MOTION",
+        "ST",
+        "EPOCH",
+    ]
+    TelemetryRequest = "ALL"  # TCS name of full telemetry record
+    TelemetryLength = 1024  # receive size for telemetry record
+
     def __init__(self):
         """
         Initialize communication interface to telescope server.
@@ -414,22 +1044,66 @@ class TelcomServerInterface(object):
         self.TELID = "VATT"
         self.Offset = 10
 
+        # socket timeout in seconds
+        self.Timeout = 5.0
+
+        # persistent connection pool, created on first command
+        self.pool = None
+        self.PoolSize = 4
+        self.PoolLock = threading.Lock()
+
+        # telemetry record decoder compiled from the keyword tables
+        self.decoder = TelemetryDecoder(
+            self.Offsets, self.ReplyLengths, self.typestrings, self.TelemetryKeywords
+        )
+
         return
 
+    def get_pool(self):
+        """
+        Returns the connection pool for the current Host and Port.
+        A new pool is made if the server address has changed.
+        """
+
+        with self.PoolLock:
+            pool = self.pool
+            if pool is None or pool.host != self.Host or pool.port != self.Port:
+                if pool is not None:
+                    pool.close_all()
+                pool = TelcomConnectionPool(
+                    self.Host, self.Port, self.PoolSize, self.Timeout
+                )
+                self.pool = pool
+
+        return pool
+
+    def get_pool_stats(self):
+        """
+        Returns connection pool hit/miss and reconnect counters.
+        """
+
+        return self.get_pool().get_stats()
+
+    def get_resolver_stats(self):
+        """
+        Returns host name cache hit counters and lookup times.
+        """
+
+        return resolver.get_stats()
+
     def open(self, Host="", Port=-1):
         """
         Opens a connection (socket) to the telescope server.
         Creates the socket and connects.
+        Not used by command(), which uses pooled connections.
         """
         if Host != "":
             self.Host = Host
         if Port != -1:
             self.Port = Port
 
-        self.Socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.Socket.settimeout(5.0)
         try:
-            self.Socket.connect((self.Host, self.Port))
+            self.Socket = create_connection(self.Host, self.Port, self.Timeout)
             return ["OK"]
         except Exception as inst:
             return ["ERROR", '"could not open telescope server socket: %s"' % inst]
@@ -437,28 +1111,185 @@ class TelcomServerInterface(object):
     def close(self):
         """
         Closes an open connection (socket) to a telescope server.
+        Also closes all idle pooled connections.
         """
         try:
             self.Socket.close()
         except:
             pass
 
+        if self.pool is not None:
+            self.pool.close_all()
+
     def command(self, command, ReplyLength):
         """
         Sends a command to the telescope server and receives the reply.
-        Opens and closes the socket each time.
+        The reply is read up to its line terminator, ReplyLength is not used.
+        Uses a persistent pooled connection. If a reused connection was dropped
+        by the server the command is sent once more on a new connection.
         """
 
-        reply = self.open()
+        t0 = time.perf_counter()
+        reply = self.pooled_command(command, ReplyLength)
+        stats.record(
+            "tcs",
+            self.get_command_name(command),
+            time.perf_counter() - t0,
+            reply[0] != "OK",
+        )
+
+        return reply
+
+    def get_command_name(self, command):
+        """
+        Internal Use Only.<br>
+        Returns the name of a command packet for statistics, like "MOVNEXT" or "REQUEST RA".
+        """
+
+        tokens = self.strip_packet(command).split()
+        if not tokens:
+            return ""
+        if tokens[0] == "REQUEST" and len(tokens) > 1:
+            return "REQUEST " + tokens[1]
+
+        return tokens[0]
+
+    def pooled_command(self, command, ReplyLength):
+        """
+        Internal Use Only.<br>
+        Sends a command on a pooled connection, see command().
+        """
+
+        pool = self.get_pool()
+
+        try:
+            conn, reused = pool.acquire()
+        except Exception as inst:
+            return ["ERROR", '"could not open telescope server socket: %s"' % inst]
+
+        reply, dropped = self.transact(conn, command, ReplyLength)
+
+        if dropped and reused:
+            pool.discard(conn)
+            try:
+                conn = pool.reconnect()
+            except Exception as inst:
+                return ["ERROR", '"could not open telescope server socket: %s"' % inst]
+            reply, dropped = self.transact(conn, command, ReplyLength)
+
         if reply[0] == "OK":
-            self.send(command)
-            reply = self.recv(ReplyLength)
-            self.close()
+            pool.release(conn)
         else:
-            pass
+            pool.discard(conn)
 
         return reply
 
+    def command_sequence(self, commands, ReplyLength):
+        """
+        Sends a list of commands over one connection and returns a list of replies.
+        All commands are written at once, then one reply line is read for each.
+        Commands after a failed reply are not sent and return an error.
+        """
+
+        t0 = time.perf_counter()
+        replies = self.pooled_sequence(commands, ReplyLength)
+        name = "+".join([self.get_command_name(command) for command in commands])
+        stats.record("tcs", name, time.perf_counter() - t0, replies[-1][0] != "OK")
+
+        return replies
+
+    def pooled_sequence(self, commands, ReplyLength):
+        """
+        Internal Use Only.<br>
+        Sends a list of commands on one pooled connection, see command_sequence().
+        """
+
+        pool = self.get_pool()
+
+        try:
+            conn, reused = pool.acquire()
+        except Exception as inst:
+            reply = ["ERROR", '"could not open telescope server socket: %s"' % inst]
+            return [reply] * len(commands)
+
+        replies, dropped = self.transact_sequence(conn, commands, ReplyLength)
+
+        # nothing was processed on a dropped connection so resend all
+        if dropped and reused:
+            pool.discard(conn)
+            try:
+                conn = pool.reconnect()
+            except Exception as inst:
+                reply = ["ERROR", '"could not open telescope server socket: %s"' % inst]
+                return [reply] * len(commands)
+            replies, dropped = self.transact_sequence(conn, commands, ReplyLength)
+
+        if replies[-1][0] == "OK":
+            pool.release(conn)
+        else:
+            pool.discard(conn)
+
+        return replies
+
+    def transact_sequence(self, conn, commands, ReplyLength):
+        """
+        Internal Use Only.<br>
+        Writes several commands on a pooled connection and reads one reply each.
+        Returns [replies, dropped] as for transact().
+        """
+
+        data = "".join([command + "\r\n" for command in commands])
+        try:
+            conn.socket.sendall(str.encode(data))
+        except Exception as inst:
+            reply = ["ERROR", "telescope server write error: %s" % inst]
+            return [[reply] * len(commands), True]
+
+        replies = []
+        for command in commands:
+            try:
+                replies.append(["OK", conn.reader.read_reply()])
+            except Exception as inst:
+                dropped = len(replies) == 0 and isinstance(inst, ConnectionError)
+                reply = ["ERROR", "telescope server read error: %s" % inst]
+                replies += [reply] * (len(commands) - len(replies))
+                return [replies, dropped]
+
+        return [replies, False]
+
+    def check_reply(self, reply):
+        """
+        Returns True if a command reply echoes the packet header and reports no error.
+        """
+
+        reply = reply.strip()
+        if not reply.startswith(self.make_packet("").strip()):
+            return False
+
+        return "ERROR" not in reply.upper()
+
+    def transact(self, conn, command, ReplyLength):
+        """
+        Internal Use Only.<br>
+        Sends a command on a pooled connection and reads the reply.
+        Returns [reply, dropped] where dropped is True if the server had closed
+        the connection before the command could be processed.
+        """
+
+        try:
+            conn.socket.sendall(str.encode(command + "\r\n"))
+        except Exception as inst:
+            return [["ERROR", "telescope server write error: %s" % inst], True]
+
+        try:
+            msg = conn.reader.read_reply()
+        except ConnectionError:
+            return [["ERROR", "telescope server closed connection"], True]
+        except Exception as inst:
+            return [["ERROR", "telescope server read error: %s" % inst], False]
+
+        return [["OK", msg], False]
+
     def send(self, command):
         """
         Sends a command to a socket telescope.
@@ -501,15 +1332,68 @@ class TelcomServerInterface(object):
         Data returned may be of type string, integer, or float.
         """
 
-        ReplyLength = self.ReplyLengths[keyword]
+        try:
+            reply = self.decoder.decode_keyword(keyword, telemetry)
+        except Exception as message:
+            azcam.log("ERROR reading telescope data (%s):" % keyword, message)
+            return ["ERROR", message]
+
+        return ["OK", reply]
+
+    def get_telemetry(self):
+        """
+        Reads the full telemetry record from the telescope server in one exchange.
+        Returns ["OK", telemetry] where telemetry is the fixed-width record
+        described by Offsets and ReplyLengths, or ["ERROR", message].
+        """
+
+        command = self.make_packet("REQUEST " + self.TelemetryRequest)
+        reply = self.command(command, self.TelemetryLength)
+        if reply[0] != "OK":
+            return reply
 
-        ReplyLength = ReplyLength + 3
-        if keyword == "ROTANGLE":
-            ReplyLength = ReplyLength - 2
+        telemetry = self.strip_packet(reply[1])
+        if telemetry.startswith("ERROR"):
+            return ["ERROR", telemetry]
 
-        reply = telemetry[
-            self.Offsets[keyword] - 1 : self.Offsets[keyword] + ReplyLength
-        ]
+        return ["OK", telemetry]
+
+    def strip_packet(self, reply):
+        """
+        Internal Use Only.<br>
+        Removes the packet header and terminator from a reply.
+        """
+
+        reply = reply.rstrip("\r\n")
+        prefix = self.make_packet("")
+        if reply.startswith(prefix):
+            reply = reply[len(prefix) :]
+
+        return reply
+
+    def parse_telemetry(self, telemetry, keywords=None):
+        """
+        Returns a dictionary of keyword values decoded from one telemetry string.
+        keywords is a list of keywords to decode, default is all telemetry keywords.
+        Keywords which cannot be decoded are not included.
+        """
+
+        errors = []
+        values = self.decoder.decode(telemetry, errors)
+        if errors:
+            azcam.log("ERROR reading telescope data (%s)" % " ".join(errors))
+
+        if keywords is not None:
+            values = {k: values[k] for k in keywords if k in values}
+
+        return values
+
+    def format_coordinate(self, keyword, reply):
+        """
+        Internal Use Only.<br>
+        Adds colons to RA (HHMMSS.ss) and DEC (sDDMMSS.s) values.
+        Other keyword values are returned unchanged.
+        """
 
         # parse RA and DEC specially
         if keyword == "RA":
@@ -519,17 +1403,7 @@ class TelcomServerInterface(object):
         else:
             pass
 
-        # convert type
-        try:
-            if self.typestrings[keyword] == "int":
-                reply = int(reply)
-            elif self.typestrings[keyword] == "float":
-                reply = float(reply)
-        except Exception as message:
-            azcam.log("ERROR reading telescope data (%s):" % keyword, message)
-            return ["ERROR", message]
-
-        return ["OK", reply]
+        return reply
 
     def parse_reply(self, reply, ReplyLength):
         """
@@ -548,10 +1422,6 @@ class TelcomServerInterface(object):
         Internal Use Only.
         """
 
-        while 1:
-            try:
-                List.remove("")
-            except:
-                break
+        List[:] = [item for item in List if item != ""]
 
         return List
@@ -0,0 +1,184 @@
+# Contains the Tracer class which records timing spans in Chrome trace event format.
+
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Tracer(object):
+    """
+    Records nested timing spans and appends them to a per-night trace file in
+    Chrome trace event format (JSON array), which chrome://tracing and
+    Perfetto can load. The closing bracket is optional in this format so
+    events are appended as they finish.
+    Spans may also be collected in memory for a summary.
+    """
+
+    def __init__(self, folder=""):
+
+        # trace files are written here, empty for no file
+        self.folder = folder
+        self.enabled = 1
+
+        # the night starts at local noon
+        self.night_offset = 12.0  # hours
+
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.file = None
+        self.filename = ""
+        self.threads = set()
+
+        self.collecting = False
+        self.collected = []
+
+    def get_filename(self):
+        """
+        Returns the name of the trace file for the current night.
+        """
+
+        night = datetime.datetime.now() - datetime.timedelta(hours=self.night_offset)
+
+        return os.path.join(self.folder, "trace_%s.json" % night.strftime("%Y%m%d"))
+
+    @contextlib.contextmanager
+    def span(self, name, cat="exposure", **args):
+        """
+        Context manager which records the time spent in its block as a span.
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, cat, start, time.time() - start, args)
+
+    def traced(self, function, name, cat="exposure"):
+        """
+        Returns function wrapped so each call is recorded as a span.
+        """
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.span(name, cat):
+                return function(*args, **kwargs)
+
+        wrapper.traced = True
+
+        return wrapper
+
+    def add(self, name, cat, start, duration, args=None):
+        """
+        Adds a completed span which started at time start and lasted duration seconds.
+        """
+
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": int(start * 1e6),
+            "dur": int(duration * 1e6),
+            "pid": self.pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+
+        with self.lock:
+            if self.collecting:
+                self.collected.append([name, start, duration])
+            if self.folder:
+                try:
+                    self.write(event, thread)
+                except OSError:
+                    self.folder = ""
+
+        return
+
+    def write(self, event, thread):
+        """
+        Internal Use Only.<br>
+        Appends an event to the trace file, opening a new file each night.
+        """
+
+        filename = self.get_filename()
+        if filename != self.filename:
+            self.close()
+            os.makedirs(self.folder, exist_ok=True)
+            new = not os.path.exists(filename)
+            self.file = open(filename, "a")
+            if new:
+                self.file.write("[\n")
+            self.filename = filename
+            self.threads = set()
+
+        if thread.ident not in self.threads:
+            self.threads.add(thread.ident)
+            meta = {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": thread.ident,
+                "args": {"name": thread.name},
+            }
+            self.file.write(json.dumps(meta, separators=(",", ":")) + ",\n")
+
+        self.file.write(json.dumps(event, separators=(",", ":")) + ",\n")
+
+    def flush(self):
+        """
+        Writes buffered events to the trace file.
+        """
+
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+        return
+
+    def close(self):
+        """
+        Internal Use Only.<br>
+        Closes the trace file.
+        """
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.filename = ""
+
+    def start_collect(self):
+        """
+        Starts collecting spans in memory.
+        """
+
+        with self.lock:
+            self.collected = []
+            self.collecting = True
+
+        return
+
+    def stop_collect(self):
+        """
+        Stops collecting spans and returns a list of [name, start, duration].
+        """
+
+        with self.lock:
+            self.collecting = False
+            collected = self.collected
+            self.collected = []
+
+        return collected
+
+
+# shared by all VATT tools
+tracer = Tracer()
@@ -1,5 +1,45 @@
 import re
 import socket
+import threading
+import time
+
+from indi_parser import IndiStreamParser, get_filters
+from latency_stats import stats
+from resolver_cache import create_connection
+
+# extracts the upper and lower filter names from a FILTERS message tag
+FILTER_REGEX = re.compile(r'message="(\w*):(.+?(?=lower))(\w*):(.+?(?="))"')
+
+
+def parse_filters(resp):
+    """
+    Description: Extract the filters in the beam from an INDI
+    FILTERS message like:
+    <message device="FILTERS" message="upper:clear lower:U">
+    Args resp: response string from the INDI server
+    Returns: A dictionary with the filters in the beam.
+    """
+    match = FILTER_REGEX.search(resp)
+    if match is not None:
+        tmatch = match.groups()
+        if len(tmatch) != 4:
+            raise ValueError("Could not get filters from {}".format(resp))
+        fdict = {tmatch[0]: tmatch[1], tmatch[2]: tmatch[3]}
+
+    else:
+
+        raise ValueError("Could not get filters from {}".format(resp))
+
+    return fdict
+
+
+def format_filters(fdict):
+    """
+    Description: Format filters for the FILTER header keyword.
+    Args fdict: dictionary with the filters in the beam
+    Returns: string like "upper: clear lower: U"
+    """
+    return f"upper: {fdict['upper']} lower: {fdict['lower']}"
 
 
 class vatt_filters:
@@ -7,65 +47,203 @@ class vatt_filters:
     redesigned guidebox at VATT."""
 
     def __init__(self):
-        pass
+        self.host = "vattcontrol.vatt"
+        self.port = 7600
+
+        # filter state pushed by the INDI server while subscribed,
+        # used only while the subscriber is connected
+        self.filters = None
+        self.timestamp = 0.0
+        self.connected = False
+        self.lock = threading.Lock()
+        self.subscriber = None
+        self.stop_event = threading.Event()
+
+        # cached filters older than this are not used, seconds (0 for no limit)
+        self.max_age = 0.0
+
+        # deadline for a getfilters_now reply, seconds
+        self.timeout = 2.0
 
-    def connect(self, ip: str = "vattcontrol.vatt", port: int = 7600):
+        # subscriber reconnect delay limits, seconds
+        self.retry_min = 1.0
+        self.retry_max = 30.0
+
+    def connect(self, ip: str = "", port: int = 0):
         """
         Description: Use socket class to create a connection
         to the INDI server that controls the guidebox
         Args ip, port
         Return: socket connection instance
         """
-        soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        HOST = socket.gethostbyname(ip)
-        soc.settimeout(0.1)
-        soc.connect((HOST, int(port)))
+        if ip == "":
+            ip = self.host
+        if port == 0:
+            port = self.port
+        soc = create_connection(ip, int(port), 0.1)
         return soc
 
+    def subscribe(self):
+        """
+        Description: Start a thread which keeps a connection
+        to the INDI server open and stores each FILTERS message
+        it pushes, so getfilters can answer from memory.
+        """
+        if self.subscriber is not None and self.subscriber.is_alive():
+            return
+        self.stop_event.clear()
+        self.subscriber = threading.Thread(
+            target=self.subscribe_loop, name="filtersubscriber", daemon=True
+        )
+        self.subscriber.start()
+
+    def unsubscribe(self):
+        """
+        Description: Stop the subscriber thread.
+        """
+        self.stop_event.set()
+        if self.subscriber is not None:
+            self.subscriber.join(5.0)
+        self.subscriber = None
+
+    def is_subscribed(self):
+        """
+        Returns: True if the subscriber thread is running.
+        """
+        return self.subscriber is not None and self.subscriber.is_alive()
+
+    def subscribe_loop(self):
+        """
+        Description: Subscriber thread. Reconnects with increasing
+        delay if the connection fails.
+        """
+        delay = self.retry_min
+        while not self.stop_event.is_set():
+            try:
+                self.read_updates()
+                delay = self.retry_min
+            except Exception:
+                pass
+            self.stop_event.wait(delay)
+            delay = min(delay * 2, self.retry_max)
+
+    def read_updates(self):
+        """
+        Description: Connect, send getProperties and store
+        filters from every message received until the
+        connection closes or the subscriber is stopped.
+        """
+        conn = self.connect()
+        try:
+            conn.settimeout(1.0)
+            conn.send(b"<getProperties version='1.7' device='FILTERS' />")
+            parser = IndiStreamParser()
+            with self.lock:
+                self.connected = True
+            while not self.stop_event.is_set():
+                try:
+                    chunk = conn.recv(4096)
+                except socket.timeout:
+                    continue
+                if chunk == b"":
+                    return
+                for element in parser.feed(chunk):
+                    fdict = get_filters(element)
+                    if fdict is not None:
+                        self.set_filters(fdict)
+        finally:
+            # changes are not seen until reconnected, so forget the filters
+            with self.lock:
+                self.connected = False
+                self.filters = None
+            conn.close()
+
+    def set_filters(self, fdict):
+        """
+        Description: Store the current filters with the time received.
+        """
+        with self.lock:
+            self.filters = fdict
+            self.timestamp = time.time()
+        stats.count("filters", "updates")
+
+    def get_cached(self):
+        """
+        Returns: [filters dictionary, timestamp] from the subscriber,
+        or None if the subscriber is not connected, no filters have
+        been received, or they are too old.
+        """
+        with self.lock:
+            if not self.connected or self.filters is None:
+                return None
+            if self.max_age > 0 and time.time() - self.timestamp > self.max_age:
+                return None
+            return [dict(self.filters), self.timestamp]
+
     def getfilters(self):
+        """
+        Description: Returns the filters from the subscriber
+        if available, else reads them with getfilters_now.
+
+        Returns: A dictionary with the filters in the beam.
+        """
+        cached = self.get_cached() if self.is_subscribed() else None
+        if cached is not None:
+            stats.count("filters", "cached")
+            return cached[0]
+
+        t0 = time.perf_counter()
+        try:
+            fdict = self.getfilters_now()
+        except Exception:
+            stats.record("filters", "getfilters_now", time.perf_counter() - t0, True)
+            raise
+        stats.record("filters", "getfilters_now", time.perf_counter() - t0)
+
+        return fdict
+
+    def getfilters_now(self):
         """
         Description: Connects to the INDI server and sends
         a getProperties xml tag. Then listen for a response.
         the response should come in the form of an xml tag
         like:
         <message device="FILTERS" message="upper:clear lower:U">
-        A regular expresion is then used to extract the filters
-        in the beam in the upper and lower wheels.
+        The response is parsed incrementally and returned as
+        soon as the closing tag of that message arrives.
 
         Returns: A dictionary with the filters in the beam.
 
         """
         conn = self.connect()
-        qrystring = b"<getProperties version='1.7' device='FILTERS' />"
-        conn.send(qrystring)
-        # regex = re.compile('message="(\w*):(\w*) (\w*):(\w*)"')
-        regex = re.compile('message="(\w*):(.+?(?=lower))(\w*):(.+?(?="))"')
-        resp = ""
-        while True:
-            try:
-                resp += conn.recv(100).decode()
-            except socket.timeout:
-                if ">" in resp[-4:]:
-                    break
-                else:
+        try:
+            qrystring = b"<getProperties version='1.7' device='FILTERS' />"
+            conn.send(qrystring)
+            parser = IndiStreamParser()
+            deadline = time.time() + self.timeout
+            fdict = None
+            while fdict is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
                     raise socket.timeout(
                         "Could not get a response from {} with string {}".format(
-                            str(conn), qrystring.encode()
+                            str(conn), qrystring.decode()
                         )
                     )
+                conn.settimeout(remaining)
+                try:
+                    chunk = conn.recv(4096)
+                except socket.timeout:
+                    continue
+                if chunk == b"":
+                    raise ValueError("Connection closed before filters were received")
+                for element in parser.feed(chunk):
+                    fdict = get_filters(element)
+                    if fdict is not None:
+                        break
+        finally:
+            conn.close()
 
-            if ">" in resp[-4:]:
-                break
-
-        match = regex.search(resp)
-        if match is not None:
-            tmatch = match.groups()
-            if len(tmatch) != 4:
-                raise ValueError("Could not get filters from {}".format(resp))
-            fdict = {tmatch[0]: tmatch[1], tmatch[2]: tmatch[3]}
-
-        else:
-
-            raise ValueError("Could not get filters from {}".format(resp))
+        self.set_filters(fdict)
 
         return fdict
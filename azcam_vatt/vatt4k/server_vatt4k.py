@@ -1,23 +1,17 @@
 import datetime
 import os
 import sys
+import time
+
+# startup timing starts here
+t0 = time.perf_counter()
 
 import azcam
 import azcam.server
 import azcam.shortcuts_server
 from azcam.cmdserver import CommandServer
-from azcam.system import System
 from azcam.instrument import Instrument
-from azcam_monitor.monitorinterface import AzCamMonitorInterface
-from azcam_webserver.web_server import WebServer
-from azcam_arc.controller_arc import ControllerArc
-from azcam_arc.exposure_arc import ExposureArc
 from azcam_arc.tempcon_arc import TempConArc
-from azcam_ds9.ds9display import Ds9Display
-import azcam_exptool
-import azcam_status
-import azcam_observe.webobs
-
 
 # ****************************************************************
 # parse command line arguments
@@ -48,6 +42,26 @@ for p in ["vatt4k"]:
 commonfolder = os.path.abspath(os.path.join(azcam.db.systemfolder, "../common"))
 azcam.utils.add_searchfolder(commonfolder, 0)
 
+# ****************************************************************
+# import optional subsystems in the background
+# ****************************************************************
+from startup import StartupTimer
+
+timer = StartupTimer(t0)
+timer.mark("import azcam")
+timer.background(
+    "import optional",
+    timer.import_modules,
+    [
+        "azcam_ds9.ds9display",
+        "azcam_webserver.web_server",
+        "azcam_monitor.monitorinterface",
+        "azcam_exptool",
+        "azcam_status",
+        "azcam_observe.webobs",
+    ],
+)
+
 # ****************************************************************
 # enable logging
 # ****************************************************************
@@ -56,82 +70,61 @@ azcam.db.logger.logfile = os.path.join(azcam.db.datafolder, "logs", f"server_{tt
 azcam.db.logger.start_logging()
 
 azcam.log(f"Configuring for vatt4k")
+timer.mark("logging")
+
+# ****************************************************************
+# system configuration, see system_config.py
+# ****************************************************************
+from system_config import SystemBuilder
+
+builder = SystemBuilder("vatt4k", azcam.db.systemfolder, azcam.db.datafolder)
+builder.load()
+timer.mark("configuration")
 
 # ****************************************************************
 # define and start command server
 # ****************************************************************
 cmdserver = CommandServer()
-cmdserver.port = 2402
+cmdserver.port = builder.config["cmdserver_port"]
 azcam.log(f"Starting cmdserver - listening on port {cmdserver.port}")
 # cmdserver.welcome_message = "Welcome - azcam-itl server"
 cmdserver.start()
+timer.mark("cmdserver")
 
 # ****************************************************************
 # controller
 # ****************************************************************
-controller = ControllerArc()
-azcam.api.controller = controller
-controller.timing_board = "gen2"
-controller.clock_boards = ["gen2"]
-controller.video_boards = ["gen2", "gen2"]
-controller.utility_board = "gen2"
-controller.set_boards()
-controller.camserver.set_server("vattccdc", 2405)
-controller.pci_file = os.path.join(
-    azcam.db.systemfolder, "dspcode", "dsppci", "pci2.lod"
-)
-controller.timing_file = os.path.join(
-    azcam.db.systemfolder, "dspcode", "dsptiming", "tim2.lod"
-)
-controller.utility_file = os.path.join(
-    azcam.db.systemfolder, "dspcode", "dsputility", "util2.lod"
+from controller_vatt import ControllerVatt
+
+controller = ControllerVatt()
+# DSP code cache is shared by the systems which use this controller
+controller.lodcache.folder = os.path.join(
+    os.path.dirname(azcam.db.datafolder), "dspcache"
 )
-controller.video_gain = 2
-controller.video_speed = 2
+azcam.api.controller = controller
+builder.configure_controller(controller)
+timer.mark("controller")
 
 # ****************************************************************
 # temperature controller
 # ****************************************************************
 tempcon = TempConArc()
 azcam.db.tempcon = tempcon
-tempcon.set_calibrations([0, 0, 3])
-tempcon.set_corrections([2.0, 0.0, 0.0], [1.0, 1.0, 1.0])
-tempcon.temperature_correction = 1
-tempcon.control_temperature = -115.0
+builder.configure_tempcon(tempcon)
+timer.mark("tempcon")
 
 # ****************************************************************
-# exposure
+# exposure and detector
 # ****************************************************************
-exposure = ExposureArc()
+from exposure_vatt import ExposureVatt
+
+exposure = ExposureVatt()
+exposure.tracer.folder = os.path.join(azcam.db.datafolder, "traces")
 azcam.api.exposure = exposure
-filetype = "MEF"
-exposure.filetype = exposure.filetypes[filetype]
-exposure.image.filetype = exposure.filetypes[filetype]
-exposure.display_image = 0
-exposure.folder = "/mnt/TBArray/images"
-remote_imageserver_host = "vattcontrol.vatt"
-remote_imageserver_port = 6543
-exposure.set_remote_imageserver(remote_imageserver_host, remote_imageserver_port)
-# exposure.set_remote_imageserver()
-
-# ****************************************************************
-# detector
-# ****************************************************************
-detector_vatt4k = {
-    "name": "vatt4k",
-    "description": "STA0500 4064x4064 CCD",
-    "ref_pixel": [2032, 2032],
-    "format": [4064, 7, 0, 20, 4064, 0, 0, 0, 0],
-    "focalplane": [1, 1, 1, 2, "20"],
-    "roi": [1, 4064, 1, 4064, 2, 2],
-    "ext_position": [[1, 2], [1, 1]],
-    "jpg_order": [1, 2],
-}
-exposure.set_detpars(detector_vatt4k)
-# WCS - plate scale (from Rich 19Mar13)
-sc = -0.000_052_1
-exposure.image.focalplane.wcs.scale1 = [sc, sc]
-exposure.image.focalplane.wcs.scale2 = [sc, sc]
+builder.configure_exposure(exposure)
+exposure.sender.folder = os.path.join(azcam.db.datafolder, "spool")
+exposure.sender.start()
+timer.mark("exposure")
 
 # ****************************************************************
 # instrument (not used)
@@ -144,50 +137,80 @@ instrument = Instrument()
 from telescope_vatt import VattTCS
 
 telescope = VattTCS()
+telescope.buffer_file = os.path.join(
+    azcam.db.datafolder, "telemetry", "telemetry_vatt4k.dat"
+)
+timer.mark("telescope")
 
 # ****************************************************************
 # system header template
 # ****************************************************************
-template = os.path.join(
-    azcam.db.datafolder, "templates", "FitsTemplate_vatt4k_master.txt"
-)
-system = System("vatt4k", template)
-system.set_keyword("DEWAR", "vatt4k_dewar", "Dewar name")
+system = builder.make_system()
+timer.mark("system")
 
 # ****************************************************************
 # display
 # ****************************************************************
+timer.wait("import optional")
+from azcam_ds9.ds9display import Ds9Display
+
 display = Ds9Display()
+timer.mark("display")
 
 # ****************************************************************
 # read par file
 # ****************************************************************
 pardict = azcam.api.config.read_parfile(parfile)
 azcam.api.config.update_pars(0, "azcamserver")
+timer.mark("parfile")
 
 # ****************************************************************
 # define names to imported into namespace when using cli
 # # ****************************************************************
 azcam.db.cli_cmds.update({"azcam": azcam})
 
+
 # ****************************************************************
 # web server
 # ****************************************************************
-webserver = WebServer()
-webserver.templates_folder = commonfolder
-webserver.index = f"index_VATT.html"
-webserver.port = 2403  # common port for all configurations
-webserver.start()
-azcam_exptool.load()
-azcam_status.load()
-azcam_observe.webobs.load()
+def start_webserver():
+    from azcam_webserver.web_server import WebServer
+    import azcam_exptool
+    import azcam_status
+    import azcam_observe.webobs
+    import latency_stats
+
+    webserver = WebServer()
+    webserver.templates_folder = commonfolder
+    webserver.index = f"index_VATT.html"
+    webserver.port = 2403  # common port for all configurations
+    webserver.start()
+    azcam_exptool.load()
+    azcam_status.load()
+    azcam_observe.webobs.load()
+    latency_stats.load(webserver)
+
+    return webserver
+
 
 # ****************************************************************
 # azcammonitor
 # ****************************************************************
-monitor = AzCamMonitorInterface()
-monitor.proc_path = "/azcam/azcam-vatt/bin/start_server_vatt4k.bat"
-monitor.register()
+def register_monitor():
+    from azcam_monitor.monitorinterface import AzCamMonitorInterface
+
+    monitor = AzCamMonitorInterface()
+    monitor.proc_path = builder.config["monitor_proc_path"]
+    monitor.register()
+
+    return monitor
+
+
+# web server and monitor registration are independent so start together
+timer.background("webserver", start_webserver)
+timer.background("monitor", register_monitor)
+webserver = timer.wait("webserver")
+monitor = timer.wait("monitor")
 
 # ****************************************************************
 # GUIs
@@ -203,3 +226,4 @@ if 0:
 # finish
 # ****************************************************************
 azcam.log("Configuration complete")
+timer.report()
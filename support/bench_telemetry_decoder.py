@@ -0,0 +1,179 @@
+"""
+Micro-benchmark of the TelemetryDecoder against the original per-keyword parsers.
+
+Usage: python support/bench_telemetry_decoder.py [records]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../azcam_vatt/common"))
+
+from telemetry_decoder import TelemetryDecoder
+
+# keyword tables as in TelcomServerInterface
+keywords = [
+    "RA",
+    "DEC",
+    "AIRMASS",
+    "HA",
+    "LST-OBS",
+    "EQUINOX",
+    "JULIAN",
+    "ELEVAT",
+    "AZIMUTH",
+    "ROTANGLE",
+    "MOTION",
+]
+offsets = {
+    "RA": 4,
+    "DEC": 14,
+    "AIRMASS": 57,
+    "HA": 25,
+    "LST-OBS": 35,
+    "EQUINOX": 76,
+    "JULIAN": 85,
+    "ELEVAT": 44,
+    "AZIMUTH": 50,
+    "MOTION": 1,
+    "ROTANGLE": 129,
+}
+lengths = {
+    "RA": 9,
+    "DEC": 9,
+    "AIRMASS": 5,
+    "HA": 9,
+    "LST-OBS": 8,
+    "EQUINOX": 7,
+    "JULIAN": 9,
+    "ELEVAT": 5,
+    "AZIMUTH": 6,
+    "MOTION": 1,
+    "ROTANGLE": 5,
+}
+typestrings = {
+    "RA": "str",
+    "DEC": "str",
+    "AIRMASS": "float",
+    "HA": "str",
+    "LST-OBS": "str",
+    "EQUINOX": "float",
+    "JULIAN": "float",
+    "ELEVAT": "float",
+    "AZIMUTH": "float",
+    "MOTION": "int",
+    "ROTANGLE": "float",
+}
+
+
+def make_record():
+    """
+    Returns a synthetic telemetry record.
+    """
+
+    fields = {
+        "MOTION": "0",
+        "RA": "123456.78",
+        "DEC": "+312345.6",
+        "HA": "-01:02:03",
+        "LST-OBS": "12:34:56",
+        "ELEVAT": "45.67",
+        "AZIMUTH": "123.45",
+        "AIRMASS": "1.234",
+        "EQUINOX": "2000.00",
+        "JULIAN": "2459000.5",
+        "ROTANGLE": "12.34",
+    }
+    record = [" "] * 140
+    for keyword, value in fields.items():
+        start = offsets[keyword] - 1
+        record[start : start + len(value)] = list(value)
+
+    return "".join(record)
+
+
+def original_parse_keyword(keyword, telemetry):
+    """
+    The per-keyword parser which TelemetryDecoder replaces.
+    """
+
+    ReplyLength = lengths[keyword]
+
+    ReplyLength = ReplyLength + 3
+    if keyword == "ROTANGLE":
+        ReplyLength = ReplyLength - 2
+
+    reply = telemetry[offsets[keyword] - 1 : offsets[keyword] + ReplyLength]
+    reply = reply.split()[0]
+
+    if keyword == "RA":
+        reply = "%s:%s:%s" % (reply[0:2], reply[2:4], reply[4:])
+    elif keyword == "DEC":
+        reply = "%s:%s:%s" % (reply[0:3], reply[3:5], reply[5:])
+
+    if typestrings[keyword] == "int":
+        reply = int(reply)
+    elif typestrings[keyword] == "float":
+        reply = float(reply)
+
+    return ["OK", reply]
+
+
+def original_parse_remove_null(List):
+    """
+    The null remover which parse_reply() used.
+    """
+
+    while 1:
+        try:
+            List.remove("")
+        except:
+            break
+
+    return List
+
+
+def report(name, seconds, count):
+    print(f"{name:40s} {seconds / count * 1e6:10.2f} us")
+
+
+def main():
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    decoder = TelemetryDecoder(offsets, lengths, typestrings, keywords)
+    record = make_record()
+    records = [record] * count
+
+    values = {k: original_parse_keyword(k, record)[1] for k in keywords}
+    if values != decoder.decode(record):
+        print("WARNING: decoder and original parser disagree")
+
+    print(f"Telemetry record decode ({len(keywords)} keywords), per record:")
+    t = timeit.timeit(
+        lambda: {k: original_parse_keyword(k, record)[1] for k in keywords},
+        number=count,
+    )
+    report("original parse_keyword loop", t, count)
+    t = min(timeit.repeat(lambda: decoder.decode(record), number=count, repeat=5))
+    report("TelemetryDecoder.decode (best of 5)", t, count)
+    for size in sorted(set([10, 100, count])):
+        batch = records[:size]
+        t = min(timeit.repeat(lambda: decoder.decode_batch(batch), number=1, repeat=5))
+        report(f"TelemetryDecoder.decode_batch ({size}, best of 5)", t, size)
+
+    reply = "VATT TCS 001" + " " * 200 + "123456.78"
+    print("\nReply null removal, per reply:")
+    t = timeit.timeit(
+        lambda: original_parse_remove_null(reply.split(" ")), number=count
+    )
+    report("original parse_remove_null", t, count)
+    t = timeit.timeit(
+        lambda: [item for item in reply.split(" ") if item != ""], number=count
+    )
+    report("list comprehension", t, count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Telescope path benchmarks using the local Telcom simulator.
+Reports header fill latency, slew wait overhead, and throughput with concurrent callers.
+Requires azcam to be installed.
+
+Usage: python support/bench_telescope.py [-latency 0.005] [-jitter 0.002] [-repeats 20] [-threads 8]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../azcam_vatt/common"))
+
+from telcom_simulator import TelcomSimulator
+from telescope_vatt import VattTCS
+
+
+def summary(times):
+    """
+    Returns a string of mean, median, and 95th percentile times in ms.
+    """
+
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(0.95 * len(times)))]
+
+    return "mean %7.2f  p50 %7.2f  p95 %7.2f ms" % (
+        statistics.mean(times) * 1000,
+        statistics.median(times) * 1000,
+        p95 * 1000,
+    )
+
+
+def make_telescope(sim):
+    """
+    Returns an initialized VattTCS connected to the simulator.
+    The FILTER keyword is removed as the simulator has no filter server.
+    """
+
+    telescope = VattTCS()
+    telescope.initialize()
+    telescope.Tserver.Host = sim.host
+    telescope.Tserver.Port = sim.port
+    telescope.header.delete_keyword("FILTER")
+    telescope.prefetch = 0
+
+    return telescope
+
+
+def bench_header(telescope, repeats):
+    """
+    Header fill latency for each read mode.
+    """
+
+    print("Header fill latency:")
+    modes = [
+        ["per keyword", {"use_snapshot": 0, "use_async": 0}],
+        ["snapshot", {"use_snapshot": 1, "use_async": 0}],
+        ["snapshot async", {"use_snapshot": 1, "use_async": 1}],
+    ]
+    for name, attributes in modes:
+        for attribute in attributes:
+            setattr(telescope, attribute, attributes[attribute])
+        times = []
+        for i in range(repeats):
+            t0 = time.perf_counter()
+            telescope.read_header()
+            times.append(time.perf_counter() - t0)
+        print(f"  {name:20s} {summary(times)}")
+
+    return
+
+
+def bench_slew(telescope, sim, repeats):
+    """
+    Time spent in move() beyond the simulated slew time.
+    """
+
+    print("Slew wait overhead:")
+    overheads = []
+    for i in range(repeats):
+        ra = "%02d:00:00" % (13 - i % 2)
+        t0 = time.perf_counter()
+        telescope.move(ra, "30:00:00")
+        elapsed = time.perf_counter() - t0
+        slew_time = 15.0 / sim.slew_rate + sim.settle_time
+        overheads.append(elapsed - slew_time)
+    print(f"  {'move()':20s} {summary(overheads)}")
+
+    return
+
+
+def bench_throughput(telescope, threads, repeats):
+    """
+    get_keyword() calls per second with concurrent callers.
+    """
+
+    print("Throughput with %d concurrent callers:" % threads)
+    count = repeats * 10
+
+    def worker():
+        for i in range(count):
+            telescope.get_keyword("AIRMASS")
+
+    workers = [threading.Thread(target=worker) for i in range(threads)]
+    t0 = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    print(f"  {'get_keyword':20s} {threads * count / elapsed:9.1f} calls/s")
+
+    return
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="VATT telescope path benchmarks")
+    parser.add_argument("-latency", type=float, default=0.005, help="seconds")
+    parser.add_argument("-jitter", type=float, default=0.002, help="seconds")
+    parser.add_argument("-slew_rate", type=float, default=50.0, help="deg/sec")
+    parser.add_argument("-repeats", type=int, default=20)
+    parser.add_argument("-threads", type=int, default=8)
+    parser.add_argument("-drop", type=float, default=0.0, help="fault rate")
+    args = parser.parse_args()
+
+    sim = TelcomSimulator()
+    sim.latency = args.latency
+    sim.jitter = args.jitter
+    sim.slew_rate = args.slew_rate
+    sim.settle_time = 0.1
+    sim.fault_rates["drop"] = args.drop
+    sim.start()
+    print(
+        f"Simulator on port {sim.port}, latency {args.latency}s jitter {args.jitter}s"
+    )
+
+    telescope = make_telescope(sim)
+
+    bench_header(telescope, args.repeats)
+    bench_slew(telescope, sim, max(2, args.repeats // 5))
+    bench_throughput(telescope, args.threads, args.repeats)
+
+    print("Pool:", telescope.Tserver.get_pool_stats())
+    print("Resolver:", telescope.Tserver.get_resolver_stats())
+    print("Simulator:", sim.get_stats())
+
+    telescope.aclient.stop()
+    sim.stop()
+
+
+if __name__ == "__main__":
+    main()
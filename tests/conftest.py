@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the VATT modules are imported from the common folder, as the servers do
+sys.path.append(os.path.join(os.path.dirname(__file__), "../azcam_vatt/common"))
@@ -0,0 +1,273 @@
+"""
+Tests of the ControllerVatt DSP code upload against simulated board memory.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("azcam_arc.controller_arc")
+
+from controller_vatt import ControllerVatt
+from dsp_lod import LodCache
+
+ROOT = os.path.join(os.path.dirname(__file__), "../azcam_vatt/vatt4k/dspcode")
+TIMING_FILE = os.path.join(ROOT, "dsptiming/tim2.lod")
+UTILITY_FILE = os.path.join(ROOT, "dsputility/util2.lod")
+
+
+class BoardController(ControllerVatt):
+    """
+    ControllerVatt with the timing and utility board memory simulated here.
+    """
+
+    def __init__(self, folder=""):
+
+        super().__init__()
+        self.lodcache.folder = folder
+        self.timing_file = TIMING_FILE
+        self.utility_file = UTILITY_FILE
+
+        # [space, board, address]: word
+        self.memory = {}
+
+        # files each board boots from on reset
+        self.eeprom = {2: TIMING_FILE, 3: UTILITY_FILE}
+
+        self.reads = 0
+        self.writes = 0
+        self.loads = []
+        self.fail_load = False
+
+    def boot(self):
+        for board, filename in self.eeprom.items():
+            self.write_image(board, filename)
+
+    def write_image(self, BoardNumber, filename):
+        for space, address, words in LodCache().load(filename).get_loaded():
+            for i, word in enumerate(words):
+                self.memory[(space, BoardNumber, address + i)] = word
+
+    def reset_controller(self):
+        # boards restart with the code in their EEPROMs
+        self.boot()
+
+    def read_memory(self, Type, BoardNumber, Address):
+        self.reads += 1
+        return self.memory.get((Type, BoardNumber, Address), 0)
+
+    def write_memory(self, Type, BoardNumber, Address, value):
+        self.writes += 1
+        self.memory[(Type, BoardNumber, Address)] = value
+
+    def upload_file(self, filename):
+        return filename
+
+    def load_file(self, BoardNumber, filename):
+        if self.fail_load:
+            raise OSError("load failed")
+        self.write_image(BoardNumber, filename)
+        self.loads.append(BoardNumber)
+
+    def board_command(self, Command, BoardNumber, *args):
+        return ["OK"]
+
+    def set_bias_voltages(self):
+        pass
+
+    def set_shutter(self, state):
+        pass
+
+    def start_idle(self):
+        pass
+
+    def set_video_gain(self, gain):
+        pass
+
+    def set_video_speed(self, speed):
+        pass
+
+    def select_video_outputs(self, video_select=-1):
+        self.write_memory("Y", 3, 1, 5)
+
+    def set_exposuretime(self, ExposureTime):
+        pass
+
+    def set_roi(self):
+        # as _write_controller_roi() writes the timing board parameter table
+        for address in range(0x01, 0x1C):
+            self.write_memory("Y", 2, address, 100 + address)
+
+
+def change_word(filename, outfile, space, address, word):
+    """
+    Writes a copy of a .lod file with one downloaded word changed.
+    """
+
+    with open(filename, "r") as f:
+        lines = f.read().splitlines()
+
+    segment = None
+    for n, line in enumerate(lines):
+        tokens = line.split()
+        if tokens and tokens[0].startswith("_"):
+            segment = None
+            if tokens[0] == "_DATA" and tokens[1] == space:
+                segment = int(tokens[2], 16)
+            continue
+        if segment is None:
+            continue
+        if segment <= address < segment + len(tokens):
+            tokens[address - segment] = "%06X" % word
+            lines[n] = " ".join(tokens)
+            break
+        segment += len(tokens)
+
+    with open(outfile, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    return outfile
+
+
+def test_upload_then_resident(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "full"
+    assert controller.loads == [2]
+
+    controller.reads = 0
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "resident"
+    assert controller.loads == [2]
+    assert (
+        controller.reads
+        == controller.verify_samples + 2 * controller.verify_data_samples
+    )
+
+
+def test_resident_after_parameters_written(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.upload_dsp_file(2, TIMING_FILE)
+    controller.upload_dsp_file(3, UTILITY_FILE)
+    controller.set_roi()
+    controller.write_memory("Y", 3, 1, 7)
+
+    controller.upload_dsp_file(2, TIMING_FILE)
+    controller.upload_dsp_file(3, UTILITY_FILE)
+
+    assert controller.loaded == {2: "resident", 3: "resident"}
+
+
+def test_changed_code_uploaded(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.upload_dsp_file(2, TIMING_FILE)
+    image = controller.lodcache.load(TIMING_FILE)
+    address = image.get_samples(controller.verify_samples)[5][0]
+    controller.memory[("P", 2, address)] ^= 1
+
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "full"
+    assert controller.loads == [2, 2]
+
+
+def test_unrecorded_code_uploaded(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.boot()
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "full"
+
+    # the record is kept on disk for the next server
+    memory = controller.memory
+    controller = BoardController(str(tmp_path))
+    controller.memory = memory
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "resident"
+
+
+def make_changed_file(tmp_path):
+    """
+    Returns a copy of the timing file with a program word and a parameter
+    table word changed, and the changed program address.
+    """
+
+    image = LodCache().load(TIMING_FILE)
+    address = sorted(image.get_memory("P"))[100]
+    word = image.get_memory("P")[address] ^ 0x10
+    outfile = change_word(TIMING_FILE, str(tmp_path / "tim2.lod"), "P", address, word)
+    change_word(outfile, outfile, "Y", 0x05, 0x123)
+
+    return [outfile, address, word]
+
+
+def test_reset_resident(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.reset()
+
+    assert controller.loaded == {2: "full", 3: "full"}
+
+    controller.reset()
+
+    assert controller.loaded == {2: "resident", 3: "resident"}
+    assert controller.loads == [2, 3]
+
+
+def test_reset_writes_changes(tmp_path):
+    changed, address, word = make_changed_file(tmp_path)
+    controller = BoardController(str(tmp_path / "cache"))
+    controller.reset()
+    controller.timing_file = changed
+
+    for _ in range(2):
+        controller.writes = 0
+        controller.reset()
+
+        assert controller.loaded == {2: "changes", 3: "resident"}
+        assert controller.loads == [2, 3]
+        assert controller.memory[("P", 2, address)] == word
+
+        # the parameter table is not part of the changes
+        assert controller.memory[("Y", 2, 0x05)] == 100 + 0x05
+        # the changed word, the video select, and the ROI parameters
+        assert controller.writes == 1 + 1 + 27
+
+
+def test_changes_not_resident_without_reset(tmp_path):
+    changed, address, word = make_changed_file(tmp_path)
+    controller = BoardController(str(tmp_path / "cache"))
+    controller.reset()
+    controller.upload_dsp_file(2, changed)
+
+    assert controller.loaded[2] == "changes"
+
+    # the board holds the changes until it is reset
+    controller.upload_dsp_file(2, TIMING_FILE)
+
+    assert controller.loaded[2] == "full"
+    assert controller.loads == [2, 3, 2]
+
+
+def test_power_on_forgets_boards(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.reset()
+    controller.power_on()
+    controller.reset()
+
+    assert controller.loaded == {2: "full", 3: "full"}
+
+
+def test_failed_load_forgets_board(tmp_path):
+    controller = BoardController(str(tmp_path))
+    controller.reset()
+    controller.fail_load = True
+    changed = make_changed_file(tmp_path)[0]
+    controller.diff_max_words = 0
+
+    with pytest.raises(OSError):
+        controller.upload_dsp_file(2, changed)
+
+    assert controller.lodcache.read_board(controller.get_board_id(2)) is None
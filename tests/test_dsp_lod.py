@@ -0,0 +1,129 @@
+"""
+Tests of DSP .lod file parsing and the LodCache, using the shipped .lod files.
+"""
+
+import glob
+import os
+
+import pytest
+
+from dsp_lod import MAX_LOAD_ADDRESS, LodCache, LodImage, parse_lod
+
+ROOT = os.path.join(os.path.dirname(__file__), "../azcam_vatt")
+LOD_FILES = sorted(glob.glob(os.path.join(ROOT, "*/dspcode/*/*.lod")))
+TIMING_FILE = os.path.join(ROOT, "vatt4k/dspcode/dsptiming/tim2.lod")
+UTILITY_FILE = os.path.join(ROOT, "vatt4k/dspcode/dsputility/util2.lod")
+
+
+def read_segments(filename):
+    with open(filename, "r") as f:
+        return parse_lod(f.read())
+
+
+def count_data_words(filename):
+    """
+    Returns the number of _DATA records and of words in them.
+    """
+
+    records = 0
+    words = 0
+    data = False
+    with open(filename, "r") as f:
+        for line in f:
+            if line.startswith("_"):
+                data = line.startswith("_DATA")
+                records += data
+            elif data:
+                words += len(line.split())
+
+    return [records, words]
+
+
+@pytest.mark.parametrize("filename", LOD_FILES, ids=os.path.basename)
+def test_parse_shipped_files(filename):
+    segments = read_segments(filename)
+    records, words = count_data_words(filename)
+
+    assert len(segments) == records
+    assert sum(len(segment[2]) for segment in segments) == words
+    for space, address, data in segments:
+        assert space in ["P", "X", "Y"]
+        assert all(0 <= word < 2**24 for word in data)
+
+
+def test_parse_timing_file():
+    segments = read_segments(TIMING_FILE)
+
+    assert segments[0] == ["P", 0x4000, [0x0C0130, 0x000000]]
+
+    image = LodImage(segments)
+    assert [len(image.get_memory(space)) for space in "PXY"] == [622, 56, 143]
+
+
+def test_boot_code_not_loaded():
+    image = LodImage(read_segments(TIMING_FILE))
+
+    assert max(image.get_memory("P")) < MAX_LOAD_ADDRESS
+    assert all(address < MAX_LOAD_ADDRESS for _, address, _ in image.get_loaded())
+
+
+def test_last_write_wins():
+    # util2.lod writes P:0090 twice, the second short segment patches the first
+    image = LodImage(read_segments(UTILITY_FILE))
+
+    assert image.get_memory("P")[0x90] == 0x0C00B2
+    assert image.get_memory("P")[0x92] == image.segments[-4][2][2]
+
+
+def test_samples():
+    image = LodImage(read_segments(TIMING_FILE))
+    memory = image.get_memory("P")
+    samples = image.get_samples(32)
+
+    assert len(samples) == 32
+    assert samples[0][0] == min(memory)
+    assert samples[-1][0] == max(memory)
+    assert all(memory[address] == word for address, word in samples)
+
+
+def test_samples_skip_range():
+    image = LodImage(read_segments(TIMING_FILE))
+    samples = image.get_samples(4, "Y", [0x00, 0x1F])
+
+    assert len(samples) == 4
+    assert min(address for address, word in samples) == 0x20
+    assert image.get_samples(0) == []
+
+
+def test_bytes_round_trip():
+    image = LodImage(read_segments(UTILITY_FILE), "digest", "util2.lod")
+    copy = LodImage.from_bytes(image.to_bytes(), "digest", "util2.lod")
+
+    assert copy.segments == image.segments
+
+    with pytest.raises(ValueError):
+        LodImage.from_bytes(image.to_bytes()[:100])
+
+
+def test_cache(tmp_path):
+    cache = LodCache(str(tmp_path))
+    image = cache.load(TIMING_FILE)
+    assert cache.load(TIMING_FILE) is image
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "images": 1}
+
+    # a new cache reads the binary image instead of parsing
+    cache = LodCache(str(tmp_path))
+    assert cache.load(TIMING_FILE).segments == image.segments
+    assert cache.misses == 0
+
+
+def test_board_record(tmp_path):
+    cache = LodCache(str(tmp_path))
+    image = cache.load(TIMING_FILE)
+    cache.write_board("host_2405_2", image)
+
+    cache = LodCache(str(tmp_path))
+    assert cache.read_board("host_2405_2").digest == image.digest
+
+    cache.write_board("host_2405_2", None)
+    assert LodCache(str(tmp_path)).read_board("host_2405_2") is None
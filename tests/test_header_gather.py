@@ -0,0 +1,154 @@
+"""
+Tests of the CircuitBreaker states and the HeaderGatherer deadline.
+"""
+
+import threading
+import time
+
+import pytest
+
+from header_gather import CircuitBreaker, GatherError, HeaderGatherer
+
+
+def open_circuit(breaker):
+    """
+    Records failures until the circuit opens.
+    """
+
+    for i in range(breaker.threshold):
+        assert breaker.allow()
+        breaker.failure()
+
+
+def end_cooloff(breaker):
+    breaker.opened -= breaker.cooloff
+
+
+def test_closed_until_threshold():
+    breaker = CircuitBreaker("tcs", threshold=3, cooloff=30.0)
+    breaker.failure()
+    breaker.failure()
+
+    assert breaker.get_state() == "closed"
+    assert breaker.allow()
+
+    breaker.failure()
+
+    assert breaker.get_state() == "open"
+    assert breaker.trips == 1
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("tcs", threshold=3)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+
+    assert breaker.get_state() == "closed"
+    assert breaker.trips == 0
+
+
+def test_open_skips_calls():
+    breaker = CircuitBreaker("tcs", threshold=2, cooloff=30.0)
+    open_circuit(breaker)
+
+    assert not breaker.allow()
+    assert not breaker.allow()
+    assert breaker.get_state() == "open"
+
+
+def test_one_trial_after_cooloff():
+    breaker = CircuitBreaker("tcs", threshold=2, cooloff=30.0)
+    open_circuit(breaker)
+    end_cooloff(breaker)
+
+    assert breaker.get_state() == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.get_state() == "half-open"
+
+
+def test_trial_success_closes():
+    breaker = CircuitBreaker("tcs", threshold=2, cooloff=30.0)
+    open_circuit(breaker)
+    end_cooloff(breaker)
+    assert breaker.allow()
+    breaker.success()
+
+    assert breaker.get_state() == "closed"
+    assert breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_trial_failure_reopens():
+    breaker = CircuitBreaker("tcs", threshold=2, cooloff=30.0)
+    open_circuit(breaker)
+    end_cooloff(breaker)
+    assert breaker.allow()
+    breaker.failure()
+
+    assert breaker.get_state() == "open"
+    assert not breaker.allow()
+    assert breaker.trips == 1
+
+    # a new trip is counted only after the circuit has closed
+    end_cooloff(breaker)
+    assert breaker.allow()
+    breaker.success()
+    open_circuit(breaker)
+
+    assert breaker.trips == 2
+
+
+def test_deadline_is_per_thread():
+    gather = HeaderGatherer(budget=1.0)
+    gather.start(0.05)
+    time.sleep(0.1)
+
+    # another thread has no deadline running
+    result = []
+    thread = threading.Thread(target=lambda: result.append(gather.remaining()))
+    thread.start()
+    thread.join()
+    assert result == [1.0]
+
+    with pytest.raises(GatherError):
+        gather.call("tcs", lambda: "value")
+    gather.finish()
+    assert gather.call("tcs", lambda: "value") == "value"
+
+
+def test_share_deadline():
+    gather = HeaderGatherer(budget=1.0)
+    gather.start(0.5)
+    shared = gather.share(gather.remaining)
+    gather.finish()
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(shared()))
+    thread.start()
+    thread.join()
+    assert 0.0 < result[0] <= 0.5
+
+
+def test_counters_from_threads():
+    gather = HeaderGatherer(budget=1.0, workers=8)
+
+    def read():
+        for i in range(50):
+            gather.call("tcs", lambda: "value")
+            gather.set_good("RA", "value")
+            gather.get_good("RA")
+
+    threads = [threading.Thread(target=read) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = gather.get_stats()
+    assert stats["calls"] == 400
+    assert stats["fallbacks"] == 400
+    assert stats["endpoints"] == {"tcs": "closed"}
@@ -0,0 +1,72 @@
+"""
+Tests of FITS tile compression of image files.
+"""
+
+import numpy
+import pytest
+
+fits = pytest.importorskip("astropy.io.fits")
+
+from image_compress import compress_file
+
+
+def write_mef(filename):
+    """
+    Writes a MEF file of two 16 bit extensions and returns their data.
+    """
+
+    rng = numpy.random.default_rng(1)
+    data = [rng.normal(1000.0, 5.0, (64, 48)).astype(numpy.uint16) for i in range(2)]
+    data[1][10, 20] = 65535
+    hdus = [fits.PrimaryHDU()]
+    for index, image in enumerate(data):
+        hdu = fits.ImageHDU(image)
+        hdu.header["EXTNAME"] = f"im{index + 1}"
+        hdus.append(hdu)
+    hdus[0].header["OBJECT"] = "flat"
+    fits.HDUList(hdus).writeto(filename)
+
+    return data
+
+
+def test_round_trip_is_lossless(tmp_path):
+    filename = str(tmp_path / "image.fits")
+    outfile = filename + ".fz"
+    data = write_mef(filename)
+
+    size, compressed, cpu = compress_file(filename, outfile, "RICE_1")
+
+    assert compressed < size
+    with fits.open(outfile) as hdulist:
+        assert hdulist[0].header["OBJECT"] == "flat"
+        assert isinstance(hdulist[1], fits.CompImageHDU)
+        for index, image in enumerate(data):
+            assert hdulist[index + 1].header["EXTNAME"] == f"im{index + 1}"
+            assert hdulist[index + 1].data.dtype == image.dtype
+            assert numpy.array_equal(hdulist[index + 1].data, image)
+
+
+def test_primary_image_moved(tmp_path):
+    filename = str(tmp_path / "image.fits")
+    outfile = filename + ".fz"
+    image = numpy.arange(100, dtype=numpy.int16).reshape(10, 10)
+    fits.PrimaryHDU(image).writeto(filename)
+
+    compress_file(filename, outfile)
+
+    with fits.open(outfile) as hdulist:
+        assert hdulist[0].data is None
+        assert numpy.array_equal(hdulist[1].data, image)
+
+
+def test_float_image_copied(tmp_path):
+    filename = str(tmp_path / "image.fits")
+    outfile = filename + ".fz"
+    image = numpy.linspace(0.0, 1.0, 100).reshape(10, 10)
+    fits.PrimaryHDU(image).writeto(filename)
+
+    compress_file(filename, outfile)
+
+    with fits.open(outfile) as hdulist:
+        assert len(hdulist) == 1
+        assert numpy.array_equal(hdulist[0].data, image)
@@ -0,0 +1,165 @@
+"""
+Tests of the ImageSender spool.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy
+import pytest
+
+pytest.importorskip("azcam")
+
+from image_sender import ImageSender
+
+
+class Receiver(object):
+    """
+    Send function which records each file sent and its spool entry.
+    The first failures sends raise an error, and sends wait while gate is clear.
+    """
+
+    def __init__(self, failures=0):
+
+        self.sent = []
+        self.attempts = []
+        self.failures = failures
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, localfile, remotefile, parameters):
+
+        self.attempts.append(remotefile)
+        self.gate.wait()
+        if len(self.attempts) <= self.failures:
+            raise ConnectionError("image server not responding")
+
+        name = localfile[: -len(".fz")] if localfile.endswith(".fz") else localfile
+        with open(name + ".json", "r") as f:
+            entry = json.load(f)
+        self.sent.append([localfile, remotefile, parameters, entry])
+
+
+@pytest.fixture
+def sender(tmp_path):
+    sender = ImageSender(Receiver(), str(tmp_path / "spool"))
+    yield sender
+    sender.stop()
+    if sender.executor is not None:
+        sender.executor.shutdown()
+
+
+def write_image(folder, name):
+    """
+    Writes a dummy image file and returns its name.
+    """
+
+    filename = os.path.join(folder, name)
+    with open(filename, "w") as f:
+        f.write(name)
+
+    return filename
+
+
+def get_sent(sender):
+    return [remotefile for _, remotefile, _, _ in sender.send.sent]
+
+
+def test_sent_in_order(sender, tmp_path):
+    for index in range(5):
+        filename = write_image(str(tmp_path), f"image{index}.fits")
+        sender.submit(filename, f"/data/image{index}.fits", "", {"index": index})
+    assert sender.wait(10.0)
+
+    assert get_sent(sender) == [f"/data/image{index}.fits" for index in range(5)]
+    indexes = [parameters["index"] for _, _, parameters, _ in sender.send.sent]
+    assert indexes == list(range(5))
+    assert sender.get_status()["depth"] == 0
+    assert os.listdir(sender.folder) == []
+
+
+def test_retry_keeps_order(sender, tmp_path):
+    sender.send.failures = 2
+    sender.retry_delay = 0.01
+    for index in range(3):
+        filename = write_image(str(tmp_path), f"image{index}.fits")
+        sender.submit(filename, f"/data/image{index}.fits")
+    assert sender.wait(10.0)
+
+    assert sender.send.attempts[:3] == ["/data/image0.fits"] * 3
+    assert get_sent(sender) == [f"/data/image{index}.fits" for index in range(3)]
+    assert sender.failures == 2
+    assert sender.error == ""
+
+
+def test_resume_spooled_images(tmp_path):
+    folder = str(tmp_path / "spool")
+    sender = ImageSender(Receiver(failures=100), folder)
+    sender.retry_delay = 10.0
+    for index in range(3):
+        filename = write_image(str(tmp_path), f"image{index}.fits")
+        sender.submit(filename, f"/data/image{index}.fits", "", {"index": index})
+    sender.stop()
+    assert len(glob.glob(os.path.join(folder, "*.json"))) == 3
+
+    # an entry whose image is gone is removed
+    os.remove(write_image(folder, "lost.fits"))
+    with open(os.path.join(folder, "0000000000000_lost.fits.json"), "w") as f:
+        json.dump({"file": os.path.join(folder, "lost.fits")}, f)
+
+    sender = ImageSender(Receiver(), folder)
+    sender.start()
+    try:
+        assert sender.wait(10.0)
+    finally:
+        sender.stop()
+
+    assert get_sent(sender) == [f"/data/image{index}.fits" for index in range(3)]
+    assert [parameters for _, _, parameters, _ in sender.send.sent] == [
+        {"index": index} for index in range(3)
+    ]
+    assert os.listdir(folder) == []
+
+
+def test_full_queue_waits(sender, tmp_path):
+    sender.queue_size = 2
+    sender.send.gate.clear()
+    for index in range(2):
+        filename = write_image(str(tmp_path), f"image{index}.fits")
+        sender.submit(filename, f"/data/image{index}.fits")
+
+    filename = write_image(str(tmp_path), "image2.fits")
+    thread = threading.Thread(
+        target=sender.submit, args=[filename, "/data/image2.fits"]
+    )
+    thread.start()
+    time.sleep(0.3)
+    assert thread.is_alive()
+    assert sender.get_status()["depth"] == 2
+
+    sender.send.gate.set()
+    thread.join(10.0)
+    assert not thread.is_alive()
+    assert sender.wait(10.0)
+    assert get_sent(sender) == [f"/data/image{index}.fits" for index in range(3)]
+
+
+def test_compressed_name(sender, tmp_path):
+    fits = pytest.importorskip("astropy.io.fits")
+    filename = str(tmp_path / "image.fits")
+    image = numpy.full((32, 32), 1000, dtype=numpy.uint16)
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(image)]).writeto(filename)
+
+    sender.submit(filename, "/data/image.fits", "RICE_1", {"filetype": "MEF"})
+    assert sender.wait(30.0)
+
+    [[localfile, remotefile, parameters, entry]] = sender.send.sent
+    assert remotefile == "/data/image.fits.fz"
+    assert localfile.endswith("_image.fits.fz")
+    assert parameters == {"filetype": "MEF"}
+    assert entry["file"] == localfile
+    assert entry["remotefile"] == remotefile
+    assert os.listdir(sender.folder) == []
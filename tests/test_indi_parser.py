@@ -0,0 +1,79 @@
+"""
+Tests of the incremental INDI stream parser.
+"""
+
+from indi_parser import IndiStreamParser, get_filters
+
+MESSAGE = b'<message device="FILTERS" message="upper:clear lower:U"/>'
+
+DEFINITION = (
+    b'<defTextVector device="FILTERS" name="POSITION" state="Idle">\n'
+    b'  <defText name="upper">clear</defText>\n'
+    b'  <defText name="lower">U</defText>\n'
+    b"</defTextVector>\n"
+)
+
+
+def test_one_element():
+    parser = IndiStreamParser()
+    elements = parser.feed(MESSAGE)
+
+    assert len(elements) == 1
+    assert get_filters(elements[0]) == {"upper": "clear ", "lower": "U"}
+
+
+def test_fragments():
+    parser = IndiStreamParser()
+    data = DEFINITION + MESSAGE
+
+    elements = []
+    for i in range(len(data)):
+        elements += parser.feed(data[i : i + 1])
+
+    assert [element.tag for element in elements] == ["defTextVector", "message"]
+    assert [child.text for child in elements[0]] == ["clear", "U"]
+    assert get_filters(elements[1]) == {"upper": "clear ", "lower": "U"}
+
+
+def test_element_returned_when_closed():
+    parser = IndiStreamParser()
+
+    assert parser.feed(DEFINITION[:60]) == []
+    elements = parser.feed(DEFINITION[60:])
+    assert len(elements) == 1
+    assert elements[0].get("name") == "POSITION"
+
+
+def test_several_elements():
+    parser = IndiStreamParser()
+    data = MESSAGE + DEFINITION + MESSAGE.replace(b"U", b"V")
+    elements = parser.feed(data.decode())
+
+    assert [element.tag for element in elements] == [
+        "message",
+        "defTextVector",
+        "message",
+    ]
+    assert get_filters(elements[2])["lower"] == "V"
+
+    # completed elements are not kept
+    assert len(parser.root) == 0
+
+
+def test_error_resets_stream():
+    parser = IndiStreamParser()
+
+    assert parser.feed(b"<message device=FILTERS>") == []
+    assert parser.errors == 1
+    assert len(parser.feed(MESSAGE)) == 1
+
+
+def test_get_filters_other_elements():
+    parser = IndiStreamParser()
+    elements = parser.feed(
+        DEFINITION
+        + b'<message device="MOUNT" message="upper:x lower:y"/>'
+        + b'<message device="FILTERS" message="no filters"/>'
+    )
+
+    assert [get_filters(element) for element in elements] == [None, None, None]
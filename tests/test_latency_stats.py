@@ -0,0 +1,87 @@
+"""
+Tests of the LatencyHistogram buckets and the LatencyStats reports.
+"""
+
+import pytest
+
+from latency_stats import LatencyHistogram, LatencyStats
+
+
+def test_bucket_bounds():
+    histogram = LatencyHistogram()
+    values = list(range(4096)) + [2**k + d for k in range(12, 34) for d in [0, 1]]
+    last = 0
+    for value in values:
+        index = histogram.get_index(value)
+        assert index >= last
+        last = index
+        # middle of the bucket is within half a bucket width of the value
+        assert abs(histogram.get_value(index) - value) <= value / 32.0
+
+    # small values have a bucket each
+    assert [histogram.get_index(value) for value in range(16)] == list(range(16))
+    assert histogram.get_index(16) == 16
+    assert histogram.get_index(32) == histogram.get_index(33) == 32
+
+    # values beyond the range go in the last bucket
+    assert histogram.get_index(2**40) == len(histogram.counts) - 1
+
+
+def test_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000.0, error=ms % 10 == 0)
+
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=1 / 16.0)
+    assert histogram.percentile(90) == pytest.approx(0.090, rel=1 / 16.0)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=1 / 16.0)
+    assert histogram.percentile(100) == 0.1
+
+    stats = histogram.get_stats()
+    assert stats["count"] == 100
+    assert stats["errors"] == 10
+    assert stats["mean"] == pytest.approx(0.0505)
+    assert [stats["min"], stats["max"]] == [0.001, 0.1]
+
+
+def test_percentile_not_above_max():
+    histogram = LatencyHistogram()
+    histogram.record(0.0333)
+
+    assert histogram.percentile(50) == histogram.percentile(99) == 0.0333
+    assert LatencyHistogram().percentile(50) == 0.0
+
+
+def test_stats_by_group():
+    stats = LatencyStats()
+    stats.record("tcs", "REQUEST ALL", 0.002)
+    stats.record("tcs", "REQUEST ALL", 0.004, True)
+    stats.record("header", "telescope", 0.1)
+    stats.count("exposure", "bytes", 100)
+    stats.count("exposure", "bytes", 50)
+
+    report = stats.get_stats()
+    assert report["latency"]["tcs"]["REQUEST ALL"]["count"] == 2
+    assert report["latency"]["tcs"]["REQUEST ALL"]["errors"] == 1
+    assert list(report["latency"]) == ["header", "tcs"]
+    assert report["counters"] == {"exposure": {"bytes": 150}}
+
+    stats.reset()
+    assert stats.get_stats()["latency"] == {}
+
+
+def test_prometheus_text():
+    stats = LatencyStats()
+    stats.record("tcs", 'REQUEST "ALL"', 0.002, True)
+    stats.count("exposure", "back\\slash\nname")
+
+    lines = stats.get_prometheus().splitlines()
+
+    labels = 'group="tcs",op="REQUEST \\"ALL\\""'
+    assert f'vatt_latency_seconds{{{labels},quantile="0.5"}} 0.002000' in lines
+    assert f"vatt_latency_seconds_sum{{{labels}}} 0.002000" in lines
+    assert f"vatt_latency_seconds_count{{{labels}}} 1" in lines
+    assert f"vatt_errors_total{{{labels}}} 1" in lines
+    assert 'vatt_events_total{group="exposure",name="back\\\\slash\\nname"} 1' in lines
+    assert "# TYPE vatt_latency_seconds summary" in lines
+    assert "# TYPE vatt_events_total counter" in lines
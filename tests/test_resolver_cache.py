@@ -0,0 +1,122 @@
+"""
+Tests of the ResolverCache expiry, fallback, and invalidation.
+"""
+
+import socket
+import time
+
+import pytest
+
+import resolver_cache
+from resolver_cache import ResolverCache
+
+
+class Resolver(ResolverCache):
+    """
+    ResolverCache with lookups answered from the addresses dictionary,
+    failing for hosts not in it.
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.addresses = {}
+
+    def lookup(self, host):
+
+        self.lookups += 1
+        if host not in self.addresses:
+            raise socket.gaierror("unknown host %s" % host)
+
+        return self.addresses[host]
+
+
+def test_ttl_expiry():
+    resolver = Resolver(ttl=0.2, refresh_fraction=1.0)
+    resolver.addresses["tcs"] = "10.0.0.1"
+
+    assert resolver.resolve("tcs") == "10.0.0.1"
+    resolver.addresses["tcs"] = "10.0.0.2"
+    assert resolver.resolve("tcs") == "10.0.0.1"
+    assert resolver.get_cached("tcs") == "10.0.0.1"
+
+    time.sleep(0.25)
+    assert resolver.get_cached("tcs") is None
+    assert resolver.resolve("tcs") == "10.0.0.2"
+
+    stats = resolver.get_stats()
+    assert [stats["hits"], stats["misses"], stats["lookups"]] == [2, 2, 2]
+
+
+def test_refresh_before_expiry():
+    resolver = Resolver(ttl=0.5, refresh_fraction=0.2)
+    resolver.addresses["tcs"] = "10.0.0.1"
+    resolver.resolve("tcs")
+    resolver.addresses["tcs"] = "10.0.0.2"
+    time.sleep(0.15)
+
+    # the cached address is returned while it is refreshed
+    assert resolver.resolve("tcs") == "10.0.0.1"
+    time.sleep(0.05)
+    assert resolver.resolve("tcs") == "10.0.0.2"
+    assert resolver.get_stats()["refreshes"] == 1
+
+
+def test_stale_address_when_lookup_fails():
+    resolver = Resolver(ttl=0.1)
+    resolver.addresses["tcs"] = "10.0.0.1"
+    resolver.resolve("tcs")
+    del resolver.addresses["tcs"]
+    time.sleep(0.15)
+
+    assert resolver.resolve("tcs") == "10.0.0.1"
+    stats = resolver.get_stats()
+    assert [stats["failures"], stats["stale"]] == [1, 1]
+
+
+def test_failed_lookup_cached():
+    resolver = Resolver(negative_ttl=0.1)
+
+    with pytest.raises(socket.gaierror):
+        resolver.resolve("tcs")
+    with pytest.raises(socket.gaierror):
+        resolver.resolve("tcs")
+    assert resolver.lookups == 1
+    assert resolver.negative_hits == 1
+
+    resolver.addresses["tcs"] = "10.0.0.1"
+    time.sleep(0.15)
+    assert resolver.resolve("tcs") == "10.0.0.1"
+
+
+def test_invalidate():
+    resolver = Resolver()
+    resolver.addresses.update({"tcs": "10.0.0.1", "filters": "10.0.0.2"})
+    resolver.resolve("tcs")
+    resolver.resolve("filters")
+
+    resolver.invalidate("tcs")
+    assert resolver.get_cached("tcs") is None
+    assert resolver.get_cached("filters") == "10.0.0.2"
+
+    resolver.invalidate()
+    assert resolver.get_stats()["entries"] == 0
+
+
+def test_connect_error_invalidates(monkeypatch):
+    resolver = Resolver()
+    monkeypatch.setattr(resolver_cache, "resolver", resolver)
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    resolver.addresses["tcs"] = "127.0.0.1"
+
+    with resolver_cache.create_connection("tcs", port, 1.0):
+        pass
+    assert resolver.get_cached("tcs") == "127.0.0.1"
+
+    # the server has gone, the next connection looks the host up again
+    listener.close()
+    with pytest.raises(OSError):
+        resolver_cache.create_connection("tcs", port, 1.0)
+    assert resolver.get_cached("tcs") is None
+    assert "tcs" not in resolver.entries
@@ -0,0 +1,120 @@
+"""
+Tests of the system configurations and the SystemBuilder cache.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("azcam")
+
+from system_config import SYSTEMS, SystemBuilder, get_config, validate_detector
+
+TEMPLATE = """# VATT header template
+OBSERVAT VATT / observatory
+TELESCOP 1.8m / telescope
+GAIN 1.5 / gain
+"""
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """
+    Returns [systemfolder, datafolder] with the header templates.
+    """
+
+    datafolder = tmp_path / "data"
+    os.makedirs(datafolder / "templates")
+    for name in SYSTEMS:
+        template = datafolder / SYSTEMS[name]["template"]
+        template.write_text(TEMPLATE)
+
+    return [str(tmp_path / "system"), str(datafolder)]
+
+
+def test_shipped_systems_valid():
+    for name in SYSTEMS:
+        assert validate_detector(get_config(name)["detector"]) == []
+        assert validate_detector(get_config(name, True)["detector"]) == []
+
+
+def test_cache_hit(folders):
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.load()
+
+    assert not builder.cached
+    assert builder.keywords == [
+        ["OBSERVAT", "VATT", "observatory", "str"],
+        ["TELESCOP", "1.8m", "telescope", "str"],
+        ["GAIN", 1.5, "gain", "float"],
+    ]
+
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.load()
+
+    assert builder.cached
+    assert builder.keywords[2] == ["GAIN", 1.5, "gain", "float"]
+
+
+def test_cache_miss_on_config_change(folders):
+    SystemBuilder("vatt4k", *folders).load()
+
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.config["exposure"]["compression"] = "RICE_1"
+    builder.load()
+
+    assert not builder.cached
+
+
+def test_cache_miss_on_template_change(folders):
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.load()
+    with open(builder.template, "a") as f:
+        f.write("FILTER none / filter\n")
+
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.load()
+
+    assert not builder.cached
+    assert builder.keywords[-1] == ["FILTER", "none", "filter", "str"]
+
+
+def test_lab_overrides(folders):
+    config = get_config("vattspec", lab=True)
+
+    assert config["controller"]["camserver"] == ["conserver7", 2405]
+    assert config["exposure"]["folder"] == "/data/vattspec"
+    assert config["exposure"]["imageserver"] is None
+    # values which are not overridden are kept
+    assert config["exposure"]["filetype"] == "FITS"
+    assert "lab" not in config
+
+    # the shared description is not changed
+    config = get_config("vattspec")
+    assert config["controller"]["camserver"] == ["vattccdc", 2405]
+    assert config["exposure"]["imageserver"] == ["vattcontrol.vatt", 6543]
+
+    # lab and observing configurations are cached separately
+    lab = SystemBuilder("vattspec", *folders, lab=True)
+    observing = SystemBuilder("vattspec", *folders)
+    assert lab.cachefile != observing.cachefile
+    assert lab.get_key() != observing.get_key()
+
+
+@pytest.mark.parametrize(
+    "section, value, error",
+    [
+        ["roi", [1, 4065, 1, 4064, 2, 2], "roi columns 1-4065 not within 1-4064"],
+        ["roi", [1, 4064, 100, 10, 2, 2], "roi rows 100-10 not within 1-4064"],
+        ["roi", [1, 4064, 1, 4064, 0, 2], "roi binning 0x2 not valid"],
+        ["ext_position", [[1, 1]], "ext_position is not for 2 amplifiers"],
+    ],
+)
+def test_invalid_detector(folders, section, value, error):
+    builder = SystemBuilder("vatt4k", *folders)
+    builder.config["detector"][section] = value
+
+    assert validate_detector(builder.config["detector"]) == [error]
+    with pytest.raises(ValueError, match=error):
+        builder.load()
+    assert not os.path.exists(builder.cachefile)
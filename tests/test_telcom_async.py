@@ -0,0 +1,86 @@
+"""
+Tests of the AsyncTelcomClient connection reuse and retry.
+"""
+
+import asyncio
+
+from telcom_async import AsyncTelcomClient
+
+
+class Writer(object):
+    """
+    Stream writer which records whether it was closed.
+    """
+
+    def __init__(self):
+
+        self.closed = False
+
+    def close(self):
+
+        self.closed = True
+
+
+class Client(AsyncTelcomClient):
+    """
+    AsyncTelcomClient with connections which reply from the replies list,
+    where an exception is raised instead of replying.
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        self.replies = []
+        self.writers = []
+
+    async def open(self):
+
+        self.writers.append(Writer())
+
+        return [None, self.writers[-1]]
+
+    async def transact(self, conn, command):
+
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+
+        return reply
+
+
+def test_connection_reused():
+    client = Client("tcs", 5403)
+    client.replies = ["1\r\n", "2\r\n"]
+
+    assert asyncio.run(client.commands(["A", "B"])) == [
+        ["OK", "1\r\n"],
+        ["OK", "2\r\n"],
+    ]
+    assert len(client.writers) == 1
+    assert len(client.idle) == 1
+
+
+def test_dropped_idle_connection_retried():
+    client = Client("tcs", 5403)
+    client.replies = ["1\r\n", ConnectionError("closed"), "2\r\n"]
+
+    async def run():
+        return [await client.command("A"), await client.command("B")]
+
+    assert asyncio.run(run()) == [["OK", "1\r\n"], ["OK", "2\r\n"]]
+    assert [writer.closed for writer in client.writers] == [True, False]
+    assert client.idle == [[None, client.writers[1]]]
+
+
+def test_failed_retry_closed():
+    client = Client("tcs", 5403)
+    client.replies = ["1\r\n", ConnectionError("closed"), ConnectionError("closed")]
+
+    async def run():
+        return [await client.command("A"), await client.command("B")]
+
+    reply = asyncio.run(run())[1]
+
+    assert reply == ["ERROR", "telescope server error: closed"]
+    assert [writer.closed for writer in client.writers] == [True, True]
+    assert client.idle == []
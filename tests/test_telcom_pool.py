@@ -0,0 +1,222 @@
+"""
+Tests of the FramedReader which reads Telcom replies, and of the connection
+pool against the local Telcom simulator.
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from telcom_pool import FramedReader, TelcomConnectionPool
+from telcom_simulator import TelcomSimulator
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_one_reply(pair):
+    server, client = pair
+    reader = FramedReader(client)
+    server.sendall(b"VATT TCS 001 OK\r\n")
+
+    assert reader.read_reply() == "VATT TCS 001 OK"
+    assert not reader.pending()
+
+
+def test_split_reply(pair):
+    server, client = pair
+    reader = FramedReader(client)
+
+    def send():
+        for part in [b"VATT TCS", b" 001 123456", b".78\r", b"\n"]:
+            server.sendall(part)
+            time.sleep(0.02)
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    reply = reader.read_reply()
+    thread.join()
+
+    assert reply == "VATT TCS 001 123456.78"
+    assert reader.stats.partial_reads == 1
+    assert reader.stats.recv_calls > 1
+
+
+def test_several_replies_in_one_read(pair):
+    server, client = pair
+    reader = FramedReader(client)
+    server.sendall(b"one\r\ntwo\r\nthree")
+
+    assert reader.read_reply() == "one"
+    assert reader.pending()
+    assert reader.read_reply() == "two"
+
+    server.sendall(b"\r\n")
+    assert reader.read_reply() == "three"
+    assert reader.stats.replies == 3
+    assert not reader.pending()
+
+
+def test_buffer_reused(pair):
+    server, client = pair
+    reader = FramedReader(client, size=16)
+    for i in range(20):
+        server.sendall(b"reply %d\r\n" % i)
+        assert reader.read_reply() == "reply %d" % i
+
+    assert len(reader.buffer) == 16
+    assert reader.stats.oversize == 0
+
+
+def test_oversize_reply_grows_buffer(pair):
+    server, client = pair
+    reader = FramedReader(client, size=16, max_size=256)
+    reply = "x" * 100
+    server.sendall(reply.encode() + b"\r\n")
+
+    assert reader.read_reply() == reply
+    assert len(reader.buffer) == 128
+    assert reader.stats.oversize == 3
+
+
+def test_reply_over_max_size(pair):
+    server, client = pair
+    reader = FramedReader(client, size=16, max_size=64)
+    server.sendall(b"x" * 100 + b"\r\n")
+
+    with pytest.raises(ValueError):
+        reader.read_reply()
+    assert not reader.pending()
+
+
+def test_closed_connection(pair):
+    server, client = pair
+    reader = FramedReader(client)
+    server.sendall(b"partial")
+    server.close()
+
+    with pytest.raises(ConnectionError):
+        reader.read_reply()
+
+
+@pytest.fixture
+def sim():
+    sim = TelcomSimulator()
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture
+def tserver(sim):
+    pytest.importorskip("azcam")
+    from telescope_vatt import TelcomServerInterface
+
+    tserver = TelcomServerInterface()
+    tserver.Host = sim.host
+    tserver.Port = sim.port
+    yield tserver
+    tserver.close()
+
+
+def request(conn, name):
+    conn.socket.sendall(b"VATT TCS 001 REQUEST %s\r\n" % name.encode())
+    return conn.reader.read_reply()
+
+
+def test_acquire_release(sim):
+    pool = TelcomConnectionPool(sim.host, sim.port, size=1)
+    conn, reused = pool.acquire()
+    assert not reused
+    assert request(conn, "EQ") == "VATT TCS 001 2000.00"
+    pool.release(conn)
+
+    again, reused = pool.acquire()
+    assert reused
+    assert again is conn
+
+    # a connection over the pool size is closed
+    other, reused = pool.acquire()
+    assert not reused
+    pool.release(again)
+    pool.release(other)
+    assert other.socket.fileno() == -1
+
+    stats = pool.get_stats()
+    assert [stats["hits"], stats["misses"], stats["opened"]] == [1, 2, 2]
+    assert stats["idle"] == 1
+    pool.close_all()
+
+
+def test_dead_idle_connection_dropped(sim):
+    sim.close_after_reply = 1
+    pool = TelcomConnectionPool(sim.host, sim.port)
+    conn, reused = pool.acquire()
+    request(conn, "EQ")
+    pool.release(conn)
+    time.sleep(0.1)
+
+    other, reused = pool.acquire()
+
+    assert not reused
+    assert other is not conn
+    assert pool.get_stats()["discarded"] == 1
+    assert request(other, "EQ") == "VATT TCS 001 2000.00"
+    pool.close_all()
+
+
+def test_idle_timeout(sim):
+    pool = TelcomConnectionPool(sim.host, sim.port, max_idle=0.05)
+    conn, reused = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+
+    assert not pool.acquire()[1]
+    assert pool.get_stats()["discarded"] == 1
+    pool.close_all()
+
+
+def test_command_reconnects(tserver, sim):
+    command = tserver.make_packet("REQUEST EQ")
+    assert tserver.command(command, 1024) == ["OK", "VATT TCS 001 2000.00"]
+
+    # the server drops the pooled connection when the next command arrives
+    faults = ["drop"]
+    sim.get_fault = lambda: faults.pop() if faults else None
+    reply = tserver.command(command, 1024)
+
+    assert reply == ["OK", "VATT TCS 001 2000.00"]
+    stats = tserver.get_pool_stats()
+    assert [stats["hits"], stats["reconnects"], stats["discarded"]] == [1, 1, 1]
+    assert sim.connections == 2
+
+
+def test_concurrent_commands(tserver, sim):
+    names = {"RA": "VATT TCS 001 120000.00", "DEC": "VATT TCS 001 +300000.0"}
+    replies = []
+
+    def run(name):
+        command = tserver.make_packet("REQUEST " + name)
+        for i in range(25):
+            replies.append([name, tserver.command(command, 1024)])
+
+    threads = [threading.Thread(target=run, args=[name]) for name in list(names) * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(replies) == 200
+    for name, reply in replies:
+        assert reply == ["OK", names[name]]
+    stats = tserver.get_pool_stats()
+    assert stats["replies"] == 200
+    assert stats["hits"] + stats["misses"] == 200
+    assert stats["idle"] <= tserver.PoolSize
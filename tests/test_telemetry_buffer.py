@@ -0,0 +1,121 @@
+"""
+Tests of the TelemetryBuffer time series and its interval values.
+"""
+
+import math
+
+import pytest
+
+from telemetry_buffer import TelemetryBuffer
+
+
+def make_buffer(samples, size=100, filename=""):
+    """
+    Returns a buffer of samples given as [time, {keyword: value}].
+    """
+
+    buffer = TelemetryBuffer(["RA", "HA", "ELEVAT"], size, filename)
+    for t, values in samples:
+        buffer.append(t, values)
+
+    return buffer
+
+
+def test_interval_of_ramp():
+    buffer = make_buffer([[t, {"ELEVAT": 10.0 + t}] for t in range(11)])
+    interval = buffer.get_interval("ELEVAT", 2.5, 7.5)
+
+    assert interval == pytest.approx(
+        {"start": 12.5, "mid": 15.0, "end": 17.5, "mean": 15.0}
+    )
+
+
+def test_interval_mean_is_time_weighted():
+    # 0 for 1 s, then ramps to 10 over 1 s and stays there for 2 s
+    samples = [[0, {"ELEVAT": 0}], [1, {"ELEVAT": 0}], [2, {"ELEVAT": 10}]]
+    samples.append([4, {"ELEVAT": 10}])
+    interval = make_buffer(samples).get_interval("ELEVAT", 0.0, 4.0)
+
+    assert interval["mean"] == pytest.approx((0 * 1 + 5 * 1 + 10 * 2) / 4.0)
+    assert interval["mid"] == pytest.approx(10.0)
+
+
+def test_interval_of_wrapping_ra():
+    samples = [[0, {"RA": "23:54:00"}], [1, {"RA": "23:57:00"}]]
+    samples += [[2, {"RA": "00:00:00"}], [3, {"RA": "00:03:00"}]]
+    interval = make_buffer(samples).get_interval("RA", 0.0, 3.0)
+
+    assert interval["start"] == pytest.approx(23.9)
+    assert interval["end"] == pytest.approx(0.05)
+    assert interval["mid"] == pytest.approx(23.975)
+    assert interval["mean"] == pytest.approx(23.975)
+
+
+def test_interval_of_hour_angle():
+    samples = [[0, {"HA": "-00:03:00"}], [2, {"HA": "00:03:00"}]]
+    interval = make_buffer(samples).get_interval("HA", 0.0, 1.5)
+
+    assert interval["start"] == pytest.approx(-0.05)
+    assert interval["end"] == pytest.approx(0.025)
+    assert interval["mid"] == pytest.approx(-0.0125)
+
+
+def test_zero_length_interval():
+    buffer = make_buffer([[t, {"ELEVAT": 2.0 * t}] for t in range(5)])
+    interval = buffer.get_interval("ELEVAT", 1.5, 1.5)
+
+    assert interval == pytest.approx(
+        {"start": 3.0, "mid": 3.0, "end": 3.0, "mean": 3.0}
+    )
+
+
+def test_missing_values_skipped():
+    samples = [
+        [0, {"ELEVAT": 10}],
+        [1, {"ELEVAT": "bad"}],
+        [2, {}],
+        [3, {"ELEVAT": 13}],
+    ]
+    buffer = make_buffer(samples)
+
+    assert math.isnan(buffer.get_samples()["ELEVAT"][1])
+    assert buffer.get_interval("ELEVAT", 0.0, 3.0)["mid"] == pytest.approx(11.5)
+    assert buffer.get_interval("RA", 0.0, 3.0) is None
+
+
+def test_no_samples_near_interval():
+    buffer = make_buffer([[0, {"ELEVAT": 10}]])
+
+    assert buffer.get_interval("ELEVAT", 100.0, 110.0) is None
+    assert buffer.get_value("ELEVAT", 5.0) == pytest.approx(10.0)
+
+
+def test_ring_keeps_newest_samples():
+    buffer = make_buffer([[t, {"ELEVAT": t}] for t in range(8)], size=5)
+    samples = buffer.get_samples()
+
+    assert list(samples["time"]) == [3, 4, 5, 6, 7]
+    assert list(buffer.get_samples(4, 6)["ELEVAT"]) == [4, 5, 6]
+
+
+def test_file_persists(tmp_path):
+    filename = str(tmp_path / "telemetry.dat")
+    buffer = make_buffer([[t, {"ELEVAT": t}] for t in range(1, 8)], 5, filename)
+    buffer.flush()
+
+    buffer = TelemetryBuffer(["RA", "HA", "ELEVAT"], 5, filename)
+    buffer.append(8, {"ELEVAT": 8})
+
+    assert list(buffer.get_samples()["time"]) == [4, 5, 6, 7, 8]
+
+
+def test_out_of_order_samples():
+    # samples of concurrent reads may be appended out of time order
+    times = [0, 1, 3, 2, 4, 6, 5, 7]
+    buffer = make_buffer([[t, {"ELEVAT": 10.0 + t}] for t in times], size=6)
+
+    assert list(buffer.get_samples()["time"]) == [2, 3, 4, 5, 6, 7]
+    assert buffer.get_value("ELEVAT", 2.5) == pytest.approx(12.5)
+    assert buffer.get_interval("ELEVAT", 3.0, 6.0) == pytest.approx(
+        {"start": 13.0, "mid": 14.5, "end": 16.0, "mean": 14.5}
+    )
@@ -0,0 +1,48 @@
+"""
+Tests of the TelemetryCache time-to-live and ages.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("azcam")
+
+from telemetry_cache import TelemetryCache
+
+
+def test_ttl_expiry():
+    cache = TelemetryCache(0.2)
+    cache.set("RA", "12:00:00.00")
+
+    value, age = cache.get("RA")
+    assert value == "12:00:00.00"
+    assert 0.0 <= age < 0.2
+
+    time.sleep(0.3)
+    assert cache.get("RA") is None
+    assert cache.get("RA", 10.0)[0] == "12:00:00.00"
+    assert cache.get("DEC") is None
+
+
+def test_keyword_ttl():
+    cache = TelemetryCache(10.0)
+    cache.ttls = {"MOTION": 0.5}
+    t = time.time() - 1.0
+    cache.update({"MOTION": 0, "AIRMASS": 1.155}, t)
+
+    assert cache.get("MOTION") is None
+    assert cache.get("AIRMASS")[0] == 1.155
+    assert not cache.is_fresh(["MOTION", "AIRMASS"])
+    assert cache.is_fresh(["AIRMASS"])
+
+
+def test_age():
+    cache = TelemetryCache()
+    assert cache.get_age("RA") is None
+
+    cache.set("RA", "12:00:00.00", time.time() - 5.0)
+    assert cache.get_age("RA") == pytest.approx(5.0, abs=0.1)
+
+    cache.clear()
+    assert cache.get_age("RA") is None
@@ -0,0 +1,108 @@
+"""
+Tests of the TelemetryDecoder record and batch decoding.
+"""
+
+import math
+
+import pytest
+
+from telemetry_decoder import TelemetryDecoder
+
+# keyword tables as in TelcomServerInterface
+offsets = {"MOTION": 1, "RA": 4, "DEC": 14, "HA": 25, "AIRMASS": 57, "ROTANGLE": 129}
+lengths = {"MOTION": 1, "RA": 9, "DEC": 9, "HA": 9, "AIRMASS": 5, "ROTANGLE": 5}
+typestrings = {
+    "MOTION": "int",
+    "RA": "str",
+    "DEC": "str",
+    "HA": "str",
+    "AIRMASS": "float",
+    "ROTANGLE": "float",
+}
+
+
+def make_record(**fields):
+    """
+    Returns a telemetry record with fields given by keyword.
+    """
+
+    record = [" "] * 140
+    for keyword, value in fields.items():
+        start = offsets[keyword] - 1
+        record[start : start + len(value)] = list(value)
+
+    return "".join(record)
+
+
+@pytest.fixture
+def decoder():
+    decoder = TelemetryDecoder(offsets, lengths, typestrings, list(offsets))
+    # decode every batch column by column
+    decoder.batch_min = 0
+
+    return decoder
+
+
+GOOD = make_record(
+    MOTION="1",
+    RA="123456.78",
+    DEC="+312345.6",
+    HA="-01:02:03",
+    AIRMASS="1.234",
+    ROTANGLE="12.34",
+)
+
+RECORDS = [
+    GOOD,
+    # short, ending in the RA field
+    GOOD[:5],
+    GOOD[:12],
+    # padded with nulls after the RA field
+    GOOD[:12].ljust(140, "\x00"),
+    GOOD[:60] + "\x00" * 80,
+    # nulls within fields
+    GOOD[:5] + "\x00" + GOOD[6:],
+    make_record(MOTION="x", RA="12", DEC="+3", AIRMASS="1.2.3", ROTANGLE="abc"),
+    make_record(RA="1234567890123", AIRMASS="1e3"),
+    "",
+    "\x00" * 140,
+]
+
+
+def test_decode(decoder):
+    values = decoder.decode(GOOD)
+
+    assert values == {
+        "MOTION": 1,
+        "RA": "12:34:56.78",
+        "DEC": "+31:23:45.6",
+        "HA": "-01:02:03",
+        "AIRMASS": 1.234,
+        "ROTANGLE": 12.34,
+    }
+    assert decoder.decode_keyword("DEC", GOOD) == "+31:23:45.6"
+
+
+def test_short_fields(decoder):
+    errors = []
+    values = decoder.decode(GOOD[:5].ljust(140, "\x00"), errors)
+
+    assert values == {"MOTION": 1, "RA": "12::"}
+    assert errors == ["DEC", "HA", "AIRMASS", "ROTANGLE"]
+
+
+@pytest.mark.parametrize("batch_min", [0, 1000])
+def test_batch_matches_decode(decoder, batch_min):
+    decoder.batch_min = batch_min
+    result = decoder.decode_batch(RECORDS)
+
+    fills = {"int": 0, "float": math.nan, "str": ""}
+    for i, record in enumerate(RECORDS):
+        values = decoder.decode(record)
+        for keyword, typestring in typestrings.items():
+            expected = values.get(keyword, fills[typestring])
+            value = result[keyword][i]
+            if typestring == "float":
+                assert value == pytest.approx(expected, nan_ok=True), (i, keyword)
+            else:
+                assert value == expected, (i, keyword)
@@ -0,0 +1,282 @@
+"""
+Tests of the VattTCS header, snapshot, and move paths against the local Telcom simulator.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("azcam")
+
+from telcom_simulator import TelcomSimulator
+from telescope_vatt import VattTCS
+
+
+@pytest.fixture
+def sim():
+    sim = TelcomSimulator()
+    sim.slew_rate = 20.0
+    sim.settle_time = 0.2
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture
+def telescope(sim):
+    telescope = VattTCS()
+    telescope.subscribe_filters = 0
+    telescope.prefetch = 0
+    telescope.initialize()
+    telescope.Tserver.Host = sim.host
+    telescope.Tserver.Port = sim.port
+    telescope.header.delete_keyword("FILTER")
+    yield telescope
+    telescope.aclient.stop()
+
+
+def get_values(header):
+    return {keyword: value for keyword, value, comment, typestring in header}
+
+
+def test_snapshot(telescope):
+    values = telescope.get_snapshot()
+
+    assert values["MOTION"] == 0
+    assert values["RA"] == "12:00:00.00"
+    assert values["DEC"] == "+30:00:00.0"
+    assert values["EQUINOX"] == 2000.0
+
+
+def test_header_snapshot_is_one_read(telescope, sim):
+    commands = sim.commands
+    values = get_values(telescope.read_header())
+
+    assert sim.commands - commands == 1
+    assert values["RA"] == "12:00:00.00"
+    assert values["DEC"] == "+30:00:00.0"
+    assert values["AIRMASS"] == 1.155
+
+
+def test_header_modes_agree(telescope):
+    keywords = ["RA", "DEC", "EQUINOX", "AIRMASS", "MOTION"]
+
+    telescope.use_snapshot = 1
+    snapshot = get_values(telescope.read_header())
+    telescope.use_snapshot = 0
+    single = get_values(telescope.read_header())
+    telescope.use_snapshot = 1
+    telescope.use_async = 1
+    gathered = get_values(telescope.read_header())
+
+    for keyword in keywords:
+        assert snapshot[keyword] == single[keyword] == gathered[keyword]
+
+
+def test_header_after_address_change(telescope):
+    other = TelcomSimulator()
+    other.ra = 90.0
+    other.start()
+    try:
+        telescope.use_async = 1
+        telescope.read_header()
+        telescope.Tserver.Port = other.port
+        values = get_values(telescope.read_header())
+    finally:
+        other.stop()
+
+    assert values["RA"] == "06:00:00.00"
+
+
+def test_move(telescope, sim):
+    telescope.move("12:20:00", "+31:00:00")
+
+    assert not sim.is_moving()
+    values = telescope.get_snapshot()
+    assert values["RA"] == "12:20:00.00"
+    assert values["DEC"] == "+31:00:00.0"
+
+
+def test_move_waits_for_late_motion(telescope, sim):
+    sim.motion_delay = 0.3
+    sim.slew_rate = 5.0
+
+    t0 = time.time()
+    telescope.move("12:20:00", "+31:00:00")
+
+    assert not sim.is_moving()
+    assert time.time() - t0 > 1.0
+    assert telescope.get_snapshot()["RA"] == "12:20:00.00"
+
+
+def test_move_to_current_position(telescope, sim):
+    t0 = time.time()
+    telescope.move("12:00:00", "+30:00:00")
+
+    assert time.time() - t0 < telescope.move_start_timeout
+    assert telescope.get_snapshot()["RA"] == "12:00:00.00"
+
+
+@pytest.mark.parametrize("use_snapshot", [1, 0])
+def test_short_move_motion_not_seen(telescope, sim, use_snapshot):
+    # the move ends before MOTION would be reported
+    telescope.use_snapshot = use_snapshot
+    sim.motion_delay = 1.0
+
+    t0 = time.time()
+    telescope.move("12:00:01", "+30:00:00")
+
+    assert time.time() - t0 < telescope.move_start_timeout
+    assert telescope.read_motion(["RA"])["RA"] == "12:00:01.00"
+
+
+def record_requests(sim):
+    """
+    Returns the list to which the simulator adds the TCS name of each REQUEST.
+    """
+
+    names = []
+    request = sim.request
+
+    def record(name):
+        names.append(name)
+        return request(name)
+
+    sim.request = record
+
+    return names
+
+
+def test_wait_for_move_without_snapshot(telescope, sim):
+    telescope.use_snapshot = 0
+    names = record_requests(sim)
+    telescope.send_slew("12:20:00", "+31:00:00")
+    time.sleep(0.1)
+    assert sim.is_moving()
+
+    assert telescope.wait_for_move() is None
+    assert not sim.is_moving()
+    assert "MOTION" in names
+    assert "ALL" not in names
+
+
+def test_poller_without_snapshot(telescope, sim):
+    telescope.use_snapshot = 0
+    names = record_requests(sim)
+    telescope.start_poller(20.0)
+    try:
+        time.sleep(0.3)
+    finally:
+        telescope.stop_poller()
+
+    assert telescope.poller.samples > 0
+    assert telescope.cache.get("RA", 10.0)[0] == "12:00:00.00"
+    assert telescope.cache.get("EQUINOX", 10.0)[0] == 2000.0
+    assert "ALL" not in names
+
+
+def test_snapshot_breaker(telescope, sim):
+    request = sim.request
+    sim.request = lambda name: "ERROR" if name == "ALL" else request(name)
+    telescope.gather.threshold = 1
+
+    values = get_values(telescope.read_header())
+
+    assert values["RA"] == "12:00:00.00"
+    endpoints = telescope.gather.get_stats()["endpoints"]
+    assert endpoints == {"snapshot": "open", "tcs": "closed"}
+
+
+def expose(telescope, seconds):
+    """
+    Calls the telescope in the order of Exposure.expose() and ExposureVatt.
+    """
+
+    telescope.exposure_start()  # start()
+    telescope.read_header()  # begin(), update_headers()
+    telescope.shutter_opened()  # integrate()
+    time.sleep(seconds)
+    telescope.shutter_closed()
+    time.sleep(0.1)  # readout()
+    telescope.update_exposure_header()  # end(), before the image is written
+    telescope.exposure_finish()  # finish()
+
+
+def test_exposure_hook_order(telescope, sim):
+    telescope.prefetch = 1
+    commands = sim.commands
+    expose(telescope, 0.3)
+
+    # one read by begin() and one at shutter close
+    assert sim.commands - commands == 2
+    start, values = telescope.snapshot_start
+    finish, values = telescope.snapshot_finish
+    assert start < telescope.shutter_times[1] <= finish
+    assert values["AIRMASS"] == 1.155
+
+
+def test_exposure_without_snapshot(telescope, sim):
+    telescope.prefetch = 1
+    telescope.use_snapshot = 0
+    names = record_requests(sim)
+    expose(telescope, 0.1)
+
+    finish, values = telescope.snapshot_finish
+    assert values["AIRMASS"] == 1.155
+    assert values["MOTION"] == 0
+    assert "ALL" not in names
+
+
+def test_exposure_keywords(telescope, sim):
+    telescope.prefetch = 1
+    telescope.start_poller(20.0)
+    try:
+        expose(telescope, 0.5)
+    finally:
+        telescope.stop_poller()
+
+    t0, t1 = telescope.shutter_times
+    assert 0.45 < t1 - t0 < 1.0
+    values = telescope.header.values
+    assert values["AIRM-MID"] == pytest.approx(values["AIRMASS"], abs=0.01)
+    assert values["HA-MID"] == pytest.approx(
+        telescope.buffer.get_value("HA", (t0 + t1) / 2.0)
+    )
+    for keyword in telescope.exposure_keywords:
+        assert keyword not in [item[0] for item in telescope.read_header()]
+
+    # values of the last exposure are removed
+    telescope.exposure_start()
+    assert "AIRM-MID" not in telescope.header.get_keywords()
+
+
+def test_keyword_cached_only_while_polling(telescope, sim, monkeypatch):
+    telescope.get_keyword("AIRMASS")
+    assert telescope.cache.get("AIRMASS") is not None
+    telescope.cache.set("AIRMASS", "2.000")
+
+    # not polling, the cache may be stale so the server is read
+    commands = sim.commands
+    assert telescope.get_keyword("AIRMASS")[0] == 1.155
+    assert sim.commands - commands == 1
+
+    monkeypatch.setattr(telescope, "is_polling", lambda: True)
+    telescope.cache.set("AIRMASS", "2.000")
+    commands = sim.commands
+    assert telescope.get_keyword("AIRMASS")[0] == 2.0
+    assert sim.commands == commands
+
+    # expired values are read from the server
+    telescope.cache.set("AIRMASS", "2.000", time.time() - 10.0)
+    assert telescope.get_keyword("AIRMASS")[0] == 1.155
+    assert sim.commands - commands == 1
+
+
+def test_keyword_age(telescope):
+    assert telescope.get_keyword_age("AIRMASS") is None
+
+    telescope.get_keyword("AIRMASS")
+    assert 0.0 <= telescope.get_keyword_age("AIRMASS") < 0.5
+
+    telescope.cache.set("AIRMASS", "1.155", time.time() - 3.0)
+    assert telescope.get_keyword_age("AIRMASS") == pytest.approx(3.0, abs=0.1)
@@ -0,0 +1,103 @@
+"""
+Tests of the Tracer spans and the Chrome trace file.
+"""
+
+import json
+import os
+import threading
+
+from tracing import Tracer
+
+
+def read_trace(filename):
+    """
+    Returns the events of a trace file, which has no closing bracket.
+    """
+
+    with open(filename, "r") as f:
+        text = f.read()
+
+    return json.loads(text.rstrip().rstrip(",") + "]")
+
+
+def test_nested_spans():
+    tracer = Tracer()
+    tracer.start_collect()
+    with tracer.span("expose"):
+        with tracer.span("begin"):
+            pass
+        tracer.traced(lambda: None, "readout")()
+    spans = tracer.stop_collect()
+
+    # spans are added as they end
+    assert [name for name, start, duration in spans] == ["begin", "readout", "expose"]
+    outer = spans[-1]
+    for name, start, duration in spans[:-1]:
+        assert outer[1] <= start
+        assert start + duration <= outer[1] + outer[2]
+
+    assert tracer.stop_collect() == []
+
+
+def test_trace_file(tmp_path):
+    tracer = Tracer(str(tmp_path))
+    with tracer.span("expose", imagetype="zero"):
+        with tracer.span("header telescope", "header"):
+            pass
+    thread = threading.Thread(target=lambda: tracer.add("send", "exposure", 1.0, 0.5))
+    thread.start()
+    thread.join()
+    tracer.flush()
+
+    filename = tracer.get_filename()
+    assert os.path.basename(filename).startswith("trace_")
+    events = read_trace(filename)
+
+    meta = [event for event in events if event["ph"] == "M"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert [event["args"]["name"] for event in meta] == ["MainThread", thread.name]
+    assert spans["header telescope"]["cat"] == "header"
+    assert spans["expose"]["args"] == {"imagetype": "zero"}
+    assert spans["send"] == {
+        "name": "send",
+        "cat": "exposure",
+        "ph": "X",
+        "ts": 1000000,
+        "dur": 500000,
+        "pid": os.getpid(),
+        "tid": thread.ident,
+    }
+    inner = spans["header telescope"]
+    outer = spans["expose"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+    # a new tracer appends to the same night file
+    tracer.close()
+    tracer = Tracer(str(tmp_path))
+    tracer.add("end", "exposure", 2.0, 0.1)
+    tracer.flush()
+    assert [event["name"] for event in read_trace(filename)][-1] == "end"
+
+
+def test_disabled(tmp_path):
+    tracer = Tracer(str(tmp_path))
+    tracer.enabled = 0
+    tracer.start_collect()
+    with tracer.span("expose"):
+        pass
+
+    assert tracer.stop_collect() == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_error_stops_file(tmp_path):
+    folder = tmp_path / "file"
+    folder.write_text("")
+    tracer = Tracer(str(folder))
+    tracer.start_collect()
+    with tracer.span("expose"):
+        pass
+
+    assert tracer.folder == ""
+    assert len(tracer.stop_collect()) == 1